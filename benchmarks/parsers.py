@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.parsers
+
+Benchmarks the parse functions of each parser backend against the pages saved
+in tests/fixtures, reporting each one's operations per second and the peak
+memory it allocates, compared against a stored baseline:
+
+    python -m benchmarks.parsers                # compare with baseline.json
+    python -m benchmarks.parsers --save         # record a new baseline
+    python -m benchmarks.parsers -k lxml        # only benchmarks matching lxml
+
+Exits with status 1 if any benchmark is slower, or allocates more, than the
+baseline by over the tolerance. Timings depend on the machine, so the baseline
+isn't committed: record it on the one the benchmarks are compared on, with
+`make bench-baseline`. Without one, results are reported without comparison.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from collections import namedtuple
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from bs4 import BeautifulSoup
+
+from play_scraper import lxml_parser
+from play_scraper import utils
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures"
+)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+clock = getattr(time, "perf_counter", time.time)
+
+# A function to benchmark, called with args, which are prepared beforehand so
+# only the function itself is measured, e.g. a page's tree for a per-card parse
+Benchmark = namedtuple("Benchmark", ["name", "function", "args"])
+
+# The measurements of a benchmark:
+#   ops_per_sec: calls per second, of the fastest of several rounds
+#   peak_bytes: the most memory allocated at once during a call, or None if
+#       tracemalloc isn't available
+Result = namedtuple("Result", ["ops_per_sec", "peak_bytes"])
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def _each(function):
+    """Returns a function applying a per-card parse function to every card."""
+
+    def each(cards):
+        return [function(card) for card in cards]
+
+    each.__name__ = function.__name__
+    return each
+
+
+def _soup(content):
+    return BeautifulSoup(content, "lxml", from_encoding="utf8")
+
+
+def benchmarks():
+    """Returns every benchmark, named '<backend>.<function>[<page>]'."""
+    details = load_fixture("details.html")
+    lists = [
+        ("collection", load_fixture("collection.html")),
+        ("developer", load_fixture("developer.html")),
+    ]
+    cluster = load_fixture("cluster.html")
+
+    soup = _soup(details)
+    doc = lxml_parser.parse_html(details)
+    cases = [
+        ("bs4.parse_app_details[details]", utils.parse_app_details, (soup,)),
+        (
+            "bs4.parse_additional_info[details]",
+            utils.parse_additional_info,
+            (soup.select_one(".IxB2fe"),),
+        ),
+        ("lxml.parse_app_details[details]", lxml_parser.parse_app_details, (doc,)),
+        (
+            "lxml.parse_additional_info[details]",
+            lxml_parser.parse_additional_info,
+            (lxml_parser.ADDITIONAL_INFO(doc)[0],),
+        ),
+    ]
+    for page, content in lists:
+        cases += [
+            (
+                "bs4.parse_card_info[{page}]".format(page=page),
+                _each(utils.parse_card_info),
+                (_soup(content).select('div[data-uitype="500"]'),),
+            ),
+            (
+                "lxml.parse_card_info[{page}]".format(page=page),
+                _each(lxml_parser.parse_card_info),
+                (lxml_parser.CARDS(lxml_parser.parse_html(content)),),
+            ),
+        ]
+    cases += [
+        (
+            "bs4.parse_cluster_card_info[cluster]",
+            _each(utils.parse_cluster_card_info),
+            (_soup(cluster).select("div.Vpfmgd"),),
+        ),
+        (
+            "lxml.parse_cluster_card_info[cluster]",
+            _each(lxml_parser.parse_cluster_card_info),
+            (lxml_parser.CLUSTER_CARDS(lxml_parser.parse_html(cluster)),),
+        ),
+    ]
+
+    # Whole pages, from their content, including building their trees
+    for parser in ("bs4", "lxml", "json"):
+        cases.append(
+            (
+                "{parser}.parse_app_details_content[details]".format(parser=parser),
+                utils.parse_app_details_content,
+                (details, parser),
+            )
+        )
+        for page, content in lists:
+            cases.append(
+                (
+                    "{parser}.parse_card_list[{page}]".format(parser=parser, page=page),
+                    utils.parse_card_list,
+                    (content, parser),
+                )
+            )
+        cases.append(
+            (
+                "{parser}.parse_cluster_card_list[cluster]".format(parser=parser),
+                utils.parse_cluster_card_list,
+                (cluster, parser),
+            )
+        )
+    return [Benchmark(*case) for case in cases]
+
+
+def ops_per_sec(function, args, min_time=0.2, rounds=5):
+    """Measures how many times per second a function can be called, taking
+    the fastest of several rounds of calls, each lasting about
+    `min_time / rounds` seconds, to discount interruptions.
+    """
+    function(*args)
+    calls, elapsed = 1, 0
+    # Find how many calls fill a round
+    while True:
+        started = clock()
+        for _ in range(calls):
+            function(*args)
+        elapsed = clock() - started
+        if elapsed >= min_time / rounds:
+            break
+        calls *= 2
+
+    best = elapsed
+    for _ in range(rounds - 1):
+        started = clock()
+        for _ in range(calls):
+            function(*args)
+        best = min(best, clock() - started)
+    return calls / best
+
+
+def peak_bytes(function, args):
+    """Measures the most memory allocated at once during a call of a function,
+    or returns None if tracemalloc isn't available.
+    """
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(benchmarks, min_time=0.2):
+    """Runs benchmarks, returning a dictionary of their names to `Result`s."""
+    return {
+        benchmark.name: Result(
+            ops_per_sec(benchmark.function, benchmark.args, min_time),
+            peak_bytes(benchmark.function, benchmark.args),
+        )
+        for benchmark in benchmarks
+    }
+
+
+def load_baseline(path):
+    """Returns the results stored in a baseline file, or an empty dictionary if
+    there isn't one.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        stored = json.load(f)
+    return {
+        name: Result(result["ops_per_sec"], result["peak_bytes"])
+        for name, result in stored["benchmarks"].items()
+    }
+
+
+def save_baseline(path, results):
+    stored = {
+        "python": platform.python_version(),
+        "benchmarks": {
+            name: {
+                "ops_per_sec": round(result.ops_per_sec, 1),
+                "peak_bytes": result.peak_bytes,
+            }
+            for name, result in results.items()
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(stored, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _change(value, baseline):
+    if value is None or not baseline:
+        return None
+    return float(value) / baseline - 1
+
+
+def regressions(results, baseline, tolerance=0.2):
+    """Returns the names of the benchmarks whose results are worse than their
+    baseline by over `tolerance`, e.g. 0.2 for 20% fewer operations per second
+    or 20% more memory.
+    """
+    regressed = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        speed = _change(result.ops_per_sec, baseline[name].ops_per_sec)
+        memory = _change(result.peak_bytes, baseline[name].peak_bytes)
+        if (speed is not None and speed < -tolerance) or (
+            memory is not None and memory > tolerance
+        ):
+            regressed.append(name)
+    return regressed
+
+
+def _format_change(change):
+    return "" if change is None else "{change:+.1%}".format(change=change)
+
+
+def report(results, baseline):
+    """Returns a table of results and their changes from the baseline."""
+    width = max(len(name) for name in results)
+    lines = [
+        "{name:<{width}} {ops:>12} {ops_change:>8} {peak:>10} {peak_change:>8}".format(
+            name="benchmark",
+            width=width,
+            ops="ops/sec",
+            ops_change="vs base",
+            peak="peak KiB",
+            peak_change="vs base",
+        )
+    ]
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        lines.append(
+            "{name:<{width}} {ops:>12.1f} {ops_change:>8} {peak:>10} "
+            "{peak_change:>8}".format(
+                name=name,
+                width=width,
+                ops=result.ops_per_sec,
+                ops_change=_format_change(
+                    base and _change(result.ops_per_sec, base.ops_per_sec)
+                ),
+                peak=(
+                    ""
+                    if result.peak_bytes is None
+                    else "{kib:.1f}".format(kib=result.peak_bytes / 1024.0)
+                ),
+                peak_change=_format_change(
+                    base and _change(result.peak_bytes, base.peak_bytes)
+                ),
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "-k", dest="match", help="only run benchmarks whose name contains this"
+    )
+    parser.add_argument("--baseline", default=BASELINE, help="the baseline file")
+    parser.add_argument(
+        "--save", action="store_true", help="save the results as the baseline"
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="seconds to spend timing each benchmark",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="the fraction a benchmark may be worse than the baseline by",
+    )
+    args = parser.parse_args(argv)
+
+    selected = [
+        benchmark
+        for benchmark in benchmarks()
+        if not args.match or args.match in benchmark.name
+    ]
+    results = run(selected, args.min_time)
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(report(results, {}))
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    print(report(results, baseline))
+    if not baseline:
+        print(
+            "\nNo baseline at {path} to compare with; record one with "
+            "`make bench-baseline`.".format(path=args.baseline)
+        )
+    regressed = regressions(results, baseline, args.tolerance)
+    if regressed:
+        print(
+            "\n{count} benchmark(s) regressed by over {tolerance:.0%}: "
+            "{names}".format(
+                count=len(regressed),
+                tolerance=args.tolerance,
+                names=", ".join(regressed),
+            )
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.server
+
+A local mock of the Play Store, serving canned pages at the paths of the urls
+the scraper builds, to measure it end to end without the network:
+
+    /store/apps/details             details.html, whatever the app id
+    /store/apps/collection/...,
+    /store/apps/category/.../collection/...
+                                    a collection of `num` apps from `start`
+    /store/apps/developer           a developer's `num` apps
+    /store/search, /store/apps/similar
+                                    a cluster of `list_size` apps
+    /store/apps                     the categories dropdown of the front page
+    /suggest/SuggRequest            five suggestions for the query
+
+Lists are made of the cards of the saved fixtures with their app ids replaced,
+so detailed lists fetch distinct apps. Responses can be delayed, and fail or be
+throttled at random. Run one on its own with:
+
+    python -m benchmarks.server --port 8000 --latency 0.05 --error-rate 0.01
+
+and point `settings` at it, as `MockPlayStore.patch_settings` does.
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+
+import lxml.html
+
+from play_scraper import settings as s
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures"
+)
+
+CATEGORIES = ["GAME", "FAMILY", "COMMUNICATION", "PHOTOGRAPHY", "PRODUCTIVITY"]
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def _card_template(fixture, xpath, app_id):
+    """Returns the html of a fixture's first card, with its app id replaced by
+    an '{app_id}' placeholder.
+    """
+    card = lxml.html.fromstring(load_fixture(fixture)).xpath(xpath)[0]
+    html = lxml.html.tostring(card, encoding="unicode")
+    return html.replace("{", "{{").replace("}", "}}").replace(app_id, "{app_id}")
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep connections alive, as the Play Store does
+    protocol_version = "HTTP/1.1"
+    # Send the headers and body without waiting for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.store.handle(self)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        self.server.store.handle(self)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockPlayStore(object):
+    """A local HTTP server that answers like the Play Store, on a thread of
+    its own. Use it as a context manager, or `start` and `stop` it.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0,
+        jitter=0,
+        error_rate=0,
+        throttle_rate=0,
+        retry_after=0,
+        list_size=50,
+        seed=None,
+    ):
+        """
+        :param host: the address to listen on.
+        :param port: the port to listen on, or 0 for any free one.
+        :param latency: seconds to wait before answering each request.
+        :param jitter: up to how many seconds to add to the latency at random.
+        :param error_rate: the fraction of requests to answer with a 503.
+        :param throttle_rate: the fraction of requests to answer with a 429.
+        :param retry_after: the Retry-After header of 429s, in seconds.
+        :param list_size: the number of apps in search and similar clusters.
+        :param seed: (optional) a seed for the random latencies and failures.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.list_size = list_size
+        self.statuses = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._details = load_fixture("details.html")
+        self._card = _card_template(
+            "developer.html", '//div[@data-uitype="500"]', "com.example.studio.photos"
+        )
+        self._cluster_card = _card_template(
+            "cluster.html", '//div[@class="Vpfmgd"]', "com.example.cluster.one"
+        )
+
+        self._server = _Server((host, port), _Handler)
+        self._server.store = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{host}:{port}".format(host=host, port=port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @contextmanager
+    def patch_settings(self):
+        """Points the scraper's urls at this server within a `with` block."""
+        names = ["BASE_URL", "SEARCH_URL", "SUGGESTION_URL"]
+        previous = [getattr(s, name) for name in names]
+        s.BASE_URL = self.url + "/store/apps"
+        s.SEARCH_URL = self.url + "/store/search"
+        s.SUGGESTION_URL = self.url + "/suggest/SuggRequest"
+        try:
+            yield self
+        finally:
+            for name, value in zip(names, previous):
+                setattr(s, name, value)
+
+    def _cards(self, template, prefix, start, count):
+        return "".join(
+            template.format(
+                app_id="com.example.{prefix}{n}".format(prefix=prefix, n=start + i)
+            )
+            for i in range(count)
+        )
+
+    def _card_list(self, prefix, form, default):
+        start = int(form.get("start", [0])[0])
+        count = int(form.get("num", [default])[0])
+        return (
+            '<div class="id-cluster-container cluster-container">'
+            '<div class="card-list">{cards}</div></div>'
+        ).format(cards=self._cards(self._card, prefix, start, count))
+
+    def _cluster(self, prefix):
+        return '<c-wiz><div class="ZmHEEd">{cards}</div></c-wiz>'.format(
+            cards=self._cards(self._cluster_card, prefix, 0, self.list_size)
+        )
+
+    def _categories(self):
+        return (
+            '<div id="action-dropdown-children-Categories"><ul>{links}</ul></div>'
+        ).format(
+            links="".join(
+                '<li><a href="/store/apps/category/{c}">{c}</a></li>'.format(c=c)
+                for c in CATEGORIES
+            )
+        )
+
+    def _suggestions(self, query):
+        return json.dumps(
+            [{"s": "{q} {n}".format(q=query, n=n), "t": "q"} for n in range(5)]
+        )
+
+    def respond(self, path, query, form):
+        """Returns the status, content type and body answering a request."""
+        html = "text/html; charset=utf-8"
+        if path == "/store/apps/details":
+            return 200, html, self._details
+        if "/collection/" in path:
+            prefix = path.rsplit("/", 1)[-1].replace("_", "")
+            return 200, html, self._card_list(prefix + ".", form, s.NUM_RESULTS)
+        if path == "/store/apps/developer":
+            return 200, html, self._card_list("developer.", form, s.DEV_RESULTS)
+        if path == "/store/search":
+            return 200, html, self._cluster("search.")
+        if path == "/store/apps/similar":
+            return 200, html, self._cluster("similar.")
+        if path == "/store/apps":
+            return 200, html, self._categories()
+        if path == "/suggest/SuggRequest":
+            query = query.get("query", [""])[0]
+            return 200, "application/json", self._suggestions(query)
+        return 404, html, "Not found"
+
+    def handle(self, handler):
+        parsed = urlparse(handler.path)
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+        time.sleep(delay)
+
+        headers = {}
+        if roll < self.throttle_rate:
+            status, content_type, body = 429, "text/plain", "Too many requests"
+            headers["Retry-After"] = str(self.retry_after)
+        elif roll < self.throttle_rate + self.error_rate:
+            status, content_type, body = 503, "text/plain", "Service unavailable"
+        else:
+            status, content_type, body = self.respond(
+                parsed.path.rstrip("/"),
+                parse_qs(parsed.query),
+                getattr(handler, "form", {}),
+            )
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--list-size", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    store = MockPlayStore(
+        args.host,
+        args.port,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.throttle_rate,
+        list_size=args.list_size,
+    )
+    print("Serving the Play Store at {url}".format(url=store.url))
+    try:
+        store._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.throughput
+
+Measures the scraper end to end against a local `server.MockPlayStore`,
+sweeping the number of concurrent requests, and reports for each scenario and
+concurrency the apps (or calls) per second, the p50 and p99 request latency,
+the requests and failures, and the peak memory allocated:
+
+    python -m benchmarks.throughput
+    python -m benchmarks.throughput --concurrency 1,10,50 --latency 0.1
+    python -m benchmarks.throughput -k collection --error-rate 0.05
+
+Scenarios:
+
+    multi_futures_app_request   the details of `--apps` apps, fetched by
+                                `concurrency` threads
+    collection, developer, search, similar
+                                a detailed list, its details fetched by a
+                                `PlayScraper` with `concurrency` threads and
+                                pooled connections, and twice that in flight
+    details, suggestions, categories
+                                `--calls` calls to a `PlayScraper`, made by
+                                `concurrency` threads
+
+Each concurrency gets a scraper and session of its own, sized to it, rather
+than the `api` functions' default session, whose pool is sized at import.
+"""
+
+import argparse
+import gc
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from requests_futures.sessions import FuturesSession
+
+from play_scraper import instrumentation as instr
+from play_scraper import settings as s
+from play_scraper.instrumentation import Instrumentation
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session, multi_futures_app_request
+
+from benchmarks.server import MockPlayStore
+
+clock = getattr(time, "perf_counter", time.time)
+
+# A scenario, running `function(concurrency, count)` and returning the number of
+# apps or calls it got through
+Scenario = namedtuple("Scenario", ["name", "function"])
+
+# The measurements of a scenario at a concurrency:
+#   items: the apps or calls it got through
+#   seconds: how long it took
+#   latencies: the duration of each request sent, in seconds
+#   failures: the requests that got no response or an error status
+#   peak_bytes: the most memory allocated at once, or None
+Result = namedtuple(
+    "Result", ["items", "seconds", "latencies", "failures", "peak_bytes"]
+)
+
+
+class _Requests(object):
+    """An instrumentation listener recording each request's latency."""
+
+    def __init__(self):
+        self.latencies = []
+        self.failures = 0
+
+    def __call__(self, event):
+        if event.name == "request":
+            self.latencies.append(event.duration)
+            if event.tags["status"] >= 400:
+                self.failures += 1
+        elif event.name == "request_error":
+            self.failures += 1
+
+
+@contextmanager
+def _settings(**values):
+    previous = {name: getattr(s, name) for name in values}
+    for name, value in values.items():
+        setattr(s, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(s, name, value)
+
+
+def _app_ids(count):
+    return ["com.example.app{n}".format(n=n) for n in range(count)]
+
+
+def _fan_out(concurrency, apps):
+    session = FuturesSession(
+        executor=instr.ContextExecutor(max_workers=concurrency),
+        session=create_session(pool_maxsize=concurrency),
+    )
+    try:
+        return len(
+            multi_futures_app_request(
+                _app_ids(apps),
+                session=session,
+                max_in_flight=2 * concurrency,
+                parser="lxml",
+            )
+        )
+    finally:
+        session.executor.shutdown()
+
+
+@contextmanager
+def _scraper(concurrency):
+    """A scraper with `concurrency` request threads and pooled connections."""
+    with _settings(CONCURRENT_REQUESTS=concurrency):
+        scraper = PlayScraper(
+            session=create_session(pool_maxsize=concurrency),
+            parse_workers=0,
+            parser="lxml",
+        )
+    try:
+        yield scraper
+    finally:
+        scraper.close()
+
+
+def _detailed(method, *args):
+    def run(concurrency, count):
+        with _scraper(concurrency) as scraper:
+            apps = getattr(scraper, method)(*args)
+            app_ids = [app["app_id"] for app in apps]
+            details = scraper.iter_details(app_ids, max_in_flight=2 * concurrency)
+            return sum(1 for _ in details)
+
+    return run
+
+
+def _calls(method, *args):
+    def run(concurrency, count):
+        executor = instr.ContextExecutor(max_workers=concurrency)
+        with _scraper(concurrency) as scraper:
+            try:
+                function = getattr(scraper, method)
+                futures = [executor.submit(function, *args) for _ in range(count)]
+                return sum(1 for future in futures if future.result() is not None)
+            finally:
+                executor.shutdown()
+
+    return run
+
+
+def scenarios():
+    return [
+        Scenario("multi_futures_app_request", _fan_out),
+        Scenario("collection", _detailed("collection", "TOP_FREE")),
+        Scenario("developer", _detailed("developer", "Example Studio")),
+        Scenario("search", _detailed("search", "game")),
+        Scenario("similar", _detailed("similar", "com.example.app")),
+        Scenario("details", _calls("details", "com.example.app")),
+        Scenario("suggestions", _calls("suggestions", "game")),
+        Scenario("categories", _calls("categories")),
+    ]
+
+
+def run(scenario, concurrency, count, memory=True):
+    """Runs a scenario at a concurrency, returning its `Result`."""
+    recorder = _Requests()
+    memory = memory and tracemalloc is not None
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    try:
+        with Instrumentation([recorder]).activate():
+            started = clock()
+            items = scenario.function(concurrency, count)
+            seconds = clock() - started
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return Result(items, seconds, recorder.latencies, recorder.failures, peak)
+
+
+def percentile(values, fraction):
+    """Returns the value below which `fraction` of the values fall, by the
+    nearest rank, or None if there are none.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(0, min(len(values) - 1, int(round(fraction * len(values))) - 1))
+    return values[rank]
+
+
+def _milliseconds(seconds):
+    return "" if seconds is None else "{ms:.1f}".format(ms=seconds * 1000)
+
+
+HEADER = "{:<26} {:>5} {:>6} {:>9} {:>9} {:>9} {:>7} {:>6} {:>9}".format(
+    "scenario",
+    "conc",
+    "items",
+    "items/s",
+    "p50 ms",
+    "p99 ms",
+    "reqs",
+    "fails",
+    "peak MiB",
+)
+
+
+def format_result(name, concurrency, result):
+    return "{:<26} {:>5} {:>6} {:>9.1f} {:>9} {:>9} {:>7} {:>6} {:>9}".format(
+        name,
+        concurrency,
+        result.items,
+        result.items / result.seconds if result.seconds else 0,
+        _milliseconds(percentile(result.latencies, 0.5)),
+        _milliseconds(percentile(result.latencies, 0.99)),
+        len(result.latencies),
+        result.failures,
+        (
+            ""
+            if result.peak_bytes is None
+            else "{mib:.1f}".format(mib=result.peak_bytes / 1048576.0)
+        ),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "-k", dest="match", help="only run scenarios whose name contains this"
+    )
+    parser.add_argument(
+        "--concurrency",
+        default="1,5,10,20,50",
+        help="comma separated concurrencies to sweep",
+    )
+    parser.add_argument(
+        "--apps", type=int, default=200, help="apps to fetch the details of"
+    )
+    parser.add_argument(
+        "--calls", type=int, default=100, help="calls of single request functions"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="the server's latency"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.01, help="random extra server latency"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="the fraction of 503s"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0, help="the fraction of 429s"
+    )
+    parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="don't trace memory, which slows the client down",
+    )
+    args = parser.parse_args(argv)
+
+    concurrencies = [int(c) for c in args.concurrency.split(",")]
+    selected = [
+        scenario
+        for scenario in scenarios()
+        if not args.match or args.match in scenario.name
+    ]
+    store = MockPlayStore(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=0,
+    )
+    with store, store.patch_settings():
+        print(HEADER)
+        for scenario in selected:
+            for concurrency in concurrencies:
+                count = args.apps if scenario.function is _fan_out else args.calls
+                result = run(scenario, concurrency, count, args.memory)
+                print(format_result(scenario.name, concurrency, result))
+                sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
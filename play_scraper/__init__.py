@@ -12,13 +12,32 @@ import logging
 
 from play_scraper.api import (  # noqa: F401
     collection,
+    collection_all,
     details,
+    details_by_locale,
     developer,
+    developer_all,
     search,
+    search_all,
     similar,
     suggestions,
     categories,
 )
+from play_scraper.cache import DetailsCache  # noqa: F401
+from play_scraper.concurrency import AIMDConcurrency  # noqa: F401
+from play_scraper.http_cache import HTTPCache  # noqa: F401
+from play_scraper.instrumentation import Instrumentation  # noqa: F401
+from play_scraper.matrix import MatrixCrawl  # noqa: F401
+from play_scraper.metrics import MetricsCollector  # noqa: F401
+from play_scraper.ratelimit import FileTokenBucket, TokenBucket  # noqa: F401
+from play_scraper.replay import Archive  # noqa: F401
+from play_scraper.retry import RetryPolicy  # noqa: F401
+from play_scraper.scraper import PlayScraper  # noqa: F401
+
+try:  # Python 3.5+
+    from play_scraper.async_scraper import AsyncPlayScraper  # noqa: F401
+except SyntaxError:
+    pass
 
 
 # Set default logging handler to avoid "No handler found" warnings.
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.adapters
+
+The base of the transport adapters `utils.create_session` layers over its
+pooled HTTPAdapter to cache, throttle and retry requests.
+"""
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+
+class WrappingAdapter(BaseAdapter):
+    """A transport adapter that sends requests with another adapter. Attributes
+    it doesn't have are looked up on the adapter it wraps, so a session's
+    pool settings can still be read through it.
+    """
+
+    def __init__(self, adapter=None):
+        """
+        :param adapter: the adapter to send requests with; defaults to a new
+            HTTPAdapter.
+        """
+        super(WrappingAdapter, self).__init__()
+        self.adapter = HTTPAdapter() if adapter is None else adapter
+
+    def __getattr__(self, name):
+        if name == "adapter":
+            # Not set yet, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.adapter, name)
+
+    def send(self, request, **kwargs):
+        return self.adapter.send(request, **kwargs)
+
+    def close(self):
+        self.adapter.close()
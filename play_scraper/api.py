@@ -9,17 +9,32 @@ play_scraper.api
 """
 
 from play_scraper import scraper
+from play_scraper.utils import get_default_session
 
 
-def details(app_id, hl="en", gl="us"):
+def details(app_id, hl="en", gl="us", fields=None):
     """Sends a GET request to the app's info page, parses the app's details, and
     returns them as a dict.
 
     :param app_id: the app to retrieve details from, e.g. 'com.nintendo.zaaa'
+    :param fields: (optional) an iterable of the detail fields to parse
     :return: a dictionary of app details
     """
-    s = scraper.PlayScraper(hl, gl)
-    return s.details(app_id)
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
+    return s.details(app_id, fields)
+
+
+def details_by_locale(app_ids, locales, fields=None):
+    """Sends GET requests for each app's info page in every locale at once,
+    and returns each locale's apps' details.
+
+    :param app_ids: the apps to retrieve details from
+    :param locales: a list of (hl, gl) pairs, e.g. [('en', 'us'), ('de', 'de')]
+    :param fields: (optional) an iterable of the detail fields to parse
+    :return: a dict of each (hl, gl) locale to a list of app dictionaries
+    """
+    s = scraper.PlayScraper(session=get_default_session())
+    return s.details_by_locale(app_ids, locales, fields)
 
 
 def collection(collection, category=None, hl="en", gl="us", **kwargs):
@@ -35,12 +50,28 @@ def collection(collection, category=None, hl="en", gl="us", **kwargs):
         to page * results <= 500
     :param age: an age range to filter by (only for FAMILY categories)
     :param detailed: if True, sends request per app for full detail
+    :param fields: (optional) the detail fields to parse for each app
     :return: a list of app dictionaries
     """
-    s = scraper.PlayScraper(hl, gl)
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
     return s.collection(collection, category, **kwargs)
 
 
+def collection_all(collection, category=None, hl="en", gl="us", **kwargs):
+    """Sends POST requests for every page of a collection at once, and returns
+    all its apps in rank order, without duplicates.
+
+    :param collection: the collection ID as a string.
+    :param category: the category ID as a string.
+    :param age: an age range to filter by (only for FAMILY categories)
+    :param detailed: if True, sends request per app for full detail
+    :param fields: (optional) the detail fields to parse for each app
+    :return: a list of app dictionaries
+    """
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
+    return s.collection_all(collection, category, **kwargs)
+
+
 def developer(developer, hl="en", gl="us", **kwargs):
     """Sends a POST request to the developer's page, extracts their apps' basic
     info, and returns them in a list.
@@ -49,12 +80,27 @@ def developer(developer, hl="en", gl="us", **kwargs):
     :param results: the number of app results to retrieve
     :param page: the page number to retrieve
     :param detailed: if True, sends request per app for full detail
+    :param fields: (optional) the detail fields to parse for each app
     :return: a list of app dictionaries
     """
-    s = scraper.PlayScraper(hl, gl)
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
     return s.developer(developer, **kwargs)
 
 
+def developer_all(developer, hl="en", gl="us", **kwargs):
+    """Sends POST requests for every page of the developer's apps at once, and
+    returns all their apps in order, without duplicates.
+
+    :param developer: developer name to retrieve apps from, e.g. 'Disney'
+    :param detailed: if True, sends request per app for full detail
+    :param fields: (optional) the detail fields to parse for each app
+    :param max_pages: (optional) the most pages of apps to request
+    :return: a list of app dictionaries
+    """
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
+    return s.developer_all(developer, **kwargs)
+
+
 def suggestions(query, hl="en", gl="us"):
     """Sends a GET request to the Play Store's suggestion API and returns up to
     five autocompleted suggested query strings in a list.
@@ -62,33 +108,50 @@ def suggestions(query, hl="en", gl="us"):
     :param query: the query string to get autocomplete suggestions
     :return: a list of suggestion strings
     """
-    s = scraper.PlayScraper(hl, gl)
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
     return s.suggestions(query)
 
 
-def search(query, page=None, detailed=False, hl="en", gl="us"):
+def search(query, page=None, detailed=False, hl="en", gl="us", fields=None):
     """Sends a POST request and retrieves a list of applications matching
     the query term(s).
 
     :param query: search query term(s) to retrieve matching apps
-    :param page: the page number to retrieve; max is 12
+    :param page: the page number to retrieve
     :param detailed: if True, sends request per app for its full detail
+    :param fields: (optional) the detail fields to parse for each app
+    :return: a list of apps matching search terms
+    """
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
+    return s.search(query, page, detailed, fields)
+
+
+def search_all(query, detailed=False, hl="en", gl="us", fields=None, max_pages=None):
+    """Sends POST requests for every page of results matching the query
+    term(s) at once, following the page tokens each response links to, and
+    returns all the apps in rank order, without duplicates.
+
+    :param query: search query term(s) to retrieve matching apps
+    :param detailed: if True, sends request per app for full detail
+    :param fields: (optional) the detail fields to parse for each app
+    :param max_pages: (optional) the most pages of results to request
     :return: a list of apps matching search terms
     """
-    s = scraper.PlayScraper(hl, gl)
-    return s.search(query, page, detailed)
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
+    return s.search_all(query, detailed, fields, max_pages)
 
 
-def similar(app_id, detailed=False, hl="en", gl="us"):
+def similar(app_id, detailed=False, hl="en", gl="us", fields=None):
     """Sends a GET request, follows the redirect, and retrieves a list of
     applications similar to the specified app.
 
     :param app_id: the app to retrieve details from, e.g. 'com.nintendo.zaaa'
     :param detailed: if True, sends request per app for its full detail
+    :param fields: (optional) the detail fields to parse for each app
     :return: a list of similar apps
     """
-    s = scraper.PlayScraper(hl, gl)
-    return s.similar(app_id, detailed=detailed)
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
+    return s.similar(app_id, detailed=detailed, fields=fields)
 
 
 def categories(hl="en", gl="us", ignore_promotions=True):
@@ -97,5 +160,5 @@ def categories(hl="en", gl="us", ignore_promotions=True):
 
     Note: May contain some promotions, e.g. "Popular Characters"
     """
-    s = scraper.PlayScraper(hl, gl)
+    s = scraper.PlayScraper(hl, gl, session=get_default_session())
     return s.categories(ignore_promotions)
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.async_scraper
+
+An asyncio version of PlayScraper built on aiohttp. Requires Python 3.5+ and
+the `async` extra, e.g. `pip install play_scraper[async]`.
+"""
+
+import asyncio
+import json
+import logging
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from play_scraper import settings as s
+from play_scraper.retry import RetryPolicy
+from play_scraper.scraper import BaseScraper
+from play_scraper.utils import (
+    build_url,
+    default_headers,
+    detail_fields,
+    generate_post_data,
+    parse_app_details_content,
+    parse_app_ids,
+    parse_card_list,
+    parse_categories,
+    parse_cluster_card_list,
+)
+
+log = logging.getLogger(__name__)
+
+
+class AsyncPlayScraper(BaseScraper):
+    """Coroutine counterparts of PlayScraper's methods. All requests, including
+    every detail page of a detailed list, share one aiohttp connection pool.
+
+    Use as an async context manager, or await `close` when done::
+
+        async with AsyncPlayScraper() as scraper:
+            apps = await scraper.collection("TOP_FREE", detailed=True)
+    """
+
+    def __init__(
+        self,
+        hl="en",
+        gl="us",
+        session=None,
+        limit=s.ASYNC_CONNECTIONS,
+        limit_per_host=s.ASYNC_CONNECTIONS_PER_HOST,
+        timeout=30,
+        parser=s.PARSER,
+        rate_limiter=None,
+        retry_policy=None,
+        parse_executor=None,
+        max_in_flight=s.MAX_IN_FLIGHT,
+    ):
+        """
+        :param hl: the language interface code to request pages in.
+        :param gl: the geolocation country code to request pages from.
+        :param session: (optional) an aiohttp ClientSession to share. If not
+            given, one is created on first use and closed by `close`.
+        :param limit: the total number of simultaneous connections.
+        :param limit_per_host: the number of simultaneous connections per host.
+        :param timeout: number of seconds before timing out a request.
+        :param parser: the backend to parse pages with, 'bs4', 'lxml' or 'json'.
+        :param rate_limiter: (optional) a `ratelimit.TokenBucket` to throttle
+            requests with; share one with other scrapers to share its budget.
+        :param retry_policy: (optional) a `retry.RetryPolicy` to retry failed
+            requests by; defaults to one configured by the RETRY_* settings.
+        :param parse_executor: (optional) an executor, e.g. a
+            ProcessPoolExecutor, to parse pages in, as `PlayScraper` does with
+            `parse_workers`. Pages are never parsed on the event loop; by
+            default, they're parsed in the loop's default thread pool.
+        :param max_in_flight: the maximum number of detail requests a detailed
+            list sends at a time.
+        """
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncPlayScraper requires aiohttp; "
+                "install it with `pip install play_scraper[async]`."
+            )
+        super(AsyncPlayScraper, self).__init__(hl, gl, parser)
+
+        self.session = session
+        self._owns_session = session is None
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        self.parse_executor = parse_executor
+        self.max_in_flight = max_in_flight
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes the scraper's session, if it created one."""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit, limit_per_host=self._limit_per_host
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=default_headers(),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+        return self.session
+
+    async def _send_request(
+        self, method, url, data=None, params=None, allow_redirects=False
+    ):
+        """Sends a request and returns the final url and content of the response.
+        Mirrors `utils.send_request`, raising on any non-200 response.
+        """
+        if not data and method == "POST":
+            data = generate_post_data()
+        params = {k: str(v) for k, v in (params or {}).items()}
+
+        session = self._get_session()
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+            try:
+                async with session.request(
+                    method,
+                    url,
+                    data=data,
+                    params=params,
+                    allow_redirects=allow_redirects,
+                ) as response:
+                    if response.status == 200:
+                        content = await response.read()
+                        return str(response.url), content
+                    if not self.retry_policy.should_retry(attempt, response.status):
+                        # raise_for_status() passes redirects and other 2xx
+                        # and 3xx statuses, which would be retried forever
+                        raise aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                            message=response.reason,
+                            headers=response.headers,
+                        )
+                    delay = self.retry_policy.delay(
+                        attempt, response.headers.get("Retry-After")
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not self.retry_policy.should_retry(attempt):
+                    log.error(e)
+                    raise
+                delay = self.retry_policy.delay(attempt)
+            except aiohttp.ClientError as e:
+                log.error(e)
+                raise
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _parse(self, function, *args):
+        """Runs a parse function in the parse executor, so that building a
+        page's tree doesn't hold up the other requests on the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.parse_executor, function, *args)
+
+    async def _fetch_app_details(self, app_id, fields, semaphore):
+        async with semaphore:
+            url, content = await self._send_request(
+                "GET", build_url("details", app_id), params=self.params
+            )
+        app_json = await self._parse(
+            parse_app_details_content, content, self.parser, fields
+        )
+        app_json.update({"app_id": app_id, "url": url})
+        return app_json
+
+    async def _parse_multiple_apps(self, content, fields=None):
+        """Extracts app ids from a list page's content, fetches every app's
+        details concurrently and returns them in list order. Apps that fail to
+        fetch are logged and left out, as in `multi_futures_app_request`. At
+        most `max_in_flight` requests are sent at a time.
+        """
+        fields = detail_fields(fields)
+        app_ids = await self._parse(parse_app_ids, content, self.parser)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        results = await asyncio.gather(
+            *[self._fetch_app_details(app_id, fields, semaphore) for app_id in app_ids],
+            return_exceptions=True
+        )
+
+        apps = []
+        for app_id, result in zip(app_ids, results):
+            if isinstance(result, Exception):
+                log.error(
+                    "Error occurred fetching {app}: {err}".format(
+                        app=app_id, err=str(result)
+                    )
+                )
+            else:
+                apps.append(result)
+        return apps
+
+    async def details(self, app_id, fields=None):
+        """Sends a GET request and parses an application's details.
+
+        :param app_id: the app to retrieve details, e.g. 'com.nintendo.zaaa'
+        :param fields: (optional) the detail fields to parse. See
+            `PlayScraper.details`.
+        :return: a dictionary of app details
+        """
+        fields = detail_fields(fields)
+        url = build_url("details", app_id)
+
+        try:
+            _, content = await self._send_request("GET", url, params=self.params)
+        except aiohttp.ClientResponseError as e:
+            raise ValueError(
+                "Invalid application ID: {app}. {error}".format(app=app_id, error=e)
+            )
+
+        app_json = await self._parse(
+            parse_app_details_content, content, self.parser, fields
+        )
+        app_json.update({"app_id": app_id, "url": url})
+        return app_json
+
+    async def collection(
+        self,
+        collection_id,
+        category_id=None,
+        results=None,
+        page=None,
+        age=None,
+        detailed=False,
+        fields=None,
+    ):
+        """Sends a POST request and fetches a list of applications belonging to
+        the collection and an optional category. See `PlayScraper.collection`.
+        """
+        url, data, params = self._collection_request(
+            collection_id, category_id, results, page, age
+        )
+        _, content = await self._send_request("POST", url, data, params)
+
+        if detailed:
+            return await self._parse_multiple_apps(content, fields)
+        return await self._parse(parse_card_list, content, self.parser)
+
+    async def developer(
+        self, developer, results=None, page=None, detailed=False, fields=None
+    ):
+        """Sends a POST request and retrieves a list of the developer's
+        published applications. See `PlayScraper.developer`.
+        """
+        url, data = self._developer_request(developer, results, page)
+        _, content = await self._send_request("POST", url, data, self.params)
+
+        if detailed:
+            return await self._parse_multiple_apps(content, fields)
+        return await self._parse(parse_card_list, content, self.parser)
+
+    async def suggestions(self, query):
+        """Sends a GET request and retrieves a list of autocomplete suggestions
+        matching the query term(s). See `PlayScraper.suggestions`.
+        """
+        params = self._suggestions_request(query)
+        _, content = await self._send_request(
+            "GET", self._suggestion_url, params=params
+        )
+        return [q["s"] for q in json.loads(content.decode("utf8"))]
+
+    async def search(self, query, page=None, detailed=False, fields=None):
+        """Sends a POST request and retrieves a list of applications matching
+        the query term(s). See `PlayScraper.search`.
+        """
+        data, params = self._search_request(query, page)
+        _, content = await self._send_request("POST", self._search_url, data, params)
+
+        if detailed:
+            return await self._parse_multiple_apps(content, fields)
+        return await self._parse(parse_cluster_card_list, content, self.parser)
+
+    async def similar(self, app_id, detailed=False, fields=None):
+        """Sends a GET request, follows the redirect, and retrieves a list of
+        applications similar to the specified app. See `PlayScraper.similar`.
+        """
+        url = build_url("similar", app_id)
+        _, content = await self._send_request(
+            "GET", url, params=self.params, allow_redirects=True
+        )
+
+        if detailed:
+            return await self._parse_multiple_apps(content, fields)
+        return await self._parse(parse_cluster_card_list, content, self.parser)
+
+    async def categories(self, ignore_promotions=True):
+        """Sends a GET request to the front page (app store base url), parses
+        and returns a list of all available categories.
+        """
+        _, content = await self._send_request("GET", s.BASE_URL, params=self.params)
+        return await self._parse(
+            parse_categories, content, ignore_promotions, self.parser
+        )
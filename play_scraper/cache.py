@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.cache
+
+An in-process cache of parsed app details, shared by every request that fetches
+them, including the concurrent fan-out of detailed lists.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+
+from play_scraper import instrumentation as instr
+from play_scraper import settings as s
+
+
+def details_cache_key(app_id, params=None, fields=None):
+    """The key an app's details are cached under.
+
+    :param app_id: the app's id
+    :param params: the query parameters the details were requested with
+    :param fields: the detail fields parsed, as returned by
+        `utils.detail_fields`
+    :return: a tuple of the app id, language, country and fields
+    """
+    params = params or {}
+    return (app_id, params.get("hl"), params.get("gl"), fields)
+
+
+class DetailsCache(object):
+    """A thread-safe LRU cache of app details, whose entries expire `ttl`
+    seconds after they're set.
+
+    Loads are coalesced: while one caller is fetching a key, others asking for
+    it wait for and share that result rather than fetching it again.
+    """
+
+    def __init__(self, maxsize=s.CACHE_SIZE, ttl=s.CACHE_TTL, timer=time.time):
+        """
+        :param maxsize: the most entries to keep; the least recently used are
+            evicted first.
+        :param ttl: number of seconds an entry is fresh for.
+        :param timer: the clock entries' ages are measured with.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def _get(self, key):
+        """Returns a fresh entry's value, or None. Must hold the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= self._timer():
+            del self._entries[key]
+            return None
+        # Mark as the most recently used
+        del self._entries[key]
+        self._entries[key] = entry
+        return value
+
+    def get(self, key):
+        """Returns a copy of a key's cached value, or None if it isn't cached
+        or has expired.
+        """
+        with self._lock:
+            value = self._get(key)
+        return copy.deepcopy(value)
+
+    def set(self, key, value):
+        """Caches a copy of a value, evicting the least recently used entries if
+        full.
+        """
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self._timer() + self.ttl, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def begin(self, key):
+        """Looks up a key, claiming its load if it isn't cached or already
+        being loaded.
+
+        :return: a tuple of the key's cached value, or None, and a Future for
+            its load. If the Future is None, the caller has claimed the load
+            and must `finish` or `abandon` it; otherwise another caller is
+            loading it and the Future resolves to a copy of its value.
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                loading = self._loading.get(key)
+                if loading is None:
+                    self._loading[key] = _CopyingFuture()
+
+        if value is not None:
+            instr.emit("cache", cache="details", result="hit")
+            return copy.deepcopy(value), None
+        # Waiting for another caller's load counts as a hit, as it's not fetched
+        instr.emit(
+            "cache", cache="details", result="miss" if loading is None else "hit"
+        )
+        return None, loading
+
+    def finish(self, key, value=None, error=None):
+        """Completes a claimed load, caching its value, or passing its error to
+        the callers waiting for it.
+        """
+        with self._lock:
+            loading = self._loading.pop(key, None)
+        if error is None:
+            self.set(key, value)
+        if loading is not None:
+            if error is None:
+                loading.set_result(copy.deepcopy(value))
+            else:
+                loading.set_exception(error)
+
+    def abandon(self, key):
+        """Gives up a claimed load without a result; callers waiting for it
+        retry the load themselves.
+        """
+        self.finish(key, error=CancelledError())
+
+    def get_or_load(self, key, load):
+        """Returns a copy of a key's cached value, calling `load` to fetch and
+        cache it on a miss. Concurrent misses for the same key share one call.
+
+        :param key: the cache key
+        :param load: a function returning the key's value
+        :return: the key's value
+        """
+        while True:
+            value, loading = self.begin(key)
+            if value is not None:
+                return value
+            if loading is None:
+                break
+            try:
+                return loading.result()
+            except CancelledError:
+                continue
+
+        try:
+            value = load()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, value)
+        return value
+
+
+class _CopyingFuture(Future):
+    """A Future giving each caller its own copy of the result, so that callers
+    sharing a load can't see each other's changes to it.
+    """
+
+    def result(self, timeout=None):
+        return copy.deepcopy(super(_CopyingFuture, self).result(timeout))
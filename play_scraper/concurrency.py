@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.concurrency
+
+Adapts how many detail requests are sent at once to how the server is coping,
+rather than using a fixed number of workers.
+"""
+
+import threading
+
+from play_scraper import settings as s
+
+
+class AIMDConcurrency(object):
+    """A thread-safe limit on concurrent requests, adjusted by additive
+    increase, multiplicative decrease (AIMD), like TCP's congestion window.
+
+    Every request that completes without a sign of congestion raises the limit
+    by `increase / limit`, about `increase` per round of requests. A congested
+    request, one that failed, was throttled or retried, or took over
+    `latency_tolerance` times the baseline latency, multiplies it by
+    `decrease`, at most once per round, as the rest of that round was sent at
+    the old limit.
+    """
+
+    def __init__(
+        self,
+        initial=s.CONCURRENT_REQUESTS,
+        minimum=1,
+        maximum=s.MAX_CONCURRENT_REQUESTS,
+        increase=1,
+        decrease=0.5,
+        latency_tolerance=s.LATENCY_TOLERANCE,
+    ):
+        """
+        :param initial: the limit to start at.
+        :param minimum: the lowest the limit goes.
+        :param maximum: the highest the limit goes, which is also the number of
+            threads needed to reach it.
+        :param increase: how much the limit grows per round of requests.
+        :param decrease: the factor the limit is multiplied by on congestion.
+        :param latency_tolerance: how many times slower than the baseline
+            latency a request may be before it counts as congested. None
+            ignores latency.
+        """
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError(
+                "Limits must satisfy 1 <= minimum <= initial <= maximum, not "
+                "{minimum}, {initial} and {maximum}.".format(
+                    minimum=minimum, initial=initial, maximum=maximum
+                )
+            )
+        if not 0 < decrease < 1:
+            raise ValueError(
+                "decrease must be between 0 and 1, not {d}.".format(d=decrease)
+            )
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.baseline_latency = None
+        self._limit = float(initial)
+        self._completed = 0
+        self._last_decrease = None
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        """The number of requests that may currently be in flight."""
+        return int(self._limit)
+
+    def record(self, latency=None, congested=False):
+        """Adjusts the limit for a completed request.
+
+        :param latency: the request's latency in seconds, if it completed
+        :param congested: if True, the request failed in a way that suggests
+            the server is overloaded, e.g. a connection error, 429 or 5xx
+        """
+        with self._lock:
+            self._completed += 1
+            if latency is not None:
+                congested = self._slow(latency) or congested
+
+            if not congested:
+                self._limit = min(
+                    self.maximum, self._limit + self.increase / self._limit
+                )
+            elif (
+                self._last_decrease is None
+                or self._completed - self._last_decrease >= self._limit
+            ):
+                self._limit = max(self.minimum, self._limit * self.decrease)
+                self._last_decrease = self._completed
+
+    def _slow(self, latency):
+        """Whether a latency is well over the baseline, which tracks the fastest
+        recent requests: it drops to any faster latency at once, and creeps up
+        towards slower ones so it follows lasting changes. Must hold the lock.
+        """
+        baseline = self.baseline_latency
+        if baseline is None or latency < baseline:
+            self.baseline_latency = latency
+            return False
+        self.baseline_latency = baseline + (latency - baseline) * 0.01
+        if not self.latency_tolerance or not baseline:
+            return False
+        return latency > baseline * self.latency_tolerance
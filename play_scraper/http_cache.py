@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.http_cache
+
+A persistent disk cache of GET responses, revalidated with their ETag and
+Last-Modified headers, along with the details parsed from them.
+"""
+
+import base64
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import requests
+from requests.utils import get_encoding_from_headers
+
+from play_scraper import instrumentation as instr
+from play_scraper import settings as s
+from play_scraper.adapters import WrappingAdapter
+
+log = logging.getLogger(__name__)
+
+# Atomically replaces a file, even on Windows; os.rename on Python 2
+_replace = getattr(os, "replace", os.rename)
+
+ENTRY_SUFFIX = ".response"
+PARSED_SUFFIX = ".parsed"
+
+
+def body_digest(body):
+    """A digest of a response body, tying parsed results to the body."""
+    return hashlib.sha1(body).hexdigest()
+
+
+def _encode(value):
+    """Converts a parsed result to JSON, tagging the values JSON can't hold
+    as they are: bytes, tuples, and dicts with keys other than strings, e.g.
+    a rating histogram's.
+    """
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {"__items__": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    return value
+
+
+def _decode(value):
+    """Restores a parsed result from `_encode`."""
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        if "__bytes__" in value:
+            return base64.b64decode(value["__bytes__"])
+        if "__tuple__" in value:
+            return tuple(_decode(item) for item in value["__tuple__"])
+        return dict((_decode(k), _decode(v)) for k, v in value["__items__"])
+    return value
+
+
+class HTTPCache(object):
+    """Stores response bodies and their validators on disk, one file per
+    entry, so a later request for the same url can be sent as a conditional
+    request and answered from disk if it's not modified.
+
+    Files are written to a temporary file and atomically renamed into place,
+    so the cache can be shared by any number of processes. When the cache
+    grows past `max_size` bytes, the least recently used files are evicted.
+    """
+
+    def __init__(self, directory, max_size=s.HTTP_CACHE_SIZE):
+        """
+        :param directory: the directory to keep the cache in.
+        :param max_size: the most bytes the cache's files may take up.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    def key(self, url):
+        """The key a url's response is cached under."""
+        return hashlib.sha1(url.encode("utf8")).hexdigest()
+
+    def _path(self, key, suffix):
+        # Spread entries over subdirectories so none holds too many files
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            _replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self._grow(len(data))
+
+    def get(self, key):
+        """Returns a cached response's metadata and body.
+
+        :param key: the response's key, from `key`
+        :return: a tuple of the metadata dictionary and body bytes, or None if
+            the response isn't cached
+        """
+        data = self._read(self._path(key, ENTRY_SUFFIX))
+        if data is None:
+            return None
+        header, _, body = data.partition(b"\n")
+        try:
+            meta = json.loads(header.decode("utf8"))
+        except ValueError:
+            return None
+        return meta, body
+
+    def set(self, key, meta, body):
+        """Caches a response's body with its metadata: its status, headers and
+        validators.
+        """
+        meta = dict(meta, digest=body_digest(body))
+        header = json.dumps(meta, sort_keys=True).encode("utf8")
+        self._write(self._path(key, ENTRY_SUFFIX), header + b"\n" + body)
+
+    def touch(self, key):
+        """Marks a response as recently used, e.g. after revalidating it."""
+        try:
+            os.utime(self._path(key, ENTRY_SUFFIX), None)
+        except OSError:
+            pass
+
+    def _parsed_path(self, key, variant):
+        variant = hashlib.sha1(variant.encode("utf8")).hexdigest()[:12]
+        return self._path(key, "." + variant + PARSED_SUFFIX)
+
+    def get_parsed(self, key, variant, digest):
+        """Returns what was parsed from a cached response's body.
+
+        :param key: the response's key
+        :param variant: identifies how the body was parsed, e.g. the parser and
+            fields used
+        :param digest: the `body_digest` of the body; results parsed from any
+            other body are ignored
+        :return: the parsed result, or None
+        """
+        data = self._read(self._parsed_path(key, variant))
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data.decode("utf8"))
+            if entry["digest"] != digest:
+                return None
+            return _decode(entry["parsed"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def set_parsed(self, key, variant, digest, parsed):
+        """Stores what was parsed from a response's body, as JSON, so reading
+        a file another process wrote can't run its code. See `get_parsed`.
+        """
+        entry = {"digest": digest, "parsed": _encode(parsed)}
+        data = json.dumps(entry, sort_keys=True).encode("utf8")
+        self._write(self._parsed_path(key, variant), data)
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(ENTRY_SUFFIX) or name.endswith(PARSED_SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _grow(self, size):
+        """Counts bytes written, evicting files once the cache is full. Other
+        processes write to the cache too, so the size is only an estimate
+        between evictions, which recount it.
+        """
+        with self._lock:
+            if self._size is None:
+                # The first count includes the file just written
+                self._size = sum(size for _, size, _ in self._files())
+            else:
+                self._size += size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """Removes the least recently used files until the cache is at 90% of
+        its maximum size, leaving room for new entries. Must hold the lock.
+        """
+        files = sorted(self._files())
+        self._size = sum(size for _, size, _ in files)
+        target = self.max_size * 0.9
+        for _, size, path in files:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+
+class CachingAdapter(WrappingAdapter):
+    """A transport adapter that caches GET responses in an `HTTPCache`.
+
+    Responses with an ETag or Last-Modified header are stored, and requests
+    for a stored url are sent with If-None-Match and If-Modified-Since. A 304
+    Not Modified reply is turned into a 200 with the stored body, so callers
+    can't tell it from a full response, except that its `from_cache` is True.
+
+    Cached responses are given `http_cache`, `cache_key` and `cache_digest`
+    attributes, which `utils.parse_app_details_response` uses to store and
+    reuse what's parsed from them.
+    """
+
+    def __init__(self, http_cache, adapter=None):
+        """
+        :param http_cache: the `HTTPCache` to store responses in.
+        :param adapter: the adapter to send requests with; defaults to a new
+            HTTPAdapter.
+        """
+        super(CachingAdapter, self).__init__(adapter)
+        self.http_cache = http_cache
+
+    def send(self, request, **kwargs):
+        if request.method != "GET" or kwargs.get("stream"):
+            return self.adapter.send(request, **kwargs)
+
+        key = self.http_cache.key(request.url)
+        entry = self.http_cache.get(key)
+        if entry is not None:
+            meta = entry[0]
+            request = request.copy()
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.adapter.send(request, **kwargs)
+        response.from_cache = False
+        if response.status_code != requests.codes.not_modified:
+            instr.emit("cache", cache="http", result="miss", url=request.url)
+
+        if response.status_code == requests.codes.not_modified and entry is not None:
+            meta, body = entry
+            self.http_cache.touch(key)
+            self._from_cache(response, meta, body)
+            instr.emit("cache", cache="http", result="hit", url=request.url)
+        elif response.status_code == requests.codes.ok and self._storable(response):
+            meta = {
+                "url": request.url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_type": response.headers.get("Content-Type"),
+            }
+            try:
+                self.http_cache.set(key, meta, response.content)
+            except (IOError, OSError) as e:
+                log.warning(
+                    "Could not cache {url}: {err}".format(url=request.url, err=e)
+                )
+                return response
+        else:
+            return response
+
+        response.http_cache = self.http_cache
+        response.cache_key = key
+        response.cache_digest = body_digest(response.content)
+        return response
+
+    def _storable(self, response):
+        if not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            return False
+        return "no-store" not in response.headers.get("Cache-Control", "")
+
+    def _from_cache(self, response, meta, body):
+        response.status_code = requests.codes.ok
+        response.reason = "OK"
+        if meta.get("content_type"):
+            response.headers["Content-Type"] = meta["content_type"]
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response._content_consumed = True
+        response.from_cache = True
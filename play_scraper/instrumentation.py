@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.instrumentation
+
+Timed events for each phase of a scraper's work, passed to listeners, e.g. to
+feed a tracing system.
+
+An `Instrumentation` is made active on the current thread for the duration of
+a scraper call with `activate`. The requests and parse functions it runs then
+emit events to it, tagged with the call's tags, such as its method, hl and gl.
+With no instrumentation active, emitting events costs a thread-local lookup.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from play_scraper.adapters import WrappingAdapter
+
+log = logging.getLogger(__name__)
+
+# The clock durations are measured with
+clock = getattr(time, "perf_counter", time.time)
+_local = threading.local()
+
+# An event emitted by an instrumented phase:
+#   name: the phase, e.g. 'request', 'ttfb', 'bytes_received', 'soup' or 'parse'
+#   start: the wall clock time the phase started at, in seconds since the epoch
+#   duration: how long the phase took in seconds, or None
+#   value: a measurement other than the duration, e.g. the bytes received
+#   tags: a dictionary of what the phase belongs to, e.g. method and app_id
+Event = namedtuple("Event", ["name", "start", "duration", "value", "tags"])
+
+
+class Instrumentation(object):
+    """A registry of listeners, each called with every `Event` emitted while
+    this instrumentation is active. Listeners are called on the thread the
+    event was emitted on, which may be one of the request threads, so they
+    should be thread-safe and quick. Errors raised by listeners are logged.
+    """
+
+    def __init__(self, listeners=()):
+        """
+        :param listeners: (optional) functions to call with each `Event`.
+        """
+        self._listeners = tuple(listeners)
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Registers a function to call with each `Event`."""
+        with self._lock:
+            self._listeners += (listener,)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            listeners = list(self._listeners)
+            listeners.remove(listener)
+            self._listeners = tuple(listeners)
+
+    def emit(self, event):
+        # Listeners are replaced, not mutated, so needn't be read under the lock
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                log.exception(
+                    "Instrumentation listener {listener!r} failed".format(
+                        listener=listener
+                    )
+                )
+
+    def activate(self, **tags):
+        """Makes this instrumentation active on the current thread, within a
+        `with` block, tagging its events with `tags` and any tags already
+        active.
+        """
+        return activated(_Context(self, dict(_current_tags(self), **tags)))
+
+
+class _Context(object):
+    """An active instrumentation and its tags."""
+
+    __slots__ = ("instrumentation", "tags")
+
+    def __init__(self, instrumentation, tags):
+        self.instrumentation = instrumentation
+        self.tags = tags
+
+    def tagged(self, **tags):
+        """Returns a copy of the context with tags added or replaced."""
+        return _Context(self.instrumentation, dict(self.tags, **tags))
+
+    def emit(self, name, start=None, duration=None, value=None, **tags):
+        start = time.time() if start is None else start
+        self.instrumentation.emit(
+            Event(name, start, duration, value, dict(self.tags, **tags))
+        )
+
+
+def _current_tags(instrumentation):
+    context = current()
+    if context is None or context.instrumentation is not instrumentation:
+        return {}
+    return context.tags
+
+
+def current():
+    """Returns the context active on this thread, to carry to another thread
+    with `activated`, or None.
+    """
+    return getattr(_local, "context", None)
+
+
+def tagged(**tags):
+    """Returns the active context with tags added or replaced, or None."""
+    context = current()
+    return None if context is None else context.tagged(**tags)
+
+
+@contextmanager
+def activated(context):
+    """Makes a context, e.g. from `current` on another thread, active within a
+    `with` block. Does nothing if it's None.
+    """
+    previous = current()
+    _local.context = context
+    try:
+        yield context
+    finally:
+        _local.context = previous
+
+
+def emit(name, start=None, duration=None, value=None, **tags):
+    """Emits an event to the active instrumentation, if any."""
+    context = current()
+    if context is not None:
+        context.emit(name, start, duration, value, **tags)
+
+
+@contextmanager
+def span(name, **tags):
+    """Emits an event timing the `with` block, if any instrumentation is
+    active.
+    """
+    context = current()
+    if context is None:
+        yield
+        return
+
+    start, started = time.time(), clock()
+    try:
+        yield
+    finally:
+        context.emit(name, start, clock() - started, **tags)
+
+
+def timed(function):
+    """Decorates a parse function to emit a 'parse' event timing each call,
+    tagged with the function's module and name.
+    """
+    tags = {"function": function.__name__, "module": function.__module__}
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        context = current()
+        if context is None:
+            return function(*args, **kwargs)
+
+        start, started = time.time(), clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            context.emit("parse", start, clock() - started, **tags)
+
+    return wrapper
+
+
+def iter_activated(iterator, context):
+    """Iterates over an iterator with a context active while each item is
+    produced, e.g. to carry a call's context to the generator it returns.
+    """
+    iterator = iter(iterator)
+    while True:
+        with activated(context):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def _call_in(context, function, *args, **kwargs):
+    with activated(context):
+        return function(*args, **kwargs)
+
+
+class ContextExecutor(ThreadPoolExecutor):
+    """A ThreadPoolExecutor that runs each call with the context it was
+    submitted in active, so the requests a FuturesSession sends on its threads
+    emit events to the caller's instrumentation.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        context = current()
+        if context is None:
+            return super(ContextExecutor, self).submit(fn, *args, **kwargs)
+        return super(ContextExecutor, self).submit(
+            _call_in, context, fn, *args, **kwargs
+        )
+
+
+class InstrumentedAdapter(WrappingAdapter):
+    """A transport adapter that emits the events of each request it sends,
+    tagged with its `url` and response `status`:
+
+        request_start, when it's sent
+        request, timing it from being sent to its body being read
+        ttfb, the time to the response's headers, including connecting
+        bytes_received, the size of the body, timing it being read
+        request_error, timing it until it failed, tagged with the `error`
+
+    Responses' `latency` attribute is their time to first byte, which, unlike
+    their `elapsed`, leaves out any time spent throttled or backing off
+    before retrying by the adapters it's wrapped in.
+    """
+
+    def send(self, request, **kwargs):
+        context = current()
+        if context is None:
+            started = clock()
+            response = self.adapter.send(request, **kwargs)
+            response.latency = clock() - started
+            return response
+
+        context.emit("request_start", url=request.url)
+        start, started = time.time(), clock()
+        try:
+            response = self.adapter.send(request, **kwargs)
+            ttfb = response.latency = clock() - started
+            content = None if kwargs.get("stream") else response.content
+        except Exception as e:
+            context.emit(
+                "request_error",
+                start,
+                clock() - started,
+                url=request.url,
+                error=type(e).__name__,
+            )
+            raise
+        total = clock() - started
+
+        tags = {"url": request.url, "status": response.status_code}
+        context.emit("request", start, total, **tags)
+        context.emit("ttfb", start, ttfb, **tags)
+        context.emit(
+            "bytes_received", start + ttfb, total - ttfb, len(content or b""), **tags
+        )
+        return response
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.json_parser
+
+Parses app details from the data Play embeds in its pages' `AF_initDataCallback`
+scripts, rather than from the HTML, so a details page's DOM needn't be built.
+Returns the same dictionaries as the other parsers. The few fields the data
+doesn't hold are parsed from the DOM with `play_scraper.lxml_parser`, so asking
+for only `JSON_FIELDS` skips building it entirely.
+
+List pages are parsed with `play_scraper.lxml_parser`.
+"""
+
+import json
+import re
+import time
+
+from play_scraper import instrumentation as instr
+from play_scraper import lxml_parser
+from play_scraper.lxml_parser import (  # noqa: F401
+    parse_app_ids,
+    parse_card_list,
+    parse_category_links,
+    parse_cluster_card_list,
+)
+from play_scraper.utils import DETAIL_FIELDS
+
+CALLBACK_RE = re.compile(r"AF_initDataCallback\((.*?)\);?\s*</script>", re.DOTALL)
+KEY_RE = re.compile(r"key:\s*'(ds:\d+)'")
+DATA_RE = re.compile(r"data:\s*(?:function\(\)\{\s*return\s*)?(\[.*\])", re.DOTALL)
+
+MONTHS = [
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+]
+
+
+def _get(data, *path):
+    """Follows a path of indexes into nested lists, returning None if any of
+    them is missing.
+    """
+    for index in path:
+        try:
+            data = data[index]
+        except (IndexError, KeyError, TypeError):
+            return None
+    return data
+
+
+def _split(value, separator, index=0):
+    if value is None:
+        return None
+    parts = value.split(separator)
+    return parts[index] if len(parts) > index else None
+
+
+def _date(timestamp):
+    """Formats a unix timestamp the way the page shows dates in English, e.g.
+    'September 12, 2019'.
+    """
+    if timestamp is None:
+        return None
+    date = time.gmtime(timestamp)
+    return "{month} {day}, {year}".format(
+        month=MONTHS[date.tm_mon - 1], day=date.tm_mday, year=date.tm_year
+    )
+
+
+def _description(html):
+    if html is None:
+        return None
+    return lxml_parser._stripped_text(lxml_parser.parse_fragment(html))
+
+
+def _description_html(html):
+    if html is None:
+        return None
+    return lxml_parser._encode_contents(lxml_parser.parse_fragment(html))
+
+
+def _recent_changes(html):
+    if html is None:
+        return None
+    return lxml_parser._lines_text(lxml_parser.parse_fragment(html))
+
+
+def _histogram(ratings):
+    if _get(ratings, 2, 1) is None:
+        return {}
+    return {stars: _get(ratings, 1, stars, 1) for stars in range(5, 0, -1)}
+
+
+def _price(offer):
+    if offer is None:
+        return None
+    return "0" if _get(offer, 0) == 0 else _get(offer, 2)
+
+
+def _content_rating(rating):
+    if _get(rating, 0) is None:
+        return None
+    descriptor = _get(rating, 2, 1)
+    return [rating[0]] + ([descriptor] if descriptor else [])
+
+
+def _iap_range(iap):
+    iaps = re.search(r"(\$\d+\.\d{2}) - (\$\d+\.\d{2})", iap or "")
+    return iaps.groups() if iaps else None
+
+
+def _strip(value):
+    return value.strip() if value is not None else None
+
+
+# Maps each detail field to the dataset it's in, and a function extracting it
+# from that dataset's data. The datasets are:
+#   ds:3, the app's offer and price
+#   ds:5, the app's listing: title, description, media, developer and info
+#   ds:6, the app's ratings
+#   ds:8, the app's version, size and required Android version
+JSON_FIELDS = {
+    "title": ("ds:5", lambda d: _get(d, 0, 0, 0)),
+    "icon": ("ds:5", lambda d: _split(_get(d, 0, 12, 1, 3, 2), "=")),
+    "screenshots": (
+        "ds:5",
+        lambda d: [_get(image, 3, 2) for image in _get(d, 0, 12, 0) or []],
+    ),
+    "video": ("ds:5", lambda d: _split(_get(d, 0, 12, 3, 0, 3, 2), "?")),
+    "category": (
+        "ds:5",
+        lambda d: [
+            genre
+            for genre in (_get(d, 0, 12, 13, 0, 2), _get(d, 0, 12, 13, 1, 2))
+            if genre
+        ],
+    ),
+    "score": ("ds:6", lambda d: _get(d, 0, 6, 0, 0)),
+    "histogram": ("ds:6", lambda d: _histogram(_get(d, 0, 6))),
+    "reviews": ("ds:6", lambda d: _get(d, 0, 6, 2, 1) or 0),
+    "description": ("ds:5", lambda d: _description(_get(d, 0, 10, 0, 1))),
+    "description_html": ("ds:5", lambda d: _description_html(_get(d, 0, 10, 0, 1))),
+    "recent_changes": ("ds:5", lambda d: _recent_changes(_get(d, 0, 12, 6, 1))),
+    "price": ("ds:3", lambda d: _price(_get(d, 0, 2, 0, 0, 0, 1, 0))),
+    "free": ("ds:3", lambda d: _price(_get(d, 0, 2, 0, 0, 0, 1, 0)) == "0"),
+    "iap": ("ds:5", lambda d: bool(_iap_range(_get(d, 0, 12, 12, 0)))),
+    "developer_id": ("ds:5", lambda d: _split(_get(d, 0, 12, 5, 5, 4, 2), "=", 1)),
+    "updated": ("ds:5", lambda d: _date(_get(d, 0, 12, 8, 0))),
+    "size": ("ds:8", lambda d: _get(d, 0)),
+    "installs": ("ds:5", lambda d: _get(d, 0, 12, 9, 0)),
+    "current_version": ("ds:8", lambda d: _get(d, 1)),
+    "required_android_version": ("ds:8", lambda d: _get(d, 2)),
+    "content_rating": ("ds:5", lambda d: _content_rating(_get(d, 0, 12, 4))),
+    "iap_range": ("ds:5", lambda d: _iap_range(_get(d, 0, 12, 12, 0))),
+    "developer": ("ds:5", lambda d: _get(d, 0, 12, 5, 1)),
+    "developer_email": ("ds:5", lambda d: _get(d, 0, 12, 5, 2, 0)),
+    "developer_url": ("ds:5", lambda d: _get(d, 0, 12, 5, 3, 5, 2)),
+    "developer_address": ("ds:5", lambda d: _strip(_get(d, 0, 12, 5, 4, 0))),
+}
+
+
+@instr.timed
+def parse_datasets(content):
+    """Extracts the data from every `AF_initDataCallback` script on a page.
+
+    :param content: the page's response content
+    :return: a dictionary of each dataset's data keyed by its key, e.g. 'ds:5'
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf8", "replace")
+
+    datasets = {}
+    for callback in CALLBACK_RE.findall(content):
+        key = KEY_RE.search(callback)
+        data = DATA_RE.search(callback)
+        if key is None or data is None:
+            continue
+        try:
+            datasets[key.group(1)] = json.loads(data.group(1))
+        except ValueError:
+            continue
+    return datasets
+
+
+@instr.timed
+def parse_app_details_content(content, fields=None):
+    """Parses an app's details from the raw content of its details page, using
+    the page's embedded data where it has the field.
+
+    :param content: the details page's response content
+    :param fields: (optional) the detail fields to parse, as returned by
+        `utils.detail_fields`
+    :return: a dictionary of app details
+    """
+    datasets = parse_datasets(content)
+
+    data = {}
+    dom_fields = set()
+    for field in DETAIL_FIELDS if fields is None else fields:
+        if field in JSON_FIELDS and JSON_FIELDS[field][0] in datasets:
+            dataset, extract = JSON_FIELDS[field]
+            data[field] = extract(datasets[dataset])
+        else:
+            # Not in the embedded data, or the page didn't have it
+            dom_fields.add(field)
+
+    if dom_fields:
+        data.update(
+            lxml_parser.parse_app_details(
+                lxml_parser.parse_html(content), frozenset(dom_fields)
+            )
+        )
+    return data
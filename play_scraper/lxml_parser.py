@@ -0,0 +1,676 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.lxml_parser
+
+Parsers equivalent to the BeautifulSoup ones in `play_scraper.utils`, working
+directly on lxml trees with precompiled XPath expressions. Each returns the
+same dictionaries as its BeautifulSoup counterpart.
+"""
+
+import re
+
+try:
+    from urlparse import urljoin
+except ImportError:
+    from urllib.parse import urljoin
+try:
+    basestring
+except NameError:
+    basestring = str
+
+import lxml.html
+from lxml import etree
+
+from play_scraper import instrumentation as instr
+from play_scraper import settings as s
+from play_scraper.utils import _additional_info_fields, _wants, extract_id_query
+
+HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+# Elements BeautifulSoup serializes as self-closing, e.g. <br/>
+VOID_ELEMENTS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "keygen",
+    "link",
+    "menuitem",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+    "basefont",
+    "bgsound",
+    "command",
+    "frame",
+    "image",
+    "isindex",
+    "nextid",
+    "spacer",
+}
+
+
+# Attributes bs4 splits into lists of values, and so rejoins with single spaces
+LIST_ATTRIBUTES = {
+    "*": {"accesskey", "class", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+
+
+def _class(name):
+    """An XPath predicate matching elements with the CSS class `name`."""
+    return "contains(concat(' ', normalize-space(@class), ' '), ' {} ')".format(name)
+
+
+def _xpath(path):
+    return etree.XPath(path, smart_strings=False)
+
+
+# parse_app_details
+TITLE = _xpath('//h1[@itemprop="name"]//span')
+ICON = _xpath('//img[@class="T75of sHb2Xb"]/@src')
+EDITORS_CHOICE = _xpath('//meta[@itemprop="editorsChoiceBadgeUrl"]')
+GENRE_HREFS = _xpath('//a[@itemprop="genre"]/@href')
+SCREENSHOTS = _xpath(
+    "//img[{}][ancestor::button[{}]]".format(_class("DYfLw"), _class("Q4vdJd"))
+)
+VIDEO = _xpath('//button[starts-with(@data-trailer-url, "https")]')
+DESCRIPTION = _xpath('//div[@itemprop="description"]//span//div')
+RECENT_CHANGES = _xpath('//div[@itemprop="description"]//content')
+SCORE = _xpath("//div[{}]".format(_class("BHMmbe")))
+REVIEWS = _xpath(
+    "//span[substring(@aria-label, string-length(@aria-label) - 6) = 'ratings']"
+)
+RATINGS_SECTION = _xpath("//div[{}]".format(_class("VEF2C")))
+RATINGS = _xpath('.//span[starts-with(@style, "width:")][ancestor::div]')
+PRICE = _xpath('//meta[@itemprop="price"]')
+PREREGISTERED = _xpath("//not-preregistered")
+ADDITIONAL_INFO = _xpath("//*[{}]".format(_class("IxB2fe")))
+DEVELOPER_LINK = _xpath("//a[{}][{}]".format(_class("hrTbp"), _class("R8zArc")))
+
+# parse_additional_info
+SECTION_TITLES = _xpath(
+    ".//div[{}][ancestor::div[{}]]".format(_class("BgcNfc"), _class("hAyfc"))
+)
+SECTION_VALUE = _xpath(".//span[{}]".format(_class("htlgb")))
+MAILTO_LINK = _xpath('.//a[starts-with(@href, "mailto:")]')
+HTTP_LINK = _xpath('.//a[starts-with(@href, "http")]')
+DIVS = _xpath(".//div")
+
+# parse_card_info
+CARDS = _xpath('//div[@data-uitype="500"]')
+CARD_URL = _xpath(".//a[{}]".format(_class("card-click-target")))
+CARD_ICON = _xpath(".//img[{}]".format(_class("cover-image")))
+CARD_TITLE = _xpath(".//a[{}]".format(_class("title")))
+CARD_DEVELOPER = _xpath(".//a[{}]".format(_class("subtitle")))
+CARD_DESCRIPTION = _xpath(".//div[{}]".format(_class("description")))
+CARD_SCORE = _xpath(".//div[{}]".format(_class("tiny-star")))
+CARD_PRICE = _xpath(".//span[{}]".format(_class("display-price")))
+CARD_PREREGISTER_PRICE = _xpath(".//a[{}]".format(_class("price")))
+CARD_FULL_PRICE = _xpath(".//span[{}]".format(_class("full-price")))
+
+# parse_cluster_card_info
+CLUSTER_CARDS = _xpath("//div[{}]".format(_class("Vpfmgd")))
+CLUSTER_ICON = _xpath(".//img")
+CLUSTER_DETAILS = _xpath(".//div[{}]".format(_class("RZEgze")))
+CLUSTER_URL = _xpath(".//a[parent::div[{}]]".format(_class("p63iDd")))
+CLUSTER_TITLE = _xpath(".//div[{}][{}]".format(_class("WsMG1c"), _class("nnK0zc")))
+CLUSTER_DEVELOPER_LINK = _xpath(".//a[{}]".format(_class("mnKHRc")))
+CLUSTER_DEVELOPER = _xpath(".//div[{}]".format(_class("KoLSrc")))
+CLUSTER_DESCRIPTION = _xpath(".//div[{}][{}]".format(_class("b8cIId"), _class("f5NCO")))
+CLUSTER_SCORE = _xpath(".//div[ancestor::div[{}]]".format(_class("pf5lIe")))
+CLUSTER_PRICE = _xpath(".//span[{}][ancestor::button]".format(_class("VfPpfd")))
+CLUSTER_FULL_PRICE = _xpath(".//span[{}][ancestor::button]".format(_class("SUZt4c")))
+
+# parse_app_ids
+PREVIEW_DOC_IDS = _xpath(
+    "//span[{}]/@data-docid".format(_class("preview-overlay-container"))
+)
+CLUSTER_HREFS = _xpath("//a[parent::div[{}]]/@href".format(_class("p63iDd")))
+
+# parse_category_links
+CATEGORY_LINKS = _xpath(
+    '//a[contains(@href, "category")]'
+    '[ancestor::div[contains(@id, "action-dropdown-children")]]'
+)
+
+
+def _first(xpath, element):
+    """Returns the first match of a compiled XPath, or None, like bs4's
+    `select_one`.
+    """
+    matches = xpath(element)
+    return matches[0] if matches else None
+
+
+def _text(element):
+    """All of an element's text, like bs4's `Tag.text`."""
+    return "".join(element.itertext())
+
+
+def _contents(element):
+    """An element's children, with its text and its children's tails as
+    strings in between, like bs4's `Tag.contents`.
+    """
+    contents = []
+    if element.text:
+        contents.append(element.text)
+    for child in element:
+        contents.append(child)
+        if child.tail:
+            contents.append(child.tail)
+    return contents
+
+
+def _string(element):
+    """An element's only string, or None, like bs4's `Tag.string`."""
+    contents = _contents(element)
+    if len(contents) != 1:
+        return None
+    child = contents[0]
+    if isinstance(child, basestring) or not isinstance(child.tag, str):
+        # Text, or a comment, which bs4 also treats as a string
+        return child if isinstance(child, basestring) else child.text
+    return _string(child)
+
+
+def _next_sibling(element):
+    """An element's next sibling node, like bs4's `next_sibling`; that's its
+    tail if it has one, otherwise the next element.
+    """
+    if element.tail:
+        return element.tail
+    return element.getnext()
+
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote_attribute(value):
+    value = _escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"{}"'.format(value.replace('"', "&quot;"))
+        return "'{}'".format(value)
+    return '"{}"'.format(value)
+
+
+def _serialize(node):
+    """Serializes a node the way bs4 does with its default 'minimal' formatter,
+    so `encode_contents` output is byte for byte the same.
+    """
+    if isinstance(node, basestring):
+        return _escape(node)
+    if node.tag is etree.Comment:
+        return "<!--{}-->".format(node.text or "")
+    if not isinstance(node.tag, str):
+        return ""
+
+    list_attributes = LIST_ATTRIBUTES["*"] | LIST_ATTRIBUTES.get(node.tag, set())
+    attrs = "".join(
+        " {}={}".format(
+            name,
+            _quote_attribute(
+                " ".join(value.split()) if name in list_attributes else value
+            ),
+        )
+        for name, value in sorted(node.attrib.items())
+    )
+    contents = _contents(node)
+    if not contents and node.tag in VOID_ELEMENTS:
+        return "<{}{}/>".format(node.tag, attrs)
+    return "<{tag}{attrs}>{contents}</{tag}>".format(
+        tag=node.tag,
+        attrs=attrs,
+        contents="".join(_serialize(child) for child in contents),
+    )
+
+
+def _stripped_text(element):
+    """An element's non-blank strings, stripped, one per line, like joining
+    bs4's `stripped_strings`.
+    """
+    return "\n".join(text.strip() for text in element.itertext() if text.strip())
+
+
+def _lines_text(element):
+    """Each of an element's children's strings, stripped, one per line, with a
+    blank line for children without a single string, e.g. <br>.
+    """
+    return "\n".join(
+        [
+            x.strip() if isinstance(x, basestring) else (_string(x) or "").strip()
+            for x in _contents(element)
+        ]
+    )
+
+
+def _encode_contents(element):
+    """An element's inner HTML as utf-8 bytes, like bs4's `encode_contents`."""
+    return "".join(_serialize(child) for child in _contents(element)).encode("utf8")
+
+
+def parse_html(content):
+    """Parses page content into an lxml document.
+
+    :param content: the page's response content, as bytes
+    :return: an lxml HtmlElement of the document root
+    """
+    with instr.span("soup", parser="lxml"):
+        return lxml.html.document_fromstring(content, parser=HTML_PARSER)
+
+
+def parse_fragment(html):
+    """Parses a snippet of HTML, e.g. an app's description, into an element
+    whose contents are the snippet.
+
+    :param html: the HTML snippet, as text
+    :return: an lxml HtmlElement wrapping the snippet
+    """
+    return lxml.html.fragment_fromstring(html, create_parent="div")
+
+
+@instr.timed
+def parse_additional_info(element, fields=None):
+    """Parses an app's additional information section on its detail page.
+
+    :param element: the additional_info section lxml element
+    :param fields: (optional) the additional info fields to parse; sections
+        for other fields are skipped and left as None
+    :return: a dictionary of the app's parsed additional info
+    """
+    title_normalization = {
+        "Updated": "updated",
+        "Size": "size",
+        "Installs": "installs",
+        "Current Version": "current_version",
+        "Requires Android": "required_android_version",
+        "Content Rating": "content_rating",
+        "In-app Products": "iap_range",
+        "Interactive Elements": "interactive_elements",
+        "Offered By": "developer",
+        "Developer": "developer_info",
+    }
+
+    data = {
+        "updated": None,
+        "size": None,
+        "installs": None,
+        "current_version": None,
+        "required_android_version": None,
+        "content_rating": None,
+        "iap_range": None,
+        "interactive_elements": None,
+        "developer": None,
+        "developer_email": None,
+        "developer_url": None,
+        "developer_address": None,
+    }
+
+    for title_div in SECTION_TITLES(element):
+        section_title = _string(title_div)
+        if section_title in title_normalization:
+            title_key = title_normalization[section_title]
+            if title_key == "developer_info":
+                wanted = _wants(
+                    fields, "developer_email", "developer_url", "developer_address"
+                )
+            else:
+                wanted = _wants(fields, title_key)
+            if not wanted:
+                continue
+
+            sibling = _next_sibling(title_div)
+            if not hasattr(sibling, "tag"):
+                # bs4 would fail the same way on a text or missing sibling
+                raise AttributeError(
+                    "Section value of '{}' is not an element".format(section_title)
+                )
+            value_div = _first(SECTION_VALUE, sibling)
+
+            if title_key == "content_rating":
+                # last string in list is 'Learn more' link
+                value = [rating.strip() for rating in value_div.itertext()][:-1]
+            elif title_key == "interactive_elements":
+                value = [ielement.strip() for ielement in value_div.itertext()]
+            elif title_key == "iap_range":
+                iaps = re.search(r"(\$\d+\.\d{2}) - (\$\d+\.\d{2})", _string(value_div))
+                if iaps:
+                    value = iaps.groups()
+            elif title_key == "developer_info":
+                developer_email = _first(MAILTO_LINK, value_div)
+                if developer_email is not None:
+                    developer_email = developer_email.attrib["href"].split(":")[1]
+                developer_url = _first(HTTP_LINK, value_div)
+                if developer_url is not None:
+                    developer_url = developer_url.attrib["href"]
+
+                developer_address = _contents(DIVS(value_div)[-1])[0]
+                if not isinstance(developer_address, basestring):
+                    # An element, e.g. 'a', rather than the address text
+                    developer_address = None
+                if developer_address is not None:
+                    developer_address = developer_address.strip()
+
+                data.update(
+                    {
+                        "developer_email": developer_email,
+                        "developer_url": developer_url,
+                        "developer_address": developer_address,
+                    }
+                )
+                continue
+            else:
+                value = _text(value_div)
+
+            data[title_key] = value
+    return data
+
+
+@instr.timed
+def parse_app_details(doc, fields=None):
+    """Extracts an app's details from its info page.
+
+    :param doc: an lxml document of an app's details page
+    :param fields: (optional) the detail fields to parse, as returned by
+        `utils.detail_fields`; the others aren't parsed and are left out
+    :return: a dictionary of app details
+    """
+    data = {}
+
+    if _wants(fields, "title"):
+        data["title"] = _text(TITLE(doc)[0])
+    if _wants(fields, "icon"):
+        data["icon"] = ICON(doc)[0].split("=")[0]
+
+    if _wants(fields, "screenshots"):
+        screenshots = []
+        for img in SCREENSHOTS(doc):
+            src = img.get("src")
+            if src is None or not src.startswith("https://"):
+                src = img.get("data-src")
+            screenshots.append(src)
+        data["screenshots"] = screenshots
+
+    if _wants(fields, "video"):
+        video = _first(VIDEO, doc)
+        if video is not None:
+            video = video.get("data-trailer-url").split("?")[0]
+        data["video"] = video
+
+    if _wants(fields, "category"):
+        # Main category will be first
+        data["category"] = [href.split("/")[-1] for href in GENRE_HREFS(doc)]
+
+    # Reviews & Ratings
+    if _wants(fields, "score"):
+        score = _first(SCORE, doc)
+        data["score"] = _text(score) if score is not None else None
+
+    if _wants(fields, "histogram", "reviews"):
+        histogram = {}
+        reviews_element = _first(REVIEWS, doc)
+        ratings_section = _first(RATINGS_SECTION, doc)
+        if reviews_element is None or ratings_section is None:
+            reviews = 0
+        else:
+            reviews = int(_text(reviews_element).replace(",", ""))
+            num_ratings = [
+                (
+                    int(rating.get("title").replace(",", ""))
+                    if rating.get("title")
+                    else None
+                )
+                for rating in RATINGS(ratings_section)
+            ]
+            for i in range(5):
+                histogram[5 - i] = num_ratings[i]
+        data.update({"histogram": histogram, "reviews": reviews})
+
+    if _wants(fields, "description", "description_html"):
+        description_element = _first(DESCRIPTION, doc)
+        if description_element is None:
+            description = description_html = None
+        else:
+            description = _stripped_text(description_element)
+            description_html = None
+            if _wants(fields, "description_html"):
+                description_html = _encode_contents(description_element)
+        data.update({"description": description, "description_html": description_html})
+
+    if _wants(fields, "recent_changes"):
+        changes = RECENT_CHANGES(doc)
+        recent_changes = None
+        if len(changes) > 1:
+            recent_changes = _lines_text(changes[1])
+        data["recent_changes"] = recent_changes
+
+    if _wants(fields, "editors_choice"):
+        data["editors_choice"] = bool(EDITORS_CHOICE(doc))
+
+    if _wants(fields, "price", "free"):
+        price = _first(PRICE, doc)
+        if price is not None:
+            price = price.attrib["content"]
+        else:
+            # App is probably pre-register, requires logged in to see
+            preregistered = _first(PREREGISTERED, doc)
+            price = _string(preregistered) if preregistered is not None else None
+            if price is not None:
+                price = price.strip()
+        data.update({"price": price, "free": price == "0"})
+
+    if _wants(fields, "developer_id"):
+        href_parts = DEVELOPER_LINK(doc)[0].attrib["href"].split("=")
+        dev_id = href_parts[1] if len(href_parts) > 1 else None
+        data["developer_id"] = dev_id if dev_id else None
+
+    info_fields = _additional_info_fields(fields)
+    if info_fields:
+        additional_info_data = parse_additional_info(
+            ADDITIONAL_INFO(doc)[0], info_fields
+        )
+        data["iap"] = bool(additional_info_data.get("iap_range"))
+        data.update(additional_info_data)
+
+    if fields is not None:
+        data = {field: data[field] for field in fields}
+    return data
+
+
+@instr.timed
+def parse_cluster_card_info(element):
+    """Extracts basic app info from an app's card on a /cluster page.
+
+    :param element: an lxml element of an app's card
+    :return: a dictionary of available basic app info
+    """
+    icon = _first(CLUSTER_ICON, element)
+
+    details = CLUSTER_DETAILS(element)[0]
+    relative_url = _first(CLUSTER_URL, details)
+    url = relative_url.get("href") if relative_url is not None else None
+
+    app_id = None
+    if url:
+        app_id = extract_id_query(url)
+
+    title = _first(CLUSTER_TITLE, details)
+
+    developer_link = _first(CLUSTER_DEVELOPER_LINK, details)
+    developer = None
+    developer_id = None
+    if developer_link is not None:
+        developer = _first(CLUSTER_DEVELOPER, developer_link)
+        developer_url = developer_link.get("href") if developer is not None else None
+        developer_id = extract_id_query(developer_url)
+
+    description = _first(CLUSTER_DESCRIPTION, details)
+
+    score_element = _first(CLUSTER_SCORE, details)
+    score = None
+    if score_element is not None:
+        matches = re.search(r"([0-9]\.[0-9]) star", _text(score_element))
+        score = matches.groups()[0] if matches else None
+
+    price = _first(CLUSTER_PRICE, details)
+    if price is not None:
+        price = _text(price)
+
+    full_price = _first(CLUSTER_FULL_PRICE, details)
+    if full_price is not None:
+        full_price = _text(full_price)
+
+    free = price is None
+    if free is True:
+        price = "0"
+        full_price = "0"
+
+    return {
+        "app_id": app_id,
+        "url": url,
+        "icon": icon.get("data-src") if icon is not None else None,
+        "title": _text(title) if title is not None else None,
+        "developer": _text(developer) if developer is not None else None,
+        "developer_id": developer_id,
+        "description": _text(description) if description is not None else None,
+        "score": score,
+        "full_price": full_price,
+        "price": price,
+        "free": free,
+    }
+
+
+@instr.timed
+def parse_card_info(element):
+    """Extracts basic app info from the app's card. Used when parsing pages
+    with lists of apps.
+
+    :param element: an lxml element of an app's card
+    :return: a dictionary of available basic app info
+    """
+    app_id = element.attrib["data-docid"]
+    url = urljoin(s.BASE_URL, CARD_URL(element)[0].attrib["href"])
+    icon = urljoin(s.BASE_URL, CARD_ICON(element)[0].attrib["src"].split("=")[0])
+    title = CARD_TITLE(element)[0].attrib["title"]
+
+    developer_link = CARD_DEVELOPER(element)[0]
+    developer = developer_link.attrib["title"]
+    href_parts = developer_link.attrib["href"].split("=")
+    developer_id = href_parts[1] if len(href_parts) > 1 else None
+
+    description = _text(CARD_DESCRIPTION(element)[0]).strip()
+    score = _first(CARD_SCORE, element)
+    if score is not None:
+        score = score.attrib["aria-label"].strip().split(" ")[1]
+
+    price = _first(CARD_PRICE, element)
+    if price is None:
+        # Pre-register apps are 'Coming Soon'
+        price = _first(CARD_PREREGISTER_PRICE, element)
+    if price is not None:
+        # Otherwise country restricted, no price or buttons shown
+        price = _text(price)
+
+    full_price = None
+    if price is not None:
+        full_price = _first(CARD_FULL_PRICE, element)
+        if full_price is not None:
+            full_price = _text(full_price)
+
+    free = price is None
+    if free is True:
+        price = "0"
+
+    return {
+        "app_id": app_id,
+        "url": url,
+        "icon": icon,
+        "title": title,
+        "developer": developer,
+        "developer_id": developer_id,
+        "description": description,
+        "score": score,
+        "full_price": full_price,
+        "price": price,
+        "free": free,
+    }
+
+
+@instr.timed
+def parse_app_details_content(content, fields=None):
+    """Parses an app's details from the raw content of its details page.
+
+    :param content: the details page's response content
+    :param fields: (optional) the detail fields to parse, as returned by
+        `utils.detail_fields`
+    :return: a dictionary of app details
+    """
+    return parse_app_details(parse_html(content), fields)
+
+
+@instr.timed
+def parse_card_list(content):
+    """Parses the basic info of every app card on a collection or developer
+    list page.
+
+    :param content: the list page's response content
+    :return: a list of app dictionaries
+    """
+    return [parse_card_info(card) for card in CARDS(parse_html(content))]
+
+
+@instr.timed
+def parse_cluster_card_list(content):
+    """Parses the basic info of every app card on a /cluster list page.
+
+    :param content: the list page's response content
+    :return: a list of app dictionaries
+    """
+    return [
+        parse_cluster_card_info(card) for card in CLUSTER_CARDS(parse_html(content))
+    ]
+
+
+@instr.timed
+def parse_app_ids(content):
+    """Extracts the ids of every app listed on a list page, in order.
+
+    :param content: the list page's response content
+    :return: a list of app ids
+    """
+    doc = parse_html(content)
+    app_ids = PREVIEW_DOC_IDS(doc)
+    if not app_ids:
+        app_ids = [extract_id_query(href) for href in CLUSTER_HREFS(doc)]
+    return app_ids
+
+
+@instr.timed
+def parse_category_links(content):
+    """Extracts the category links in the front page's navigation dropdown.
+
+    :param content: the front page's response content
+    :return: a list of each link's (href, name) tuple
+    """
+    return [
+        (link.attrib["href"], _string(link))
+        for link in CATEGORY_LINKS(parse_html(content))
+    ]
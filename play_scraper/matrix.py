@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.matrix
+
+Crawls the charts of many categories and collections at once, e.g. a daily
+snapshot of every collection of every category, sharing one pool of request
+threads and the scraper's rate limit between them.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import requests
+
+from play_scraper import instrumentation as instr
+from play_scraper import settings as s
+from play_scraper.lists import AGE_RANGE, CATEGORIES, COLLECTIONS
+
+log = logging.getLogger(__name__)
+
+# A chart to crawl: a collection of a category, and for FAMILY categories, an
+# optional age range
+Cell = namedtuple("Cell", ["category", "collection", "age"])
+
+# An app of a chart, at its 1-based rank in it
+Entry = namedtuple("Entry", ["category", "collection", "age", "rank", "app"])
+
+# How long a chart's request took once started, the number of apps it returned,
+# and the exception it failed with, if any
+CellTiming = namedtuple("CellTiming", ["cell", "apps", "elapsed", "error"])
+
+
+def expand(categories=None, collections=None, ages=True):
+    """Lists the charts of every combination of categories and collections,
+    with a chart for each age range of the FAMILY categories besides the one
+    for all ages.
+
+    :param categories: (optional) the category ids to crawl; defaults to every
+        one in `lists.CATEGORIES`. None in it stands for all categories.
+    :param collections: (optional) the collection ids to crawl; defaults to
+        every one in `lists.COLLECTIONS`.
+    :param ages: if False, skips the age range variants.
+    :return: a list of `Cell`s, by category then collection
+    """
+    categories = sorted(CATEGORIES) if categories is None else categories
+    collections = sorted(COLLECTIONS) if collections is None else collections
+    cells = []
+    for category in categories:
+        age_ranges = [None]
+        if ages and category is not None and category.startswith("FAMILY"):
+            age_ranges.extend(sorted(AGE_RANGE))
+        for collection in collections:
+            cells.extend(Cell(category, collection, age) for age in age_ranges)
+    return cells
+
+
+class MatrixCrawl(object):
+    """Fetches a chart per `Cell` through a scraper, yielding each chart's
+    apps as it arrives.
+
+    Every chart is requested through the same pool of threads, so at most
+    `workers` are in flight at once, and through the scraper's session, so its
+    rate limiter, retries and instrumentation apply to the whole crawl. A
+    chart whose request fails is logged and skipped, and its error kept in
+    `timings`, without stopping the others.
+    """
+
+    def __init__(self, scraper, cells=None, results=None, workers=None):
+        """
+        :param scraper: the `PlayScraper` to fetch charts with; its `params`
+            choose the language and country of every chart.
+        :param cells: (optional) the `Cell`s to crawl; defaults to `expand()`.
+        :param results: the number of apps to fetch of each chart, up to
+            COLLECTION_MAX_RESULTS; defaults to it.
+        :param workers: (optional) the most charts to request at once; by
+            default, the scraper's own request threads are shared.
+        :raises ValueError: if any cell or `results` is invalid, before any
+            request is sent.
+        """
+        self.scraper = scraper
+        self.cells = expand() if cells is None else list(cells)
+        self.results = s.COLLECTION_MAX_RESULTS if results is None else results
+        for cell in self.cells:
+            scraper._collection_request(
+                cell.collection, cell.category, self.results, age=cell.age
+            )
+        self.workers = workers
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def _fetch(self, cell):
+        start = time.time()
+        try:
+            apps = self.scraper.collection(
+                cell.collection, cell.category, results=self.results, age=cell.age
+            )
+        except requests.exceptions.RequestException as e:
+            self._time(CellTiming(cell, 0, time.time() - start, e))
+            raise
+        self._time(CellTiming(cell, len(apps), time.time() - start, None))
+        return apps
+
+    def _time(self, timing):
+        with self._lock:
+            self.timings.append(timing)
+
+    def __iter__(self):
+        """Requests every chart, yielding an `Entry` per app, a chart's in rank
+        order, as each chart arrives.
+        """
+        if self.workers is None:
+            executor = self.scraper._futures_session.executor
+        else:
+            executor = instr.ContextExecutor(max_workers=self.workers)
+        pending = dict(
+            (executor.submit(self._fetch, cell), cell) for cell in self.cells
+        )
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    cell = pending.pop(future)
+                    try:
+                        apps = future.result()
+                    except requests.exceptions.RequestException as e:
+                        log.warning(
+                            "Skipped chart {cell}: {error}".format(cell=cell, error=e)
+                        )
+                        continue
+                    for rank, app in enumerate(apps, 1):
+                        yield Entry(cell.category, cell.collection, cell.age, rank, app)
+        finally:
+            for future in pending:
+                future.cancel()
+            if self.workers is not None:
+                executor.shutdown(wait=False)
+
+    def slowest(self, n=10):
+        """Returns the timings of the slowest charts fetched, slowest first."""
+        with self._lock:
+            return sorted(self.timings, key=lambda t: t.elapsed, reverse=True)[:n]
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.metrics
+
+Counters, gauges and histograms aggregated from instrumentation events, and
+their export in the Prometheus text exposition format.
+"""
+
+import threading
+
+try:
+    from urlparse import urlparse
+except ImportError:
+    from urllib.parse import urlparse
+
+# Upper bounds, in seconds, of the buckets of the duration histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def endpoint(url):
+    """Names the Play Store endpoint a url requests, e.g. 'details', to label
+    metrics with without a label per url.
+    """
+    path = urlparse(url).path.rstrip("/")
+    if path.endswith("SuggRequest"):
+        return "suggestions"
+    if path == "/store/search":
+        return "search"
+    if path == "/store/apps":
+        return "categories"
+    if "/collection/" in path:
+        return "collection"
+    if "/category/" in path:
+        return "category"
+    name = path.rsplit("/", 1)[-1]
+    if name in ("details", "developer", "similar", "dev"):
+        return "developer" if name == "dev" else name
+    return "other"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{{{labels}}}".format(
+        labels=",".join(
+            '{name}="{value}"'.format(name=name, value=_escape(value))
+            for name, value in zip(names, values)
+        )
+    )
+
+
+class _Metric(object):
+    """A metric's values keyed by their label values. Each metric has its own
+    lock, held only to update a value, so metrics don't contend with each
+    other.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def get(self, **labels):
+        """Returns the value with the given labels, or None."""
+        return self._values.get(self._key(labels))
+
+    def samples(self):
+        """Yields the name, label names and values, and value of each sample."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, self.labels, key, value
+
+    def expose(self):
+        """Returns the metric in the Prometheus text exposition format."""
+        lines = [
+            "# HELP {name} {doc}".format(name=self.name, doc=self.documentation),
+            "# TYPE {name} {type}".format(name=self.name, type=self.type),
+        ]
+        for name, label_names, label_values, value in self.samples():
+            lines.append(
+                "{name}{labels} {value}".format(
+                    name=name,
+                    labels=_format_labels(label_names, label_values),
+                    value=_format_value(value),
+                )
+            )
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. a number of requests."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. a number of requests in flight."""
+
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Counts of observations, e.g. durations, in cumulative buckets, with
+    their sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # The count of each bucket, then the sum of all observations
+                counts = self._values[key] = [0] * len(self.buckets) + [0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+
+    def get(self, **labels):
+        """Returns the count and sum of the observations with the given labels,
+        or None.
+        """
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+            if counts is None:
+                return None
+            return sum(counts[:-1]), counts[-1]
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        labels = self.labels + ("le",)
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield self.name + "_bucket", labels, key + (
+                    _format_value(float(bound)),
+                ), cumulative
+            yield self.name + "_sum", self.labels, key, counts[-1]
+            yield self.name + "_count", self.labels, key, cumulative
+
+
+class MetricsCollector(object):
+    """Aggregates the events of an `instrumentation.Instrumentation` it's a
+    listener of into metrics:
+
+        play_scraper_requests_total, requests by endpoint and status, which is
+            'error' for requests that got no response
+        play_scraper_request_duration_seconds, request latency by endpoint
+        play_scraper_time_to_first_byte_seconds, by endpoint
+        play_scraper_response_bytes_total, bytes downloaded by endpoint
+        play_scraper_requests_in_flight, by endpoint
+        play_scraper_retries_total, by endpoint and status
+        play_scraper_cache_requests_total, by cache, 'details' or 'http', and
+            result, 'hit' or 'miss'
+        play_scraper_parse_duration_seconds, by parse function and module
+
+    Export them all with `export`.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        """
+        :param buckets: the upper bounds, in seconds, of the duration
+            histograms' buckets.
+        """
+        self.requests = Counter(
+            "play_scraper_requests_total",
+            "Requests sent, by endpoint and response status.",
+            ("endpoint", "status"),
+        )
+        self.request_duration = Histogram(
+            "play_scraper_request_duration_seconds",
+            "Time from sending a request to reading its response.",
+            ("endpoint",),
+            buckets,
+        )
+        self.time_to_first_byte = Histogram(
+            "play_scraper_time_to_first_byte_seconds",
+            "Time from sending a request to receiving its response's headers.",
+            ("endpoint",),
+            buckets,
+        )
+        self.response_bytes = Counter(
+            "play_scraper_response_bytes_total",
+            "Bytes of response bodies downloaded.",
+            ("endpoint",),
+        )
+        self.in_flight = Gauge(
+            "play_scraper_requests_in_flight",
+            "Requests sent and not yet completed.",
+            ("endpoint",),
+        )
+        self.retries = Counter(
+            "play_scraper_retries_total",
+            "Requests retried, by the status of the failed attempt.",
+            ("endpoint", "status"),
+        )
+        self.cache = Counter(
+            "play_scraper_cache_requests_total",
+            "Cache lookups, by cache and result.",
+            ("cache", "result"),
+        )
+        self.parse_duration = Histogram(
+            "play_scraper_parse_duration_seconds",
+            "Time spent in each parse function.",
+            ("function", "module"),
+            buckets,
+        )
+        self.metrics = [
+            self.requests,
+            self.request_duration,
+            self.time_to_first_byte,
+            self.response_bytes,
+            self.in_flight,
+            self.retries,
+            self.cache,
+            self.parse_duration,
+        ]
+
+    def __call__(self, event):
+        tags = event.tags
+        if event.name == "request_start":
+            self.in_flight.inc(endpoint=endpoint(tags["url"]))
+        elif event.name == "request":
+            name = endpoint(tags["url"])
+            self.in_flight.dec(endpoint=name)
+            self.requests.inc(endpoint=name, status=tags["status"])
+            self.request_duration.observe(event.duration, endpoint=name)
+        elif event.name == "request_error":
+            name = endpoint(tags["url"])
+            self.in_flight.dec(endpoint=name)
+            self.requests.inc(endpoint=name, status="error")
+        elif event.name == "ttfb":
+            self.time_to_first_byte.observe(
+                event.duration, endpoint=endpoint(tags["url"])
+            )
+        elif event.name == "bytes_received":
+            self.response_bytes.inc(event.value, endpoint=endpoint(tags["url"]))
+        elif event.name == "retry":
+            status = tags.get("status")
+            self.retries.inc(
+                endpoint=endpoint(tags["url"]),
+                status="error" if status is None else status,
+            )
+        elif event.name == "cache":
+            self.cache.inc(cache=tags["cache"], result=tags["result"])
+        elif event.name == "parse":
+            self.parse_duration.observe(
+                event.duration, function=tags["function"], module=tags["module"]
+            )
+
+    def export(self):
+        """Returns every metric in the Prometheus text exposition format, e.g.
+        to serve from a /metrics endpoint.
+        """
+        return "\n".join(metric.expose() for metric in self.metrics) + "\n"
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.ratelimit
+
+Token bucket rate limiters that throttle every request a scraper sends, within
+one process or across all the processes on a host.
+"""
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from play_scraper import settings as s
+from play_scraper.adapters import WrappingAdapter
+
+_monotonic = getattr(time, "monotonic", time.time)
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket allowing `rate` requests per second on
+    average, and bursts of up to `burst` requests at once.
+
+    Callers reserve a token before each request and wait until it's theirs,
+    so waiting callers are served in the order they asked.
+    """
+
+    def __init__(self, rate=s.RATE_LIMIT, burst=s.RATE_LIMIT_BURST, timer=_monotonic):
+        """
+        :param rate: the number of tokens added per second.
+        :param burst: the most tokens the bucket holds, which it starts full of.
+        :param timer: the clock tokens are added by.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError(
+                "Rate must be positive and burst at least 1, not {rate} and "
+                "{burst}.".format(rate=rate, burst=burst)
+            )
+        self.rate = rate
+        self.burst = burst
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._state = (burst, timer())
+
+    def _take(self, state, tokens):
+        """Refills the bucket for the time since `state` and takes `tokens`
+        from it, which may leave it owing tokens.
+
+        :param state: a tuple of the tokens in the bucket and when it was
+            last updated
+        :return: a tuple of the new state, and the number of seconds to wait
+            until the tokens taken are available
+        """
+        available, updated = state
+        now = self._timer()
+        available = min(self.burst, available + max(0, now - updated) * self.rate)
+        available -= tokens
+        return (available, now), max(0.0, -available / self.rate)
+
+    def reserve(self, tokens=1):
+        """Takes tokens without waiting for them.
+
+        :return: the number of seconds until the tokens may be used, e.g. to
+            sleep for in a coroutine
+        """
+        with self._lock:
+            self._state, wait = self._take(self._state, tokens)
+        return wait
+
+    def acquire(self, tokens=1):
+        """Takes tokens, sleeping until they may be used."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """A token bucket whose state is kept in a file, so that every process on
+    the host using the same `path` shares one budget. Updates are serialized
+    with an exclusive `flock` on the file. Not available on Windows.
+    """
+
+    def __init__(
+        self, path, rate=s.RATE_LIMIT, burst=s.RATE_LIMIT_BURST, timer=time.time
+    ):
+        """
+        :param path: the file to keep the bucket's state in, which is created
+            if it doesn't exist.
+        :param rate: the number of tokens added per second.
+        :param burst: the most tokens the bucket holds.
+        :param timer: the clock tokens are added by, which must be the same in
+            every process.
+        """
+        if fcntl is None:
+            raise ImportError("FileTokenBucket requires fcntl, which isn't available.")
+        super(FileTokenBucket, self).__init__(rate, burst, timer)
+        self.path = path
+
+    def reserve(self, tokens=1):
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                state = os.read(fd, 64).split()
+                try:
+                    state = (float(state[0]), float(state[1]))
+                except (IndexError, ValueError):
+                    # A new bucket, which starts full
+                    state = (self.burst, self._timer())
+
+                state, wait = self._take(state, tokens)
+                data = "{0!r} {1!r}".format(*state).encode("ascii")
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, data)
+                os.ftruncate(fd, len(data))
+            finally:
+                # Closing the file releases the lock
+                os.close(fd)
+        return wait
+
+
+class ThrottledAdapter(WrappingAdapter):
+    """A transport adapter that acquires a token from a rate limiter before
+    sending each request.
+    """
+
+    def __init__(self, rate_limiter, adapter=None):
+        """
+        :param rate_limiter: the `TokenBucket` to take a token from per request.
+        :param adapter: the adapter to send requests with; defaults to a new
+            HTTPAdapter.
+        """
+        super(ThrottledAdapter, self).__init__(adapter)
+        self.rate_limiter = rate_limiter
+
+    def send(self, request, **kwargs):
+        self.rate_limiter.acquire()
+        return self.adapter.send(request, **kwargs)
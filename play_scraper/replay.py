@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.replay
+
+Records every request a session sends and the response it got to an archive
+on disk, and replays them from it without the network, so a crawl can be
+captured once and its parsing profiled against exactly the same bytes.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from play_scraper.adapters import WrappingAdapter
+
+log = logging.getLogger(__name__)
+
+MODES = ("record", "replay")
+
+
+def request_key(request):
+    """Identifies a request by its method, url and body, e.g. a list page's
+    POST data, to replay its response for.
+    """
+    body = request.body or b""
+    if not isinstance(body, bytes):
+        body = body.encode("utf-8")
+    digest = hashlib.sha1(
+        "{method} {url}\n".format(method=request.method, url=request.url).encode(
+            "utf-8"
+        )
+    )
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class Archive(object):
+    """A gzipped file of requests and their responses, one JSON object per
+    line, opened either to record to or to replay from.
+
+    When recording, the file is overwritten, and each response is flushed to
+    it as it's recorded, so all but the last may be replayed even if the
+    archive isn't closed. When replaying, a request sent several times, e.g.
+    retried, gets its recorded responses in turn, then the last one again.
+    """
+
+    def __init__(self, path, mode="replay"):
+        """
+        :param path: the archive's file, e.g. 'crawl.jsonl.gz'.
+        :param mode: 'record' to record to the archive, or 'replay' to replay
+            from it.
+        """
+        if mode not in MODES:
+            raise ValueError(
+                "Invalid mode '{mode}'. Must be one of: {modes}.".format(
+                    mode=mode, modes=", ".join(MODES)
+                )
+            )
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._file = None
+        self._responses = None
+        if mode == "record":
+            self._file = gzip.open(path, "wb")
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def record(self, request, response):
+        """Appends a request and its response, whose content is read, to the
+        archive.
+        """
+        entry = {
+            "key": request_key(request),
+            "method": request.method,
+            "url": request.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "response_url": response.url,
+            "headers": dict(response.headers),
+            "content": base64.b64encode(response.content or b"").decode("ascii"),
+        }
+        line = json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def _load(self):
+        """Reads the recorded responses of each request key. Must hold the
+        lock.
+        """
+        responses = {}
+        with gzip.open(self.path, "rb") as f:
+            try:
+                for line in f:
+                    entry = json.loads(line.decode("utf-8"))
+                    responses.setdefault(entry.pop("key"), deque()).append(entry)
+            except EOFError:
+                log.warning(
+                    "Archive {path} ends early, it may not have been closed; "
+                    "replaying what was read".format(path=self.path)
+                )
+        return responses
+
+    def replay(self, request):
+        """Returns the recorded response to a request, or None if there isn't
+        one.
+        """
+        with self._lock:
+            if self._responses is None:
+                self._responses = self._load()
+            recorded = self._responses.get(request_key(request))
+            if not recorded:
+                return None
+            entry = recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.url = entry["response_url"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(entry["content"])
+        response.request = request
+        return response
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordingAdapter(WrappingAdapter):
+    """A transport adapter that records each response it receives, and the
+    request it answers, to an `Archive`.
+    """
+
+    def __init__(self, archive, adapter=None):
+        """
+        :param archive: the `Archive` to record to.
+        :param adapter: the adapter to send requests with; defaults to a new
+            HTTPAdapter.
+        """
+        super(RecordingAdapter, self).__init__(adapter)
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        self.archive.record(request, response)
+        return response
+
+
+class ReplayAdapter(WrappingAdapter):
+    """A transport adapter that answers each request with its response
+    recorded in an `Archive`, without the network. A request that wasn't
+    recorded fails with a ConnectionError.
+    """
+
+    def __init__(self, archive):
+        """
+        :param archive: the `Archive` to replay from.
+        """
+        super(ReplayAdapter, self).__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        response = self.archive.replay(request)
+        if response is None:
+            raise requests.exceptions.ConnectionError(
+                "No response to {method} {url} was recorded in {path}.".format(
+                    method=request.method, url=request.url, path=self.archive.path
+                ),
+                request=request,
+            )
+        return response
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+play_scraper.retry
+
+Retries of requests that fail transiently, with exponential backoff and jitter,
+honoring the server's Retry-After header.
+"""
+
+import calendar
+import logging
+import random
+import time
+from email.utils import parsedate_tz
+
+import requests
+
+from play_scraper import instrumentation as instr
+from play_scraper import settings as s
+from play_scraper.adapters import WrappingAdapter
+
+log = logging.getLogger(__name__)
+
+
+def parse_retry_after(value, timer=time.time):
+    """Parses a Retry-After header, either a number of seconds or an HTTP date.
+
+    :return: the number of seconds to wait, or None if it can't be parsed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    offset = date[9] or 0
+    return max(0.0, calendar.timegm(date[:9]) - offset - timer())
+
+
+class RetryPolicy(object):
+    """Decides which failed requests to retry, and how long to wait first.
+
+    Connection errors, timeouts and responses with one of `statuses` are
+    retried up to `max_attempts` attempts in all. The n-th retry waits a random
+    time of up to `backoff * 2 ** (n - 1)` seconds, capped at `max_backoff`,
+    unless the response says how long to wait with a Retry-After header.
+    """
+
+    def __init__(
+        self,
+        max_attempts=s.RETRY_ATTEMPTS,
+        backoff=s.RETRY_BACKOFF,
+        max_backoff=s.RETRY_MAX_BACKOFF,
+        statuses=s.RETRY_STATUSES,
+        jitter=True,
+        sleep=time.sleep,
+    ):
+        """
+        :param max_attempts: the most times to send a request, including the
+            first. 1 disables retries.
+        :param backoff: the base of the exponential backoff, in seconds.
+        :param max_backoff: the longest to back off for, in seconds, which also
+            caps Retry-After.
+        :param statuses: the response status codes to retry.
+        :param jitter: if True, wait a random time of up to the backoff, which
+            keeps concurrent retries from arriving together.
+        :param sleep: the function to wait with.
+        """
+        if max_attempts < 1:
+            raise ValueError(
+                "max_attempts must be at least 1, not {n}.".format(n=max_attempts)
+            )
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.jitter = jitter
+        self.sleep = sleep
+
+    def should_retry(self, attempt, status=None):
+        """Whether to retry an attempt that failed.
+
+        :param attempt: the number of the attempt, starting at 1
+        :param status: the attempt's response status code, or None if it
+            failed with a connection error or timeout
+        """
+        if attempt >= self.max_attempts:
+            return False
+        return status is None or status in self.statuses
+
+    def delay(self, attempt, retry_after=None):
+        """The number of seconds to wait before retrying an attempt.
+
+        :param attempt: the number of the attempt, starting at 1
+        :param retry_after: the response's Retry-After header, if any
+        """
+        retry_after = parse_retry_after(retry_after)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class RetryingAdapter(WrappingAdapter):
+    """A transport adapter that resends requests a `RetryPolicy` retries.
+
+    Once the attempts run out, the last response is returned, or the last
+    error raised, as if the request had been sent once. Responses' `retries`
+    attribute is the number of times they were retried.
+    """
+
+    def __init__(self, retry_policy, adapter=None):
+        """
+        :param retry_policy: the `RetryPolicy` to follow.
+        :param adapter: the adapter to send requests with; defaults to a new
+            HTTPAdapter.
+        """
+        super(RetryingAdapter, self).__init__(adapter)
+        self.retry_policy = retry_policy
+
+    def send(self, request, **kwargs):
+        policy = self.retry_policy
+        attempt = 1
+        while True:
+            try:
+                response = self.adapter.send(request, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                if not policy.should_retry(attempt):
+                    raise
+                delay = policy.delay(attempt)
+                reason, status = e, None
+            else:
+                if not policy.should_retry(attempt, response.status_code):
+                    response.retries = attempt - 1
+                    return response
+                delay = policy.delay(attempt, response.headers.get("Retry-After"))
+                reason = status = response.status_code
+                # Read the body so the connection goes back to the pool
+                response.content
+
+            log.warning(
+                "Retrying {url} in {delay:.2f}s after {reason}".format(
+                    url=request.url, delay=delay, reason=reason
+                )
+            )
+            instr.emit(
+                "retry", value=delay, url=request.url, attempt=attempt, status=status
+            )
+            policy.sleep(delay)
+            attempt += 1
@@ -1,51 +1,73 @@
 # -*- coding: utf-8 -*-
 
+import functools
+import itertools
 import logging
+import types
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 try:
     from urllib import quote_plus
-    from urlparse import urljoin
 except ImportError:
-    from urllib.parse import urljoin, quote_plus
+    from urllib.parse import quote_plus
 try:
     basestring
 except NameError:
     basestring = str
 
 import requests
-from bs4 import BeautifulSoup
+from requests_futures.sessions import FuturesSession
 
+from play_scraper import instrumentation as instr
 from play_scraper import settings as s
+from play_scraper.cache import details_cache_key
 from play_scraper.constants import HL_LANGUAGE_CODES, GL_COUNTRY_CODES
 from play_scraper.lists import AGE_RANGE, CATEGORIES, COLLECTIONS
+from play_scraper.matrix import MatrixCrawl, expand
 from play_scraper.utils import (
     build_collection_url,
     build_url,
-    extract_id_query,
+    create_session,
+    detail_fields,
+    generate_page_token,
+    is_unsigned_page_token,
     generate_post_data,
+    iter_futures_app_request,
     multi_futures_app_request,
-    parse_app_details,
-    parse_card_info,
-    parse_cluster_card_info,
+    parse_app_details_response,
+    parse_app_ids,
+    parse_card_list,
+    parse_categories,
+    parse_cluster_card_list,
+    parse_page_tokens,
     send_request,
 )
 
 
-class PlayScraper(object):
-    def __init__(self, hl="en", gl="us"):
+def _validate_locale(hl, gl):
+    if hl not in HL_LANGUAGE_CODES:
+        raise ValueError("{hl} is not a valid language interface code.".format(hl=hl))
+    if gl not in GL_COUNTRY_CODES:
+        raise ValueError("{gl} is not a valid geolocation country code.".format(gl=gl))
+
+
+class BaseScraper(object):
+    """Validates arguments and builds the requests for each of the scraper's
+    methods. Subclasses decide how the requests are sent.
+    """
+
+    def __init__(self, hl="en", gl="us", parser=s.PARSER):
+        _validate_locale(hl, gl)
         self.language = hl
-        if self.language not in HL_LANGUAGE_CODES:
-            raise ValueError(
-                "{hl} is not a valid language interface code.".format(hl=self.language)
-            )
         self.geolocation = gl
-        if self.geolocation not in GL_COUNTRY_CODES:
+        self.parser = parser
+        if self.parser not in s.PARSERS:
             raise ValueError(
-                "{gl} is not a valid geolocation country code.".format(
-                    gl=self.geolocation
+                "{parser} is not a valid parser. Must be one of: {parsers}.".format(
+                    parser=self.parser, parsers=", ".join(s.PARSERS)
                 )
             )
-        self.params = {"hl": self.language, "gl": self.geolocation}
 
         self._base_url = s.BASE_URL
         self._suggestion_url = s.SUGGESTION_URL
@@ -53,48 +75,441 @@ class PlayScraper(object):
         self._pagtok = s.PAGE_TOKENS
         self._log = logging.getLogger(__name__)
 
-    def _parse_multiple_apps(self, list_response):
+    @property
+    def params(self):
+        """The query parameters of the scraper's language and country, which
+        every request is sent with. Each is a new dict, which a call adds its
+        own parameters to, so calls never see each other's.
+        """
+        return {"hl": self.language, "gl": self.geolocation}
+
+    def _locale_params(self, locales):
+        """Validates (hl, gl) locale pairs.
+
+        :return: a list of tuples of each locale and its query parameters
+        """
+        locale_params = []
+        for hl, gl in locales:
+            _validate_locale(hl, gl)
+            locale_params.append(((hl, gl), dict(self.params, hl=hl, gl=gl)))
+        return locale_params
+
+    def _collection_request(
+        self, collection_id, category_id=None, results=None, page=None, age=None
+    ):
+        """Validates a collection's arguments.
+
+        :return: a tuple of the collection's url, POST data and query parameters
+        """
+        if collection_id not in COLLECTIONS and not collection_id.startswith(
+            "promotion"
+        ):
+            raise ValueError(
+                "Invalid collection_id '{collection}'.".format(collection=collection_id)
+            )
+        collection_name = COLLECTIONS.get(collection_id) or collection_id
+
+        category = "" if category_id is None else CATEGORIES.get(category_id)
+        if category is None:
+            raise ValueError(
+                "Invalid category_id '{category}'.".format(category=category_id)
+            )
+
+        results = s.NUM_RESULTS if results is None else results
+        if results > s.COLLECTION_MAX_RESULTS:
+            raise ValueError(
+                "Number of results cannot be more than {max}.".format(
+                    max=s.COLLECTION_MAX_RESULTS
+                )
+            )
+
+        page = 0 if page is None else page
+        if page * results > s.COLLECTION_MAX_START:
+            raise ValueError(
+                "Start (page * results) cannot be greater than {max}.".format(
+                    max=s.COLLECTION_MAX_START
+                )
+            )
+
+        params = self.params
+        if category.startswith("FAMILY") and age is not None:
+            params["age"] = AGE_RANGE[age]
+
+        url = build_collection_url(category, collection_name)
+        data = generate_post_data(results, page)
+        return url, data, params
+
+    def _collection_pages(self, collection_id, category_id=None, age=None):
+        """Plans the pages covering as much of a collection as can be fetched:
+        as many apps per page as allowed, up to the greatest start allowed.
+
+        :return: a list of tuples of each page's url, POST data and query
+            parameters, in order
+        """
+        results = s.COLLECTION_MAX_RESULTS
+        return [
+            self._collection_request(collection_id, category_id, results, page, age)
+            for page in range(s.COLLECTION_MAX_START // results + 1)
+        ]
+
+    def _developer_request(self, developer, results=None, page=None):
+        """Validates a developer's arguments.
+
+        :return: a tuple of the developer page's url and POST data
+        """
+        if not isinstance(developer, basestring) or developer.isdigit():
+            raise ValueError(
+                "Parameter 'developer' must be the developer name, "
+                "not the developer id."
+            )
+
+        results = s.DEV_RESULTS if results is None else results
+        page = 0 if page is None else page
+        if page < 0:
+            raise ValueError(
+                "Parameter 'page' ({page}) cannot be negative.".format(page=page)
+            )
+        pagtok = generate_page_token(results * page)
+
+        url = build_url("developer", developer)
+        data = generate_post_data(results, 0, pagtok)
+        return url, data
+
+    def _developer_pages(self, developer, max_pages=None):
+        """Plans the pages covering a developer's apps, as many apps per page as
+        allowed, up to the most pages allowed.
+
+        :return: a list of tuples of each page's url, POST data and query
+            parameters, in order
+        """
+        results = s.DEV_MAX_RESULTS
+        max_pages = s.DEV_MAX_PAGES if max_pages is None else max_pages
+        params = self.params
+        return [
+            self._developer_request(developer, results, page) + (params,)
+            for page in range(max_pages)
+        ]
+
+    def _suggestions_request(self, query):
+        """Validates a suggestion query.
+
+        :return: the suggestion request's query parameters
+        """
+        if not query:
+            raise ValueError("Cannot get suggestions for an empty query.")
+
+        return dict(self.params, json=1, c=0, query=query)
+
+    def _search_request(self, query, page=None):
+        """Validates a search query's arguments.
+
+        :return: a tuple of the search's POST data and query parameters
+        """
+        page = 0 if page is None else int(page)
+        if page < 0:
+            raise ValueError(
+                "Parameter 'page' ({page}) cannot be negative.".format(page=page)
+            )
+
+        pagtok = generate_page_token(page * s.SEARCH_RESULTS)
+        data = generate_post_data(0, 0, pagtok)
+
+        return data, dict(self.params, q=quote_plus(query), c="apps")
+
+
+def _instrumented(method):
+    """Decorates a PlayScraper method to make the scraper's instrumentation
+    active while it runs, tagging events with the method, hl and gl. Generators
+    it returns stay tagged as they're iterated.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.instrumentation is None:
+            return method(self, *args, **kwargs)
+
+        with self.instrumentation.activate(
+            method=method.__name__, hl=self.params.get("hl"), gl=self.params.get("gl")
+        ) as context:
+            result = method(self, *args, **kwargs)
+        if isinstance(result, types.GeneratorType):
+            return instr.iter_activated(result, context)
+        return result
+
+    return wrapper
+
+
+class PlayScraper(BaseScraper):
+    """Scrapes the Play Store, sending many requests at once from a pool of
+    threads when a call needs them.
+
+    A scraper is safe to use from several threads at once, so one scraper, with
+    its connections and caches warm, can serve a whole pool of workers. Each
+    call builds its own request parameters, and its session, caches, rate
+    limiter and threads are shared by every call.
+    """
+
+    def __init__(
+        self,
+        hl="en",
+        gl="us",
+        session=None,
+        parse_workers=s.PARSE_WORKERS,
+        parser=s.PARSER,
+        cache=None,
+        rate_limiter=None,
+        retry_policy=None,
+        concurrency=None,
+        instrumentation=None,
+        archive=None,
+        http_cache=None,
+    ):
+        """
+        :param hl: the language interface code to request pages in.
+        :param gl: the geolocation country code to request pages from.
+        :param session: (optional) a requests Session, e.g. from
+            `utils.create_session`, to send every request through. Share one
+            between scrapers to share its connection pool. If not given, the
+            scraper creates its own long-lived session.
+        :param parse_workers: the number of processes to parse detail pages in
+            when fetching many apps' details. If 0, they're parsed by the
+            request threads, which is limited to one core by the GIL.
+        :param parser: the backend to parse pages with, 'bs4' (BeautifulSoup),
+            the faster 'lxml', or 'json', which parses details from the data
+            embedded in the page. All return the same data.
+        :param cache: (optional) a `cache.DetailsCache` to serve apps' details
+            from, and cache fetched details in. Share one between scrapers to
+            share what they've fetched.
+        :param rate_limiter: (optional) a `ratelimit.TokenBucket` to throttle
+            the scraper's requests with, e.g. a `ratelimit.FileTokenBucket`
+            shared by every process on the host. Can't be combined with a
+            `session`; pass it to `utils.create_session` instead.
+        :param retry_policy: (optional) a `retry.RetryPolicy` to retry failed
+            requests by, instead of the default. Also not with a `session`.
+        :param concurrency: (optional) a `concurrency.AIMDConcurrency` that
+            adapts the number of detail requests sent at once to the server's
+            latency and errors, instead of a fixed CONCURRENT_REQUESTS. Its
+            current `limit` can be read while fetching.
+        :param instrumentation: (optional) an
+            `instrumentation.Instrumentation` to emit timed events of each
+            call's requests and parsing to. Request events are emitted by the
+            session's `instrumentation.InstrumentedAdapter`, which a given
+            `session` has only if it's from `utils.create_session`.
+        :param archive: (optional) a `replay.Archive` to record every response
+            to, or to replay responses from without the network. Also not
+            with a `session`.
+        :param http_cache: (optional) an `http_cache.HTTPCache` to store
+            responses in and revalidate them against, reusing the details
+            parsed from unmodified pages. Also not with a `session`.
+        :raises ValueError: if a `session` is given along with any of the
+            options its adapters are created with.
+        """
+        super(PlayScraper, self).__init__(hl, gl, parser)
+
+        self.cache = cache
+        self.concurrency = concurrency
+        self.instrumentation = instrumentation
+
+        session_options = dict(
+            http_cache=http_cache,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            archive=archive,
+        )
+        if session is not None:
+            for name in sorted(session_options):
+                if session_options[name] is not None:
+                    raise ValueError(
+                        "{name} cannot be combined with session; pass it to "
+                        "utils.create_session instead.".format(name=name)
+                    )
+        else:
+            session = create_session(**session_options)
+        self.session = session
+        workers = s.CONCURRENT_REQUESTS if concurrency is None else concurrency.maximum
+        self._futures_session = FuturesSession(
+            executor=instr.ContextExecutor(max_workers=workers),
+            session=self.session,
+        )
+        self._parse_executor = None
+        if parse_workers:
+            self._parse_executor = ProcessPoolExecutor(max_workers=parse_workers)
+
+    def close(self):
+        """Shuts down the scraper's request threads and parser processes."""
+        self._futures_session.executor.shutdown(wait=False)
+        if self._parse_executor is not None:
+            self._parse_executor.shutdown(wait=False)
+
+    def _parse_multiple_apps(self, list_response, stream=False, fields=None):
         """Extracts app ids from a list's Response object, sends GET requests to
         each app, parses detailed info and returns all apps in a list.
 
         :param list_response: the Response object from a list request
+        :param stream: if True, return a generator yielding each app as soon
+            as its details are parsed instead
+        :param fields: (optional) the detail fields to parse for each app
         :return: a list of app dictionaries
         """
-        # TODO: refactor to better handle multiple possible list HTMLs and selectors
-        # to extract out app ids
-        soup = BeautifulSoup(list_response.content, "lxml", from_encoding="utf8")
+        app_ids = parse_app_ids(list_response.content, self.parser)
+        return self._detailed_apps(app_ids, stream, fields)
 
-        app_ids = [
-            x.attrs["data-docid"] for x in soup.select("span.preview-overlay-container")
-        ]
-        if not app_ids:
-            app_ids = [
-                extract_id_query(x.attrs.get("href"))
-                for x in soup.select("div.p63iDd > a")
-            ]
+    def _detailed_apps(self, app_ids, stream=False, fields=None):
+        """Fetches the details of apps concurrently.
+
+        :param app_ids: an iterable of app ids
+        :param stream: if True, return a generator yielding each app as soon
+            as its details are parsed instead
+        :param fields: (optional) the detail fields to parse for each app
+        :return: a list of app dictionaries, in the order of `app_ids`
+        """
+        if stream:
+            return self.iter_details(app_ids, fields=fields)
+        return multi_futures_app_request(
+            app_ids,
+            params=self.params,
+            session=self._futures_session,
+            parse_executor=self._parse_executor,
+            parser=self.parser,
+            fields=fields,
+            cache=self.cache,
+            concurrency=self.concurrency,
+        )
 
-        return multi_futures_app_request(app_ids, params=self.params)
+    @_instrumented
+    def iter_details(self, app_ids, max_in_flight=s.MAX_IN_FLIGHT, fields=None):
+        """Concurrently fetches the details of many apps, yielding each app as
+        soon as its page is parsed. Apps are yielded in completion order.
+
+        :param app_ids: an iterable of app ids, e.g. ['com.nintendo.zaaa'].
+            Ids are only taken from it as earlier requests complete, so it can
+            be a generator over an arbitrarily large catalog.
+        :param max_in_flight: the maximum number of requests submitted at a
+            time, unless the scraper adapts it with a `concurrency` controller
+        :param fields: (optional) the detail fields to parse for each app. See
+            `details`.
+        :return: a generator of app detail dictionaries
+        """
+        return iter_futures_app_request(
+            app_ids,
+            params=self.params,
+            session=self._futures_session,
+            max_in_flight=max_in_flight,
+            parse_executor=self._parse_executor,
+            parser=self.parser,
+            fields=fields,
+            cache=self.cache,
+            concurrency=self.concurrency,
+        )
 
-    def details(self, app_id):
+    @_instrumented
+    def details(self, app_id, fields=None):
         """Sends a GET request and parses an application's details.
 
         :param app_id: the app to retrieve details, e.g. 'com.nintendo.zaaa'
+        :param fields: (optional) an iterable of the detail fields to parse,
+            e.g. ['installs', 'score']. The others aren't parsed, which is
+            much faster, and are left out; 'app_id' and 'url' are always
+            included.
         :return: a dictionary of app details
         """
+        return self._cached_details(app_id, detail_fields(fields), self.params)
+
+    @_instrumented
+    def details_by_locale(
+        self, app_ids, locales, fields=None, max_in_flight=s.MAX_IN_FLIGHT
+    ):
+        """Fetches apps' details in each of several locales, e.g. every
+        storefront an app is sold in, sending the requests of every locale at
+        once through the scraper's request threads and session, and so its
+        connection pool and rate limiter.
+
+        An app that fails to fetch in a locale is logged and left out of that
+        locale's apps, without affecting the other locales.
+
+        :param app_ids: an iterable of app ids, e.g. ['com.nintendo.zaaa']
+        :param locales: an iterable of (hl, gl) pairs of a language interface
+            code and a geolocation country code, e.g. [('en', 'us'), ('de', 'de')]
+        :param fields: (optional) the detail fields to parse for each app. See
+            `details`.
+        :param max_in_flight: the maximum number of requests submitted at a time
+        :return: a dict of each (hl, gl) locale to a list of its apps' details,
+            in the order of `app_ids`
+        :raises ValueError: if any locale is invalid, before any request is sent
+        """
+        locale_params = self._locale_params(locales)
+        fields = detail_fields(fields)
+        jobs = (
+            (i, app_id, locale, params)
+            for i, app_id in enumerate(app_ids)
+            for locale, params in locale_params
+        )
+        executor = self._futures_session.executor
+        results = dict((locale, {}) for locale, _ in locale_params)
+        futures = {}
+
+        def submit(count):
+            for job in itertools.islice(jobs, count):
+                _, app_id, (hl, gl), params = job
+                with instr.activated(instr.tagged(hl=hl, gl=gl)):
+                    future = executor.submit(
+                        self._cached_details, app_id, fields, params
+                    )
+                futures[future] = job
+
+        try:
+            submit(max_in_flight)
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, app_id, locale, _ = futures.pop(future)
+                    try:
+                        results[locale][i] = future.result()
+                    except Exception as e:
+                        # Including parse errors of a locale's page, e.g. one
+                        # served in an unexpected layout
+                        self._log.error(
+                            "Error occurred fetching {app} in {hl}-{gl}: {err}".format(
+                                app=app_id, hl=locale[0], gl=locale[1], err=e
+                            )
+                        )
+                submit(len(done))
+        finally:
+            for future in futures:
+                future.cancel()
+
+        return dict(
+            (locale, [apps[i] for i in sorted(apps)])
+            for locale, apps in results.items()
+        )
+
+    def _cached_details(self, app_id, fields, params):
+        if self.cache is None:
+            return self._details(app_id, fields, params)
+        return self.cache.get_or_load(
+            details_cache_key(app_id, params, fields),
+            lambda: self._details(app_id, fields, params),
+        )
+
+    def _details(self, app_id, fields, params):
+        with instr.activated(instr.tagged(app_id=app_id)):
+            return self._fetch_details(app_id, fields, params)
+
+    def _fetch_details(self, app_id, fields, params):
         url = build_url("details", app_id)
 
         try:
-            response = send_request("GET", url, params=self.params)
-            soup = BeautifulSoup(response.content, "lxml", from_encoding="utf8")
+            response = send_request("GET", url, params=params, session=self.session)
         except requests.exceptions.HTTPError as e:
             raise ValueError(
                 "Invalid application ID: {app}. {error}".format(app=app_id, error=e)
             )
 
-        app_json = parse_app_details(soup)
+        app_json = parse_app_details_response(response, self.parser, fields)
         app_json.update({"app_id": app_id, "url": url})
         return app_json
 
+    @_instrumented
     def collection(
         self,
         collection_id,
@@ -103,6 +518,7 @@ class PlayScraper(object):
         page=None,
         age=None,
         detailed=False,
+        fields=None,
     ):
         """Sends a POST request and fetches a list of applications belonging to
         the collection and an optional category.
@@ -112,87 +528,191 @@ class PlayScraper(object):
         :param results: the number of apps to retrieve at a time.
         :param page: page number to retrieve; limitation: page * results <= 500.
         :param age: an age range to filter by (only for FAMILY categories)
-        :param detailed: if True, sends request per app for its full detail
+        :param detailed: if True, sends request per app for its full detail;
+            if "stream", returns a generator yielding each detailed app as
+            soon as it's parsed
+        :param fields: (optional) the detail fields to parse for each app when
+            detailed. See `details`.
         :return: a list of app dictionaries
         """
-        if collection_id not in COLLECTIONS and not collection_id.startswith(
-            "promotion"
-        ):
-            raise ValueError(
-                "Invalid collection_id '{collection}'.".format(collection=collection_id)
-            )
-        collection_name = COLLECTIONS.get(collection_id) or collection_id
+        url, data, params = self._collection_request(
+            collection_id, category_id, results, page, age
+        )
+        response = send_request("POST", url, data, params, session=self.session)
 
-        category = "" if category_id is None else CATEGORIES.get(category_id)
-        if category is None:
-            raise ValueError(
-                "Invalid category_id '{category}'.".format(category=category_id)
+        if detailed:
+            apps = self._parse_multiple_apps(
+                response, stream=detailed == "stream", fields=fields
             )
+        else:
+            apps = parse_card_list(response.content, self.parser)
 
-        results = s.NUM_RESULTS if results is None else results
-        if results > 120:
-            raise ValueError("Number of results cannot be more than 120.")
+        return apps
 
-        page = 0 if page is None else page
-        if page * results > 500:
-            raise ValueError("Start (page * results) cannot be greater than 500.")
+    def _fetch_cards(self, url, data, params):
+        response = send_request("POST", url, data, params, session=self.session)
+        return parse_card_list(response.content, self.parser)
 
-        if category.startswith("FAMILY") and age is not None:
-            self.params["age"] = AGE_RANGE[age]
+    def _iter_pages(self, pages):
+        """Fetches and parses list pages concurrently, yielding their apps in
+        rank order without duplicates. A page that comes back short of the apps
+        requested is taken as the last; so is one that fails, after the first,
+        which is usually the server refusing a start past the end of the list.
 
-        url = build_collection_url(category, collection_name)
-        data = generate_post_data(results, page)
-        response = send_request("POST", url, data, self.params)
+        Pages are requested PAGES_IN_FLIGHT at a time, the next as each is read,
+        so few are requested past the last, and those not yet sent are
+        cancelled.
 
-        if detailed:
-            apps = self._parse_multiple_apps(response)
-        else:
-            soup = BeautifulSoup(response.content, "lxml", from_encoding="utf8")
-            apps = [
-                parse_card_info(app_card)
-                for app_card in soup.select('div[data-uitype="500"]')
-            ]
+        :param pages: a list of tuples of each page's url, POST data and query
+            parameters
+        :return: a generator of app dictionaries
+        """
+        executor = self._futures_session.executor
+        futures = deque()
 
-        return apps
+        def submit(page):
+            if page < len(pages):
+                url, data, params = pages[page]
+                futures.append(executor.submit(self._fetch_cards, url, data, params))
+
+        for page in range(s.PAGES_IN_FLIGHT):
+            submit(page)
+        seen = set()
+        try:
+            for i in range(len(pages)):
+                try:
+                    apps = futures.popleft().result()
+                except requests.exceptions.RequestException as e:
+                    if i == 0:
+                        raise
+                    token = pages[i][1].get("pagTok")
+                    if is_unsigned_page_token(token):
+                        # Rather than the end of the list, this may be the
+                        # server refusing a token it didn't sign
+                        self._log.error(
+                            "Stopped paginating at page {page}, whose unsigned "
+                            "page token {token} failed, so later apps may be "
+                            "missing: {error}".format(page=i, token=token, error=e)
+                        )
+                    else:
+                        self._log.warning(
+                            "Stopped paginating at page {page}: {error}".format(
+                                page=i, error=e
+                            )
+                        )
+                    return
+                last = len(apps) < pages[i][1].get("num", 0)
+                if not last:
+                    submit(i + s.PAGES_IN_FLIGHT)
+                for app in apps:
+                    if app["app_id"] not in seen:
+                        seen.add(app["app_id"])
+                        yield app
+                if last:
+                    return
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _all_apps(self, apps, detailed=False, fields=None):
+        """Returns apps from a generator of their basic info, or their details."""
+        if not detailed:
+            return list(apps)
+        app_ids = (app["app_id"] for app in apps)
+        return self._detailed_apps(app_ids, stream=detailed == "stream", fields=fields)
+
+    @_instrumented
+    def collection_all(
+        self, collection_id, category_id=None, age=None, detailed=False, fields=None
+    ):
+        """Fetches every app of a collection, rather than a page of it, by
+        requesting its pages a few at a time, until one comes back short.
 
-    def developer(self, developer, results=None, page=None, detailed=False):
+        :param collection_id: the collection id, e.g. 'NEW_FREE'.
+        :param category_id: (optional) the category id, e.g. 'GAME_ACTION'.
+        :param age: an age range to filter by (only for FAMILY categories)
+        :param detailed: if True, sends request per app for its full detail;
+            if "stream", returns a generator yielding each detailed app as
+            soon as it's parsed, starting while later pages are fetched
+        :param fields: (optional) the detail fields to parse for each app when
+            detailed. See `details`.
+        :return: a list of app dictionaries in rank order, without duplicates
+        """
+        pages = self._collection_pages(collection_id, category_id, age)
+        return self._all_apps(self._iter_pages(pages), detailed, fields)
+
+    def crawl_matrix(
+        self, categories=None, collections=None, ages=True, results=None, workers=None
+    ):
+        """Fetches the chart of every combination of categories and collections,
+        and each age range of the FAMILY categories, sharing the scraper's
+        request threads, or `workers` of their own, and rate limit. See
+        `matrix.MatrixCrawl`.
+
+        :param categories: (optional) the category ids to crawl; defaults to
+            all of them.
+        :param collections: (optional) the collection ids to crawl; defaults
+            to all of them.
+        :param ages: if False, skips the age range variants.
+        :param results: the number of apps to fetch of each chart; defaults to
+            COLLECTION_MAX_RESULTS.
+        :param workers: (optional) the most charts to request at once.
+        :return: a `matrix.MatrixCrawl`, iterating over an `Entry` per app,
+            tagged with its chart and rank, as each chart arrives, and keeping
+            each chart's timing in `timings`
+        """
+        cells = expand(categories, collections, ages)
+        return MatrixCrawl(self, cells, results, workers)
+
+    @_instrumented
+    def developer(
+        self, developer, results=None, page=None, detailed=False, fields=None
+    ):
         """Sends a POST request and retrieves a list of the developer's
         published applications on the Play Store.
 
         :param developer: developer name to retrieve apps from, e.g. 'Disney'
         :param results: the number of app results to retrieve
         :param page: the page number to retrieve
-        :param detailed: if True, sends request per app for its full detail
+        :param detailed: if True, sends request per app for its full detail;
+            if "stream", returns a generator yielding each detailed app as
+            soon as it's parsed
+        :param fields: (optional) the detail fields to parse for each app when
+            detailed. See `details`.
         :return: a list of app dictionaries
         """
-        if not isinstance(developer, basestring) or developer.isdigit():
-            raise ValueError(
-                "Parameter 'developer' must be the developer name, not the developer id."
-            )
-
-        results = s.DEV_RESULTS if results is None else results
-        page = 0 if page is None else page
-        page_num = (results // 20) * page
-        if not 0 <= page_num <= 12:
-            raise ValueError(
-                "Page out of range. (results // 20) * page must be between 0 - 12"
-            )
-        pagtok = self._pagtok[page_num]
-
-        url = build_url("developer", developer)
-        data = generate_post_data(results, 0, pagtok)
-        response = send_request("POST", url, data, self.params)
+        url, data = self._developer_request(developer, results, page)
+        response = send_request("POST", url, data, self.params, session=self.session)
 
         if detailed:
-            apps = self._parse_multiple_apps(response)
+            apps = self._parse_multiple_apps(
+                response, stream=detailed == "stream", fields=fields
+            )
         else:
-            soup = BeautifulSoup(response.content, "lxml", from_encoding="utf8")
-            apps = [
-                parse_card_info(app) for app in soup.select('div[data-uitype="500"]')
-            ]
+            apps = parse_card_list(response.content, self.parser)
 
         return apps
 
+    @_instrumented
+    def developer_all(self, developer, detailed=False, fields=None, max_pages=None):
+        """Fetches every app the developer has published, rather than a page of
+        them, by requesting their pages a few at a time, until one comes back
+        short.
+
+        :param developer: developer name to retrieve apps from, e.g. 'Disney'
+        :param detailed: if True, sends request per app for its full detail;
+            if "stream", returns a generator yielding each detailed app as
+            soon as it's parsed, starting while later pages are fetched
+        :param fields: (optional) the detail fields to parse for each app when
+            detailed. See `details`.
+        :param max_pages: (optional) the most pages of `DEV_MAX_RESULTS` apps
+            to request; defaults to `DEV_MAX_PAGES`
+        :return: a list of the developer's apps in order, without duplicates
+        """
+        pages = self._developer_pages(developer, max_pages)
+        return self._all_apps(self._iter_pages(pages), detailed, fields)
+
+    @_instrumented
     def suggestions(self, query):
         """Sends a GET request and retrieves a list of autocomplete suggestions
         matching the query term(s).
@@ -200,96 +720,163 @@ class PlayScraper(object):
         :param query: search query term(s) to retrieve autocomplete suggestions
         :return: a list of suggested search queries, up to 5
         """
-        if not query:
-            raise ValueError("Cannot get suggestions for an empty query.")
-
-        self.params.update({"json": 1, "c": 0, "query": query})
+        params = self._suggestions_request(query)
 
-        response = send_request("GET", self._suggestion_url, params=self.params)
+        response = send_request(
+            "GET", self._suggestion_url, params=params, session=self.session
+        )
         suggestions = [q["s"] for q in response.json()]
         return suggestions
 
-    def search(self, query, page=None, detailed=False):
+    @_instrumented
+    def search(self, query, page=None, detailed=False, fields=None):
         """Sends a POST request and retrieves a list of applications matching
         the query term(s).
 
         :param query: search query term(s) to retrieve matching apps
-        :param page: the page number to retrieve. Max is 12.
-        :param detailed: if True, sends request per app for its full detail
+        :param page: the page number to retrieve
+        :param detailed: if True, sends request per app for its full detail;
+            if "stream", returns a generator yielding each detailed app as
+            soon as it's parsed
+        :param fields: (optional) the detail fields to parse for each app when
+            detailed. See `details`.
         :return: a list of apps matching search terms
         """
-        page = 0 if page is None else int(page)
-        if page > len(self._pagtok) - 1:
-            raise ValueError(
-                "Parameter 'page' ({page}) must be between 0 and 12.".format(page=page)
-            )
+        data, params = self._search_request(query, page)
 
-        pagtok = self._pagtok[page]
-        data = generate_post_data(0, 0, pagtok)
-
-        self.params.update({"q": quote_plus(query), "c": "apps"})
-
-        response = send_request("POST", self._search_url, data, self.params)
-        soup = BeautifulSoup(response.content, "lxml", from_encoding="utf8")
+        response = send_request(
+            "POST", self._search_url, data, params, session=self.session
+        )
 
         if detailed:
-            apps = self._parse_multiple_apps(response)
+            apps = self._parse_multiple_apps(
+                response, stream=detailed == "stream", fields=fields
+            )
         else:
-            apps = [parse_cluster_card_info(app) for app in soup.select("div.Vpfmgd")]
+            apps = parse_cluster_card_list(response.content, self.parser)
 
         return apps
 
-    def similar(self, app_id, detailed=False, **kwargs):
+    def _fetch_search_page(self, data, params):
+        response = send_request(
+            "POST", self._search_url, data, params, session=self.session
+        )
+        return (
+            parse_cluster_card_list(response.content, self.parser),
+            parse_page_tokens(response.content),
+        )
+
+    def _iter_search(self, query, max_pages=None):
+        """Fetches search results pages concurrently, yielding their apps in
+        rank order without duplicates.
+
+        The pages of the known page tokens are requested at once, and those of
+        any other tokens found in a page are requested as it's read, so
+        pagination follows the tokens the server returns. Each page is read in
+        order: the known pages in turn, and a page found in another right after
+        it. Pages with no new apps aren't followed, and pages that fail, after
+        the first, are skipped.
+
+        :param query: search query term(s)
+        :param max_pages: (optional) the most pages to request
+        :return: a generator of app dictionaries
+        """
+        _, params = self._search_request(query)
+        executor = self._futures_session.executor
+        pending = {}
+        tokens = set()
+
+        def submit(order, token):
+            tokens.add(token)
+            pending[order] = executor.submit(
+                self._fetch_search_page, generate_post_data(0, 0, token), params
+            )
+
+        for page, token in sorted(self._pagtok.items())[:max_pages]:
+            submit((page,), token)
+        submitted = len(pending)
+        seen = set()
+        try:
+            while pending:
+                order = min(pending)
+                try:
+                    apps, found = pending.pop(order).result()
+                except requests.exceptions.RequestException as e:
+                    if order == (0,):
+                        raise
+                    self._log.warning(
+                        "Skipped search page {order}: {error}".format(
+                            order=order, error=e
+                        )
+                    )
+                    continue
+
+                apps = [app for app in apps if app["app_id"] not in seen]
+                for app in apps:
+                    seen.add(app["app_id"])
+                    yield app
+                if not apps:
+                    continue
+                for token in found:
+                    if token in tokens or (max_pages and submitted >= max_pages):
+                        continue
+                    submit(order + (len(tokens),), token)
+                    submitted += 1
+        finally:
+            for future in pending.values():
+                future.cancel()
+
+    @_instrumented
+    def search_all(self, query, detailed=False, fields=None, max_pages=None):
+        """Fetches every page of results matching the query term(s), rather
+        than a page of them, sending the requests for all the pages it knows of
+        at once, and following the page tokens in each response.
+
+        :param query: search query term(s) to retrieve matching apps
+        :param detailed: if True, sends request per app for its full detail;
+            if "stream", returns a generator yielding each detailed app as
+            soon as it's parsed, starting while later pages are fetched
+        :param fields: (optional) the detail fields to parse for each app when
+            detailed. See `details`.
+        :param max_pages: (optional) the most pages of results to request
+        :return: a list of apps matching search terms in rank order, without
+            duplicates
+        """
+        return self._all_apps(self._iter_search(query, max_pages), detailed, fields)
+
+    @_instrumented
+    def similar(self, app_id, detailed=False, fields=None, **kwargs):
         """Sends a GET request, follows the redirect, and retrieves a list of
         applications similar to the specified app.
 
         :param app_id: app to retrieve details from, e.g. 'com.nintendo.zaaa'
-        :param detailed: if True, sends request per app for its full detail
+        :param detailed: if True, sends request per app for its full detail;
+            if "stream", returns a generator yielding each detailed app as
+            soon as it's parsed
+        :param fields: (optional) the detail fields to parse for each app when
+            detailed. See `details`.
         :return: a list of similar apps
         """
         url = build_url("similar", app_id)
-        response = send_request("GET", url, params=self.params, allow_redirects=True)
-        soup = BeautifulSoup(response.content, "lxml", from_encoding="utf8")
+        response = send_request(
+            "GET", url, params=self.params, allow_redirects=True, session=self.session
+        )
 
         if detailed:
-            apps = self._parse_multiple_apps(response)
+            apps = self._parse_multiple_apps(
+                response, stream=detailed == "stream", fields=fields
+            )
         else:
-            apps = [parse_cluster_card_info(app) for app in soup.select("div.Vpfmgd")]
+            apps = parse_cluster_card_list(response.content, self.parser)
 
         return apps
 
+    @_instrumented
     def categories(self, ignore_promotions=True):
         """Sends a GET request to the front page (app store base url), parses
         and returns a list of all available categories.
         """
-        categories = {}
-
-        response = send_request("GET", s.BASE_URL, params=self.params)
-        soup = BeautifulSoup(response.content, "lxml", from_encoding="utf8")
-
-        category_links = soup.select(
-            'div[id*="action-dropdown-children"] a[href*="category"]'
+        response = send_request(
+            "GET", s.BASE_URL, params=self.params, session=self.session
         )
-        age_query = "?age="
-
-        for cat in category_links:
-            url = urljoin(s.BASE_URL, cat.attrs["href"])
-            category_id = url.split("/")[-1]
-            name = cat.string.strip()
-
-            if age_query in category_id:
-                category_id = "FAMILY"
-                url = url.split("?")[0]
-                name = "Family"
-
-            if category_id not in categories:
-                if ignore_promotions and "/store/apps/category/" not in url:
-                    continue
-
-                categories[category_id] = {
-                    "name": name,
-                    "url": url,
-                    "category_id": category_id,
-                }
-
-        return categories
+        return parse_categories(response.content, ignore_promotions, self.parser)
@@ -5,6 +5,58 @@ SUGGESTION_URL = "https://market.android.com/suggest/SuggRequest"
 SEARCH_URL = "https://play.google.com/store/search"
 
 CONCURRENT_REQUESTS = 10
+# Defaults of a `concurrency.AIMDConcurrency`, which adapts the number of
+# concurrent detail requests to how the server copes: the most it allows, and
+# how many times the baseline latency a request may take before it's taken as a
+# sign of overload
+MAX_CONCURRENT_REQUESTS = 50
+LATENCY_TOLERANCE = 3
+# Maximum number of detail requests submitted and not yet consumed at a time,
+# which bounds memory when fetching the details of a large batch of apps
+MAX_IN_FLIGHT = 2 * CONCURRENT_REQUESTS
+# Number of processes to parse detail pages in. If 0, pages are parsed by the
+# request threads as they're received.
+PARSE_WORKERS = 0
+# Backend to parse pages with: 'bs4' (BeautifulSoup); 'lxml', which works on
+# lxml trees directly with precompiled XPath and is several times faster; or
+# 'json', which parses details pages from their embedded data instead
+PARSERS = ("bs4", "lxml", "json")
+PARSER = "bs4"
+
+# Default size and entry lifetime, in seconds, of a `cache.DetailsCache`
+CACHE_SIZE = 1024
+CACHE_TTL = 600
+
+# Default maximum size, in bytes, of an `http_cache.HTTPCache` on disk
+HTTP_CACHE_SIZE = 1024 ** 3
+
+# Default requests per second and burst size of a `ratelimit.TokenBucket`
+RATE_LIMIT = 10
+RATE_LIMIT_BURST = CONCURRENT_REQUESTS
+
+# Retries of requests that fail with a connection error, timeout or one of
+# RETRY_STATUSES: the most attempts in all, and the base and cap, in seconds,
+# of the exponential backoff between them
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+RETRY_MAX_BACKOFF = 30
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Connection pooling for the long-lived HTTP session shared by all requests.
+# Number of per-host connection pools to keep cached
+POOL_CONNECTIONS = 10
+# Maximum number of connections to keep open per host
+POOL_MAXSIZE = CONCURRENT_REQUESTS
+# If True, block when a host's pool is exhausted instead of opening and
+# discarding extra connections
+POOL_BLOCK = False
+# Reuse connections between requests (HTTP keep-alive)
+KEEP_ALIVE = True
+
+# Connection limits for the AsyncPlayScraper's aiohttp connector. 0 is unlimited.
+ASYNC_CONNECTIONS = 100
+ASYNC_CONNECTIONS_PER_HOST = 0
+
 USER_AGENT = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_5) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -13,13 +65,27 @@ USER_AGENT = (
 
 # Number of results to retrieve from a collection. Range(1 - 120)
 NUM_RESULTS = 60
+# Limits of a collection page: the most apps it holds, and the greatest index of
+# its first app (page * results)
+COLLECTION_MAX_RESULTS = 120
+COLLECTION_MAX_START = 500
 
 # Number of results to retrieve from a developer
 DEV_RESULTS = 24
+# Limits of fetching all a developer's apps: the most apps a page holds, and the
+# most pages requested
+DEV_MAX_RESULTS = 120
+DEV_MAX_PAGES = 10
+# Number of list pages requested ahead of the one being read when fetching all
+# of a collection's or developer's apps; those past a short last page are wasted
+PAGES_IN_FLIGHT = 3
 
 # Number of results to retrieve from similar. Range (1 - 60)
 SIMILAR_RESULTS = 24
 
+# Number of results a search page holds; page N starts at N * SEARCH_RESULTS
+SEARCH_RESULTS = 20
+
 # pagTok post data strings to paginate through search results
 PAGE_TOKENS = {
     0: "",
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import base64
+import functools
 import logging
 import re
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, wait
 
 try:
     from urllib import quote_plus
@@ -10,13 +15,71 @@ except ImportError:
     from urllib.parse import quote_plus, urljoin, urlparse, parse_qs
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
 from requests_futures.sessions import FuturesSession
 
+from play_scraper import instrumentation as instr
 from play_scraper import settings as s
+from play_scraper.cache import details_cache_key
+from play_scraper.http_cache import CachingAdapter
+from play_scraper.ratelimit import ThrottledAdapter
+from play_scraper.replay import RecordingAdapter, ReplayAdapter
+from play_scraper.retry import RetryingAdapter, RetryPolicy
 
 log = logging.getLogger(__name__)
 
+_default_session = None
+_default_session_lock = threading.Lock()
+
+ADDITIONAL_INFO_FIELDS = frozenset(
+    [
+        "updated",
+        "size",
+        "installs",
+        "current_version",
+        "required_android_version",
+        "content_rating",
+        "iap_range",
+        "interactive_elements",
+        "developer",
+        "developer_email",
+        "developer_url",
+        "developer_address",
+    ]
+)
+DETAIL_FIELDS = ADDITIONAL_INFO_FIELDS | frozenset(
+    [
+        "title",
+        "icon",
+        "screenshots",
+        "video",
+        "category",
+        "score",
+        "histogram",
+        "reviews",
+        "description",
+        "description_html",
+        "recent_changes",
+        "editors_choice",
+        "price",
+        "free",
+        "iap",
+        "developer_id",
+    ]
+)
+# Classes of the page sections that fields can be parsed from on their own, so
+# a selection of only these fields needs just those sections' trees built.
+DETAIL_SECTIONS = {
+    "screenshots": ["Q4vdJd"],
+    "score": ["BHMmbe"],
+    "reviews": ["K9wGie", "VEF2C"],
+    "histogram": ["K9wGie", "VEF2C"],
+    "developer_id": ["hrTbp"],
+    "iap": ["IxB2fe"],
+}
+DETAIL_SECTIONS.update((field, ["IxB2fe"]) for field in ADDITIONAL_INFO_FIELDS)
+
 
 def default_headers():
     return {
@@ -51,6 +114,57 @@ def generate_post_data(results=None, page=None, pagtok=None, children=0):
     return data
 
 
+# The signed tokens of settings.PAGE_TOKENS, by their unsigned part
+_SIGNED_PAGE_TOKENS = dict(
+    (token.split(":", 1)[0], token) for token in s.PAGE_TOKENS.values() if token
+)
+
+
+def _varint(value):
+    """Encodes a non-negative integer as a protobuf base 128 varint."""
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def generate_page_token(start):
+    """Creates the pagTok of the results page starting at an app's index, e.g.
+    'GAEiAggU' for 20, for any page of a search or developer list.
+
+    The token is a base64 encoded protobuf message holding the index as a
+    varint, followed by a signature that can't be derived from it. The tokens of
+    `settings.PAGE_TOKENS` are reused, signature and all, for the indexes they
+    cover; the others are sent unsigned.
+
+    :param start: the index of the page's first result.
+    :return: a page token string; empty for the first page.
+    """
+    if start < 0:
+        raise ValueError("Start ({start}) cannot be negative.".format(start=start))
+    if not start:
+        return ""
+    offset = b"\x08" + _varint(start)
+    message = b"\x18\x01\x22" + _varint(len(offset)) + offset
+    token = base64.b64encode(message).decode("ascii")
+    return _SIGNED_PAGE_TOKENS.get(token, token)
+
+
+def is_unsigned_page_token(token):
+    """Whether a page token from `generate_page_token` was sent without a
+    signature, which the server isn't known to accept for every index.
+
+    :param token: a page token string.
+    :return: True if the token is unsigned, False if it's signed or empty.
+    """
+    return bool(token) and ":S:" not in token
+
+
 def build_url(method, id_string):
     """Creates the absolute url for a type of object. E.g. details, developer,
     or similar.
@@ -85,6 +199,94 @@ def build_collection_url(category="", collection=""):
     return url
 
 
+def create_session(
+    pool_connections=s.POOL_CONNECTIONS,
+    pool_maxsize=s.POOL_MAXSIZE,
+    pool_block=s.POOL_BLOCK,
+    keep_alive=s.KEEP_ALIVE,
+    http_cache=None,
+    rate_limiter=None,
+    retry_policy=None,
+    archive=None,
+):
+    """Creates a requests Session with a configured connection pool, meant to
+    be kept around and reused so connections and TLS sessions are not
+    re-established for every request. Its requests are retried by a
+    `retry.RetryPolicy`, and emit events to any active instrumentation.
+
+    :param pool_connections: the number of per-host connection pools to cache.
+    :param pool_maxsize: the maximum number of connections kept per host.
+    :param pool_block: if True, wait for a free connection when a host's pool
+        is exhausted instead of opening a throwaway connection.
+    :param keep_alive: if False, connections are closed after each request.
+    :param http_cache: (optional) an `http_cache.HTTPCache` to store responses
+        in and revalidate them against.
+    :param rate_limiter: (optional) a `ratelimit.TokenBucket` to take a token
+        from before sending each request, including revalidations.
+    :param retry_policy: (optional) the `retry.RetryPolicy` to retry failed
+        requests by; defaults to one configured by the RETRY_* settings. Pass
+        `RetryPolicy(max_attempts=1)` to disable retries.
+    :param archive: (optional) a `replay.Archive` to record every response to,
+        after any retries, or to replay responses from without the network,
+        caching, throttling or retries.
+    :return: a requests Session object.
+    """
+    session = requests.Session()
+    if archive is not None and archive.replaying:
+        adapter = instr.InstrumentedAdapter(ReplayAdapter(archive))
+    else:
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        # Each attempt sent over the network is instrumented, including retries
+        # and revalidations, but not the time spent waiting to send it
+        adapter = instr.InstrumentedAdapter(adapter)
+        if rate_limiter is not None:
+            adapter = ThrottledAdapter(rate_limiter, adapter)
+        # Retries are throttled too, but not cached
+        adapter = RetryingAdapter(
+            RetryPolicy() if retry_policy is None else retry_policy, adapter
+        )
+        if http_cache is not None:
+            adapter = CachingAdapter(http_cache, adapter)
+        if archive is not None:
+            adapter = RecordingAdapter(archive, adapter)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def get_default_session():
+    """Returns the module level session shared by requests that aren't given
+    one explicitly, creating it on first use.
+
+    :return: a requests Session object.
+    """
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = create_session()
+    return _default_session
+
+
+def set_default_session(session):
+    """Replaces the module level session shared by requests that aren't given
+    one explicitly, such as those of the `api` functions, e.g. with one from
+    `create_session(rate_limiter=...)` to throttle them.
+
+    :param session: a requests Session, or None to create a new default
+        session on next use.
+    """
+    global _default_session
+    with _default_session_lock:
+        _default_session = session
+
+
 def send_request(
     method,
     url,
@@ -94,6 +296,7 @@ def send_request(
     timeout=30,
     verify=True,
     allow_redirects=False,
+    session=None,
 ):
     """Sends a request to the url and returns the response.
 
@@ -103,8 +306,11 @@ def send_request(
     :param headers: Dictionary of headers to include.
     :param timeout: number of seconds before timing out the request
     :param verify: a bool for requesting SSL verification.
+    :param session: the requests Session to send through; defaults to the
+        shared module session.
     :return: a Response object.
     """
+    session = get_default_session() if session is None else session
     data = {} if data is None else data
     params = {} if params is None else params
     headers = default_headers() if headers is None else headers
@@ -112,7 +318,7 @@ def send_request(
         data = generate_post_data()
 
     try:
-        response = requests.request(
+        response = session.request(
             method=method,
             url=url,
             data=data,
@@ -131,10 +337,62 @@ def send_request(
     return response
 
 
-def parse_additional_info(soup):
+def detail_fields(fields):
+    """Validates a selection of app detail fields to parse. The 'app_id' and
+    'url' are always included, so are accepted and dropped.
+
+    :param fields: an iterable of detail field names, or None for all of them
+    :return: a frozenset of the fields to parse, or None for all of them
+    """
+    if fields is None:
+        return None
+
+    fields = frozenset(fields) - {"app_id", "url"}
+    invalid = fields - DETAIL_FIELDS
+    if invalid:
+        raise ValueError(
+            "Invalid detail fields: {fields}.".format(fields=", ".join(sorted(invalid)))
+        )
+    return fields
+
+
+def _wants(fields, *names):
+    """Whether any of the named fields is in a selection from `detail_fields`."""
+    return fields is None or any(name in fields for name in names)
+
+
+def _additional_info_fields(fields):
+    """The additional info fields to parse for a selection of detail fields."""
+    if fields is None:
+        return ADDITIONAL_INFO_FIELDS
+    if "iap" in fields:
+        return (fields & ADDITIONAL_INFO_FIELDS) | {"iap_range"}
+    return fields & ADDITIONAL_INFO_FIELDS
+
+
+def _details_strainer(fields):
+    """A SoupStrainer building only the page sections a selection of detail
+    fields is parsed from, or None if the whole page is needed.
+    """
+    if fields is None or not fields <= set(DETAIL_SECTIONS):
+        return None
+    sections = set()
+    for field in fields:
+        sections.update(DETAIL_SECTIONS[field])
+    # Match the classes as words, as the strainer may be given the whole class
+    # attribute rather than each class, depending on the bs4 version.
+    return SoupStrainer(
+        attrs={"class": re.compile(r"\b(?:{})\b".format("|".join(sorted(sections))))}
+    )
+
+
+@instr.timed
+def parse_additional_info(soup, fields=None):
     """Parses an app's additional information section on its detail page.
 
     :param soup: the additional_info section BeautifulSoup object
+    :param fields: (optional) the additional info fields to parse; sections
+        for other fields are skipped and left as None
     :return: a dictionary of the app's parsed additional info
     """
     # This is super ugly because the CSS is obfuscated and doesn't have good
@@ -174,6 +432,15 @@ def parse_additional_info(soup):
         section_title = title_div.string
         if section_title in title_normalization:
             title_key = title_normalization[section_title]
+            if title_key == "developer_info":
+                wanted = _wants(
+                    fields, "developer_email", "developer_url", "developer_address"
+                )
+            else:
+                wanted = _wants(fields, title_key)
+            if not wanted:
+                continue
+
             value_div = title_div.next_sibling.select_one("span.htlgb")
 
             if title_key == "content_rating":
@@ -233,118 +500,131 @@ def parse_screenshot_src(img):
     return src
 
 
-def parse_app_details(soup):
+@instr.timed
+def parse_app_details(soup, fields=None):
     """Extracts an app's details from its info page.
 
     :param soup: a strained BeautifulSoup object of an app
+    :param fields: (optional) the detail fields to parse, as returned by
+        `detail_fields`; the others aren't parsed and are left out
     :return: a dictionary of app details
     """
-    title = soup.select_one('h1[itemprop="name"] span').text
-    icon = soup.select_one('img[class="T75of sHb2Xb"]').attrs["src"].split("=")[0]
-    editors_choice = bool(soup.select_one('meta[itemprop="editorsChoiceBadgeUrl"]'))
+    data = {}
 
-    # Main category will be first
-    category = [
-        c.attrs["href"].split("/")[-1] for c in soup.select('a[itemprop="genre"]')
-    ]
-
-    # Let the user handle modifying the URL to fetch different resolutions
-    # Removing the end `=w720-h310-rw` doesn't seem to give original res?
-    # Check 'src' and 'data-src' since it can be one or the other
-    screenshots = [
-        parse_screenshot_src(img) for img in soup.select("button.Q4vdJd img.DYfLw")
-    ]
-
-    try:
-        video = soup.select_one('button[data-trailer-url^="https"]').attrs.get(
-            "data-trailer-url"
+    if _wants(fields, "title"):
+        data["title"] = soup.select_one('h1[itemprop="name"] span').text
+    if _wants(fields, "icon"):
+        data["icon"] = (
+            soup.select_one('img[class="T75of sHb2Xb"]').attrs["src"].split("=")[0]
         )
-        if video is not None:
-            video = video.split("?")[0]
-    except AttributeError:
-        video = None
 
-    description_soup = soup.select_one('div[itemprop="description"] span div')
-    if description_soup:
-        description = "\n".join(description_soup.stripped_strings)
-        description_html = description_soup.encode_contents()
-    else:
-        description = description_html = None
-
-    # Reviews & Ratings
-    try:
-        score = soup.select_one("div.BHMmbe").text
-    except AttributeError:
-        score = None
-
-    histogram = {}
-    try:
-        reviews = int(
-            soup.select_one('span[aria-label$="ratings"]').text.replace(",", "")
-        )
-        ratings_section = soup.select_one("div.VEF2C")
-        num_ratings = [
-            int(rating.attrs["title"].replace(",", ""))
-            if rating.attrs.get("title")
-            else None
-            for rating in ratings_section.select('div span[style^="width:"]')
+    if _wants(fields, "screenshots"):
+        # Let the user handle modifying the URL to fetch different resolutions
+        # Removing the end `=w720-h310-rw` doesn't seem to give original res?
+        # Check 'src' and 'data-src' since it can be one or the other
+        data["screenshots"] = [
+            parse_screenshot_src(img) for img in soup.select("button.Q4vdJd img.DYfLw")
         ]
-        for i in range(5):
-            histogram[5 - i] = num_ratings[i]
-    except AttributeError:
-        reviews = 0
-
-    try:
-
-        changes_soup = soup.select('div[itemprop="description"] content')[1]
-        recent_changes = "\n".join(
-            [x.string.strip() if x.string is not None else "" for x in changes_soup]
-        )
-    except (IndexError, AttributeError):
-        recent_changes = None
 
-    try:
-        price = soup.select_one('meta[itemprop="price"]').attrs["content"]
-    except AttributeError:
-        # App is probably pre-register, requires logged in to see
+    if _wants(fields, "video"):
         try:
-            price = soup.select_one("not-preregistered").string.strip()
+            video = soup.select_one('button[data-trailer-url^="https"]').attrs.get(
+                "data-trailer-url"
+            )
+            if video is not None:
+                video = video.split("?")[0]
         except AttributeError:
-            price = None
+            video = None
+        data["video"] = video
 
-    free = price == "0"
+    if _wants(fields, "category"):
+        # Main category will be first
+        data["category"] = [
+            c.attrs["href"].split("/")[-1] for c in soup.select('a[itemprop="genre"]')
+        ]
 
-    additional_info_data = parse_additional_info(soup.select_one(".IxB2fe"))
+    # Reviews & Ratings
+    if _wants(fields, "score"):
+        try:
+            score = soup.select_one("div.BHMmbe").text
+        except AttributeError:
+            score = None
+        data["score"] = score
 
-    offers_iap = bool(additional_info_data.get("iap_range"))
+    if _wants(fields, "histogram", "reviews"):
+        histogram = {}
+        try:
+            reviews = int(
+                soup.select_one('span[aria-label$="ratings"]').text.replace(",", "")
+            )
+            ratings_section = soup.select_one("div.VEF2C")
+            num_ratings = [
+                int(rating.attrs["title"].replace(",", ""))
+                if rating.attrs.get("title")
+                else None
+                for rating in ratings_section.select('div span[style^="width:"]')
+            ]
+            for i in range(5):
+                histogram[5 - i] = num_ratings[i]
+        except AttributeError:
+            reviews = 0
+        data.update({"histogram": histogram, "reviews": reviews})
+
+    if _wants(fields, "description", "description_html"):
+        description_soup = soup.select_one('div[itemprop="description"] span div')
+        if not description_soup:
+            description = description_html = None
+        else:
+            description = "\n".join(description_soup.stripped_strings)
+            description_html = None
+            if _wants(fields, "description_html"):
+                description_html = description_soup.encode_contents()
+        data.update({"description": description, "description_html": description_html})
+
+    if _wants(fields, "recent_changes"):
+        try:
 
-    try:
-        dev_id = soup.select_one("a.hrTbp.R8zArc").attrs["href"].split("=")[1]
-    except IndexError:
-        dev_id = None
-    developer_id = dev_id if dev_id else None
+            changes_soup = soup.select('div[itemprop="description"] content')[1]
+            recent_changes = "\n".join(
+                [x.string.strip() if x.string is not None else "" for x in changes_soup]
+            )
+        except (IndexError, AttributeError):
+            recent_changes = None
+        data["recent_changes"] = recent_changes
 
-    data = {
-        "title": title,
-        "icon": icon,
-        "screenshots": screenshots,
-        "video": video,
-        "category": category,
-        "score": score,
-        "histogram": histogram,
-        "reviews": reviews,
-        "description": description,
-        "description_html": description_html,
-        "recent_changes": recent_changes,
-        "editors_choice": editors_choice,
-        "price": price,
-        "free": free,
-        "iap": offers_iap,
-        "developer_id": developer_id,
-    }
+    if _wants(fields, "editors_choice"):
+        data["editors_choice"] = bool(
+            soup.select_one('meta[itemprop="editorsChoiceBadgeUrl"]')
+        )
 
-    data.update(additional_info_data)
+    if _wants(fields, "price", "free"):
+        try:
+            price = soup.select_one('meta[itemprop="price"]').attrs["content"]
+        except AttributeError:
+            # App is probably pre-register, requires logged in to see
+            try:
+                price = soup.select_one("not-preregistered").string.strip()
+            except AttributeError:
+                price = None
+        data.update({"price": price, "free": price == "0"})
+
+    if _wants(fields, "developer_id"):
+        try:
+            dev_id = soup.select_one("a.hrTbp.R8zArc").attrs["href"].split("=")[1]
+        except IndexError:
+            dev_id = None
+        data["developer_id"] = dev_id if dev_id else None
+
+    info_fields = _additional_info_fields(fields)
+    if info_fields:
+        additional_info_data = parse_additional_info(
+            soup.select_one(".IxB2fe"), info_fields
+        )
+        data["iap"] = bool(additional_info_data.get("iap_range"))
+        data.update(additional_info_data)
 
+    if fields is not None:
+        data = {field: data[field] for field in fields}
     return data
 
 
@@ -367,6 +647,7 @@ def extract_id_query(url):
     return app_id
 
 
+@instr.timed
 def parse_cluster_card_info(soup):
     """
     App lists from GET requests follow a redirect to the /cluster page, which
@@ -433,6 +714,7 @@ def parse_cluster_card_info(soup):
     }
 
 
+@instr.timed
 def parse_card_info(soup):
     """Extracts basic app info from the app's card. Used when parsing pages
     with lists of apps.
@@ -495,53 +777,558 @@ def parse_card_info(soup):
     }
 
 
-def parse_app_details_response_hook(response, *args, **kwargs):
+def _parser_backend(parser):
+    """Returns the parser module `parser` selects, or None if the BeautifulSoup
+    parsers in this module should be used.
     """
-    Requests futures hook function to asynchronously parse app details as the
-    responses are received. Mimics the `details` api.
+    # Imported here as the parser modules themselves import from this module
+    if parser == "lxml":
+        from play_scraper import lxml_parser
+
+        return lxml_parser
+    if parser == "json":
+        from play_scraper import json_parser
+
+        return json_parser
+    if parser != "bs4":
+        raise ValueError(
+            "Invalid parser '{parser}'. Must be one of: {parsers}.".format(
+                parser=parser, parsers=", ".join(s.PARSERS)
+            )
+        )
+    return None
+
+
+@instr.timed
+def parse_card_list(content, parser=s.PARSER):
+    """Parses the basic info of every app card on a collection or developer
+    list page.
+
+    :param content: the list page's response content
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'
+    :return: a list of app dictionaries
+    """
+    backend = _parser_backend(parser)
+    if backend is not None:
+        return backend.parse_card_list(content)
+    with instr.span("soup", parser="bs4"):
+        soup = BeautifulSoup(content, "lxml", from_encoding="utf8")
+    return [parse_card_info(card) for card in soup.select('div[data-uitype="500"]')]
+
+
+@instr.timed
+def parse_cluster_card_list(content, parser=s.PARSER):
+    """Parses the basic info of every app card on a /cluster list page, e.g.
+    search results and similar apps.
+
+    :param content: the list page's response content
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'
+    :return: a list of app dictionaries
+    """
+    backend = _parser_backend(parser)
+    if backend is not None:
+        return backend.parse_cluster_card_list(content)
+    with instr.span("soup", parser="bs4"):
+        soup = BeautifulSoup(content, "lxml", from_encoding="utf8")
+    return [parse_cluster_card_info(card) for card in soup.select("div.Vpfmgd")]
+
+
+def parse_page_tokens(content):
+    """Extracts the pagination tokens of the pages a search results page links
+    to, e.g. the next one, in order of appearance and without duplicates.
+
+    :param content: the search results page's response content
+    :return: a list of pagTok strings
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", "replace")
+    tokens = []
+    for token in re.findall(s.TOKEN_RE, content):
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+@instr.timed
+def parse_app_ids(content, parser=s.PARSER):
+    """Extracts the ids of every app listed on a list page, in order.
+
+    :param content: the list page's response content
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'
+    :return: a list of app ids
+    """
+    backend = _parser_backend(parser)
+    if backend is not None:
+        return backend.parse_app_ids(content)
+
+    # TODO: refactor to better handle multiple possible list HTMLs and selectors
+    # to extract out app ids
+    with instr.span("soup", parser="bs4"):
+        soup = BeautifulSoup(content, "lxml", from_encoding="utf8")
+
+    app_ids = [
+        x.attrs["data-docid"] for x in soup.select("span.preview-overlay-container")
+    ]
+    if not app_ids:
+        app_ids = [
+            extract_id_query(x.attrs.get("href")) for x in soup.select("div.p63iDd > a")
+        ]
+    return app_ids
+
+
+@instr.timed
+def parse_categories(content, ignore_promotions=True, parser=s.PARSER):
+    """Parses the category links in the front page's navigation dropdown.
+
+    :param content: the front page's response content
+    :param ignore_promotions: if True, skip links that aren't store categories
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'
+    :return: a dictionary of category dictionaries keyed by category id
+    """
+    backend = _parser_backend(parser)
+    if backend is not None:
+        category_links = backend.parse_category_links(content)
+    else:
+        with instr.span("soup", parser="bs4"):
+            soup = BeautifulSoup(content, "lxml", from_encoding="utf8")
+        category_links = [
+            (cat.attrs["href"], cat.string)
+            for cat in soup.select(
+                'div[id*="action-dropdown-children"] a[href*="category"]'
+            )
+        ]
+
+    categories = {}
+    age_query = "?age="
+
+    for href, name in category_links:
+        url = urljoin(s.BASE_URL, href)
+        category_id = url.split("/")[-1]
+        name = name.strip()
+
+        if age_query in category_id:
+            category_id = "FAMILY"
+            url = url.split("?")[0]
+            name = "Family"
+
+        if category_id not in categories:
+            if ignore_promotions and "/store/apps/category/" not in url:
+                continue
+
+            categories[category_id] = {
+                "name": name,
+                "url": url,
+                "category_id": category_id,
+            }
+
+    return categories
+
+
+@instr.timed
+def parse_app_details_content(content, parser=s.PARSER, fields=None):
+    """Parses an app's details from the raw content of its details page. Being
+    a module level function, it can be sent to a ProcessPoolExecutor.
+
+    :param content: the details page's response content
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'
+    :param fields: (optional) an iterable of the detail fields to parse; the
+        others aren't parsed and are left out
+    :return: a dictionary of app details
+    """
+    fields = detail_fields(fields)
+    if fields is not None and not fields:
+        return {}
+
+    backend = _parser_backend(parser)
+    if backend is not None:
+        return backend.parse_app_details_content(content, fields)
+    with instr.span("soup", parser="bs4"):
+        soup = BeautifulSoup(
+            content, "lxml", from_encoding="utf8", parse_only=_details_strainer(fields)
+        )
+    return parse_app_details(soup, fields)
+
+
+def _parse_variant(parser, fields):
+    """Identifies how a page was parsed, to cache the result on disk under."""
+    return "{parser}:{fields}".format(
+        parser=parser, fields="*" if fields is None else ",".join(sorted(fields))
+    )
+
+
+def _cached_parse(response, parser, fields):
+    """Returns what was parsed from a response's body before, if it's cached by
+    an `http_cache.CachingAdapter` and wasn't modified since.
+    """
+    if not getattr(response, "from_cache", False):
+        return None
+    return response.http_cache.get_parsed(
+        response.cache_key, _parse_variant(parser, fields), response.cache_digest
+    )
+
+
+def _store_parse(response, parser, fields, app_json):
+    """Caches what was parsed from a response's body alongside it on disk."""
+    if getattr(response, "http_cache", None) is None:
+        return
+    try:
+        response.http_cache.set_parsed(
+            response.cache_key,
+            _parse_variant(parser, fields),
+            response.cache_digest,
+            app_json,
+        )
+    except (IOError, OSError) as e:
+        log.warning("Could not cache {url}: {err}".format(url=response.url, err=e))
+
+
+def parse_app_details_response(response, parser=s.PARSER, fields=None):
+    """Parses an app's details from its details page's response. If the page
+    was served from an `http_cache.HTTPCache` unmodified and was parsed the
+    same way before, that result is returned without parsing it again.
+
+    :param response: the details page's Response
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'
+    :param fields: (optional) an iterable of the detail fields to parse
+    :return: a dictionary of app details
+    """
+    fields = detail_fields(fields)
+    app_json = _cached_parse(response, parser, fields)
+    if app_json is None:
+        app_json = parse_app_details_content(response.content, parser, fields)
+        _store_parse(response, parser, fields, app_json)
+    return app_json
+
+
+def raise_for_status_response_hook(response, *args, **kwargs):
+    """
+    Requests futures hook function that raises for unsuccessful responses.
     """
     if not response.status_code == requests.codes.ok:
         response.raise_for_status()
-    soup = BeautifulSoup(response.content, "lxml", from_encoding="utf8")
-    details = parse_app_details(soup)
-    response.app_details_data = details
 
 
-def multi_futures_app_request(
-    app_ids, headers=None, verify=True, params=None, workers=s.CONCURRENT_REQUESTS
-):
+def parse_app_details_response_hook(response, *args, **kwargs):
     """
-    :param app_ids: a list of app IDs.
-    :param headers: a dictionary of custom headers to use.
-    :param verify: bool for requesting SSL verification.
-    :return: a list of all apps' detail data
+    Requests futures hook function to asynchronously parse app details as the
+    responses are received. Mimics the `details` api. Pass `parser` and
+    `fields` keywords, e.g. with `functools.partial`, to choose the parser
+    backend and the fields to parse.
     """
-    session = FuturesSession(max_workers=workers)
+    raise_for_status_response_hook(response)
+    response.app_details_data = parse_app_details_response(
+        response, kwargs.get("parser", s.PARSER), kwargs.get("fields")
+    )
+    # Release the page body now that it's parsed, rather than holding it until
+    # the caller is done with the response.
+    response._content = None
 
-    headers = default_headers() if headers is None else headers
-    responses = [
-        session.get(
-            build_url("details", app_id),
-            headers=headers,
-            verify=verify,
-            params=params,
-            hooks={"response": parse_app_details_response_hook},
+
+def _record_concurrency(concurrency, response=None, error=None):
+    """Reports a completed detail request to a concurrency controller, counting
+    connection errors, timeouts, retries and retryable statuses as congestion.
+
+    Its latency is the server's, timed by the session's innermost adapter,
+    rather than the response's `elapsed`, which includes the time it waited
+    on a rate limiter or to be retried; those would read as the server slowing
+    down.
+    """
+    if concurrency is None:
+        return
+    if error is None:
+        latency = getattr(response, "latency", None)
+        if latency is None:
+            # Not sent through an `instrumentation.InstrumentedAdapter`
+            latency = response.elapsed.total_seconds()
+        concurrency.record(latency, getattr(response, "retries", 0) > 0)
+        return
+
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    concurrency.record(congested=status is None or status in s.RETRY_STATUSES)
+
+
+def _iter_app_details(
+    app_ids,
+    headers=None,
+    verify=True,
+    params=None,
+    workers=s.CONCURRENT_REQUESTS,
+    session=None,
+    max_in_flight=s.MAX_IN_FLIGHT,
+    parse_executor=None,
+    parser=s.PARSER,
+    fields=None,
+    cache=None,
+    concurrency=None,
+):
+    """Sends a request for every app's details page and yields each app's
+    position in `app_ids` with its parsed details as soon as its request
+    completes. Apps that fail to fetch are logged and skipped.
+
+    At most `max_in_flight` requests are submitted at a time; the next ids are
+    only taken from `app_ids` as earlier requests complete.
+
+    Without a `parse_executor`, pages are parsed by the request threads as
+    they're received. With one, the request threads only fetch, and each page's
+    content is handed to the executor to parse; pages being parsed count
+    towards `max_in_flight`.
+
+    With a `cache`, apps already cached are yielded without a request, apps
+    another caller is fetching wait for its result, and every app fetched is
+    cached.
+
+    With a `concurrency` controller, its limit, adjusted as each request
+    completes, replaces `max_in_flight`, and requests are sent from as many
+    threads as its maximum.
+    """
+    fields = detail_fields(fields)
+    owned_executor = None
+    if not isinstance(session, FuturesSession):
+        if concurrency is not None:
+            workers = concurrency.maximum
+        # Pass our own executor so FuturesSession leaves the given session's
+        # connection pools as they are.
+        owned_executor = instr.ContextExecutor(max_workers=workers)
+        session = FuturesSession(
+            executor=owned_executor,
+            session=get_default_session() if session is None else session,
         )
-        for app_id in app_ids
-    ]
 
-    apps = []
-    for i, response in enumerate(responses):
-        try:
-            result = response.result()
-            app_json = result.app_details_data
-            app_json.update({"app_id": app_ids[i], "url": result.url})
-            apps.append(response.result().app_details_data)
-        except requests.exceptions.RequestException as e:
-            log.error(
-                "Error occurred fetching {app}: {err}".format(
-                    app=app_ids[i], err=str(e)
+    headers = default_headers() if headers is None else headers
+    hook = (
+        functools.partial(parse_app_details_response_hook, parser=parser, fields=fields)
+        if parse_executor is None
+        else raise_for_status_response_hook
+    )
+    app_ids = enumerate(app_ids)
+    # Apps to take again before the next of `app_ids`, as the fetch they were
+    # waiting for was abandoned
+    retries = deque()
+    # Maps each pending future to its app's index, id, and the response of its
+    # fetched page once the future is parsing it.
+    futures = {}
+    # The futures of fetches by other callers of the cache, or by this one for
+    # an earlier copy of an app id, each with the apps waiting for it
+    waiting = {}
+
+    def cache_key(app_id):
+        return details_cache_key(app_id, params, fields)
+
+    def submit(count, completed):
+        """Takes up to `count` more apps, submitting a request for each, or
+        adding it to `completed` if it's cached.
+        """
+        for _ in range(count):
+            try:
+                i, app_id = retries.popleft() if retries else next(app_ids)
+            except StopIteration:
+                return
+
+            if cache is not None:
+                app_json, loading = cache.begin(cache_key(app_id))
+                if app_json is not None:
+                    completed.append((i, app_json))
+                    continue
+                if loading is not None:
+                    if loading not in waiting:
+                        waiting[loading] = []
+                        futures[loading] = (i, app_id, None)
+                    waiting[loading].append((i, app_id))
+                    continue
+
+            with instr.activated(instr.tagged(app_id=app_id)):
+                future = session.get(
+                    build_url("details", app_id),
+                    headers=headers,
+                    verify=verify,
+                    params=params,
+                    hooks={"response": hook},
                 )
-            )
+            futures[future] = (i, app_id, None)
 
-    return apps
+    def finish(app_id, app_json=None, error=None):
+        if cache is not None:
+            cache.finish(cache_key(app_id), app_json, error)
+
+    def log_error(app_id, error):
+        log.error(
+            "Error occurred fetching {app}: {err}".format(app=app_id, err=str(error))
+        )
+
+    def window():
+        return max_in_flight if concurrency is None else concurrency.limit
+
+    try:
+        completed = []
+        submit(window(), completed)
+        while futures or completed:
+            done = ()
+            if futures and not completed:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                i, app_id, response = futures.pop(future)
+                if future in waiting:
+                    for i, app_id in waiting.pop(future):
+                        try:
+                            completed.append((i, future.result()))
+                        except CancelledError:
+                            retries.append((i, app_id))
+                        except requests.exceptions.RequestException as e:
+                            log_error(app_id, e)
+                    continue
+
+                try:
+                    if response is not None:
+                        app_json = future.result()
+                        _store_parse(response, parser, fields, app_json)
+                    else:
+                        try:
+                            response = future.result()
+                        except requests.exceptions.RequestException as e:
+                            _record_concurrency(concurrency, error=e)
+                            raise
+                        _record_concurrency(concurrency, response)
+                        if parse_executor is None:
+                            app_json = response.app_details_data
+                        else:
+                            app_json = _cached_parse(response, parser, fields)
+                            if app_json is None:
+                                parse_future = parse_executor.submit(
+                                    parse_app_details_content,
+                                    response.content,
+                                    parser,
+                                    fields,
+                                )
+                                response._content = None
+                                futures[parse_future] = (i, app_id, response)
+                                continue
+                except requests.exceptions.RequestException as e:
+                    log_error(app_id, e)
+                    finish(app_id, error=e)
+                    continue
+                except BaseException as e:
+                    finish(app_id, error=e)
+                    raise
+
+                app_json.update({"app_id": app_id, "url": response.url})
+                finish(app_id, app_json)
+                completed.append((i, app_json))
+
+            # Keep the window full while the caller handles these results
+            results, completed = completed, []
+            submit(window() - len(futures), completed)
+            for result in results:
+                yield result
+    finally:
+        # Only reached with futures left if the caller stopped iterating early
+        for future, (_, app_id, _) in futures.items():
+            if future not in waiting:
+                future.cancel()
+                if cache is not None:
+                    cache.abandon(cache_key(app_id))
+        if owned_executor is not None:
+            owned_executor.shutdown(wait=False)
+
+
+def iter_futures_app_request(
+    app_ids,
+    headers=None,
+    verify=True,
+    params=None,
+    workers=s.CONCURRENT_REQUESTS,
+    session=None,
+    max_in_flight=s.MAX_IN_FLIGHT,
+    parse_executor=None,
+    parser=s.PARSER,
+    fields=None,
+    cache=None,
+    concurrency=None,
+):
+    """Concurrently fetches every app's details, yielding each app as soon as
+    its request completes rather than waiting for the whole batch. Apps are
+    yielded in completion order, not the order of `app_ids`.
+
+    :param app_ids: an iterable of app IDs; consumed lazily, so it can be a
+        generator over any number of ids.
+    :param headers: a dictionary of custom headers to use.
+    :param verify: bool for requesting SSL verification.
+    :param session: a FuturesSession to reuse, or a requests Session to send
+        the requests through. Defaults to the shared module session.
+    :param max_in_flight: the maximum number of requests submitted at a time.
+    :param parse_executor: (optional) an executor, e.g. a ProcessPoolExecutor,
+        to parse the fetched pages in instead of the request threads.
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'.
+    :param fields: (optional) an iterable of the detail fields to parse.
+    :param cache: (optional) a `cache.DetailsCache` to serve apps from and
+        cache fetched apps in.
+    :param concurrency: (optional) a `concurrency.AIMDConcurrency` to adapt
+        the number of requests in flight by, instead of `max_in_flight`.
+    :return: a generator of app detail dictionaries
+    """
+    for _, app_json in _iter_app_details(
+        app_ids,
+        headers,
+        verify,
+        params,
+        workers,
+        session,
+        max_in_flight,
+        parse_executor,
+        parser,
+        fields,
+        cache,
+        concurrency,
+    ):
+        yield app_json
+
+
+def multi_futures_app_request(
+    app_ids,
+    headers=None,
+    verify=True,
+    params=None,
+    workers=s.CONCURRENT_REQUESTS,
+    session=None,
+    max_in_flight=s.MAX_IN_FLIGHT,
+    parse_executor=None,
+    parser=s.PARSER,
+    fields=None,
+    cache=None,
+    concurrency=None,
+):
+    """
+    :param app_ids: an iterable of app IDs.
+    :param headers: a dictionary of custom headers to use.
+    :param verify: bool for requesting SSL verification.
+    :param session: a FuturesSession to reuse, or a requests Session to send
+        the requests through. Defaults to the shared module session.
+    :param max_in_flight: the maximum number of requests submitted at a time.
+    :param parse_executor: (optional) an executor, e.g. a ProcessPoolExecutor,
+        to parse the fetched pages in instead of the request threads.
+    :param parser: the parser backend to use, 'bs4', 'lxml' or 'json'.
+    :param fields: (optional) an iterable of the detail fields to parse.
+    :param cache: (optional) a `cache.DetailsCache` to serve apps from and
+        cache fetched apps in.
+    :param concurrency: (optional) a `concurrency.AIMDConcurrency` to adapt
+        the number of requests in flight by, instead of `max_in_flight`.
+    :return: a list of all apps' detail data, in the order of `app_ids`
+    """
+    results = sorted(
+        _iter_app_details(
+            app_ids,
+            headers,
+            verify,
+            params,
+            workers,
+            session,
+            max_in_flight,
+            parse_executor,
+            parser,
+            fields,
+            cache,
+            concurrency,
+        ),
+        key=lambda result: result[0],
+    )
+    return [app_json for _, app_json in results]
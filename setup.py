@@ -41,4 +41,7 @@ setup(
         'requests-futures>=0.9.7',
         'requests[security]>=2.20.0',
     ],
+    extras_require={
+        'async': ['aiohttp>=3.5.4;python_version>="3.5.3"'],
+    },
 )
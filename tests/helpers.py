@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+
+try:
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from urllib.parse import urlparse, parse_qs
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def card_list(app_ids):
+    """Builds a collection or developer list page of app cards, copying the
+    first card of the developer fixture for each app id.
+    """
+    content = load_fixture("developer.html").decode("utf-8")
+    marker = '<div class="card '
+    start = content.index(marker)
+    end = content.index(marker, start + 1)
+    card = content[start:end]
+    return "".join(
+        card.replace("com.example.studio.photos", app_id) for app_id in app_ids
+    ).encode("utf-8")
+
+
+def cluster_card_list(app_ids, extra=""):
+    """Builds a search results page of app cards, copying the first card of
+    the cluster fixture for each app id, followed by any extra markup.
+    """
+    content = load_fixture("cluster.html").decode("utf-8")
+    marker = '<div class="Vpfmgd">'
+    start = content.index(marker)
+    end = content.index(marker, start + 1)
+    card = content[start:end]
+    cards = "".join(
+        card.replace("com.example.cluster.one", app_id) for app_id in app_ids
+    )
+    return (cards + extra).encode("utf-8")
+
+
+class FakeAdapter(BaseAdapter):
+    """A transport adapter that answers requests without the network.
+
+    :param routes: a dict of url path to response body bytes, or to a
+        callable taking the PreparedRequest and returning (status, body) or
+        (status, body, headers).
+    :param delays: a dict of app id to seconds to wait before responding.
+    :param statuses: a dict of app id to the status code to respond with.
+    """
+
+    def __init__(self, routes, delays=None, statuses=None):
+        super(FakeAdapter, self).__init__()
+        self.routes = routes
+        self.delays = delays or {}
+        self.statuses = statuses or {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests.append(request)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            parsed = urlparse(request.url)
+            app_id = parse_qs(parsed.query).get("id", [None])[0]
+            time.sleep(self.delays.get(app_id, 0))
+
+            route = self.routes[parsed.path]
+            headers = {}
+            if callable(route):
+                result = route(request)
+                status, body = result[:2]
+                if len(result) > 2:
+                    headers = result[2]
+            else:
+                status, body = self.statuses.get(app_id, 200), route
+
+            response = requests.Response()
+            response.headers.update(headers)
+            response.status_code = status
+            response.reason = "OK" if status == 200 else "Error"
+            response._content = body
+            response.url = request.url
+            response.request = request
+            return response
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def close(self):
+        pass
+
+
+def fake_session(routes, **kwargs):
+    """Creates a requests Session whose requests are all served by a
+    FakeAdapter, which is returned alongside it.
+    """
+    adapter = FakeAdapter(routes, **kwargs)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session, adapter
+
+
+def mount_fake(session, adapter):
+    """Replaces the HTTPAdapter at the bottom of a session's adapters, e.g. one
+    from `utils.create_session` wrapped to cache, throttle and retry requests,
+    with a FakeAdapter, so everything above it is still used.
+    """
+    wrapper = session.get_adapter("https://")
+    while isinstance(getattr(wrapper.adapter, "adapter", None), BaseAdapter):
+        wrapper = wrapper.adapter
+    wrapper.adapter = adapter
+    return adapter
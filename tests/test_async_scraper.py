@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+from play_scraper import settings
+from play_scraper.async_scraper import AsyncPlayScraper
+from play_scraper.retry import RetryPolicy
+
+from tests.helpers import card_list, load_fixture
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def serve(routes):
+    """Starts a local server of GET and POST routes, returning its runner and
+    base url.
+    """
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_route("*", path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, "http://127.0.0.1:{port}".format(port=port)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self, *args, **kwargs):
+        super(CountingExecutor, self).__init__(*args, **kwargs)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super(CountingExecutor, self).submit(*args, **kwargs)
+
+
+class ReservingLimiter(object):
+    """Counts the tokens taken, each to be waited on for `wait` seconds."""
+
+    def __init__(self, wait):
+        self.wait = wait
+        self.reserved = 0
+
+    def reserve(self, tokens=1):
+        self.reserved += tokens
+        return self.wait
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class AsyncPlayScraperTest(unittest.TestCase):
+    def test_init_validates_locale(self):
+        with self.assertRaises(ValueError):
+            AsyncPlayScraper(hl="invalid")
+        with self.assertRaises(ValueError):
+            AsyncPlayScraper(gl="invalid")
+
+    def test_invalid_collection_id(self):
+        async def collection():
+            async with AsyncPlayScraper() as s:
+                await s.collection("invalid_collection_id")
+
+        with self.assertRaises(ValueError) as e:
+            run(collection())
+        self.assertEqual(
+            "Invalid collection_id 'invalid_collection_id'.", str(e.exception)
+        )
+
+    def test_suggestions_share_session(self):
+        received = []
+
+        async def suggest(request):
+            received.append(dict(request.query))
+            return web.json_response([{"s": "cat games"}, {"s": "cats"}])
+
+        async def suggestions():
+            runner, base = await serve({"/suggest": suggest})
+            try:
+                async with AsyncPlayScraper() as s:
+                    s._suggestion_url = base + "/suggest"
+                    first = await s.suggestions("cat")
+                    session = s.session
+                    second = await s.suggestions("cat")
+                    self.assertIs(session, s.session)
+                self.assertIsNone(s.session)
+                return first, second
+            finally:
+                await runner.cleanup()
+
+        first, second = run(suggestions())
+        self.assertEqual(["cat games", "cats"], first)
+        self.assertEqual(first, second)
+        self.assertEqual("cat", received[0]["query"])
+        self.assertEqual("en", received[0]["hl"])
+
+    def test_fetching_app_details(self):
+        async def details_page(request):
+            return web.Response(body=load_fixture("details.html"))
+
+        async def details():
+            runner, base = await serve({"/store/apps/details": details_page})
+            try:
+                with mock.patch.object(settings, "BASE_URL", base + "/store/apps"):
+                    async with AsyncPlayScraper() as s:
+                        return await s.details("com.example.messenger")
+            finally:
+                await runner.cleanup()
+
+        app_data = run(details())
+        self.assertEqual("com.example.messenger", app_data["app_id"])
+        self.assertEqual(["COMMUNICATION"], app_data["category"])
+
+    def test_detailed_list_is_bounded_and_parsed_off_the_loop(self):
+        app_ids = ["com.example.{i}".format(i=i) for i in range(20)]
+        in_flight = [0, 0]
+
+        async def collection_page(request):
+            return web.Response(body=card_list(app_ids))
+
+        async def details_page(request):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return web.Response(body=load_fixture("details.html"))
+
+        executor = CountingExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+
+        async def collection():
+            runner, base = await serve(
+                {
+                    "/store/apps/collection/topselling_free": collection_page,
+                    "/store/apps/details": details_page,
+                }
+            )
+            try:
+                with mock.patch.object(settings, "BASE_URL", base + "/store/apps"):
+                    async with AsyncPlayScraper(
+                        parser="lxml", parse_executor=executor, max_in_flight=3
+                    ) as s:
+                        return await s.collection("TOP_FREE", detailed=True)
+            finally:
+                await runner.cleanup()
+
+        apps = run(collection())
+        self.assertEqual(app_ids, [app["app_id"] for app in apps])
+        self.assertLessEqual(in_flight[1], 3)
+        # The list page's ids, and each detail page, are parsed in the executor
+        self.assertEqual(len(app_ids) + 1, executor.submitted)
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class AsyncRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.statuses = []
+        self.received = 0
+
+    def fetch(self, **kwargs):
+        async def details_page(request):
+            self.received += 1
+            status = self.statuses.pop(0) if self.statuses else 200
+            if status != 200:
+                return web.Response(
+                    status=status, headers={"Location": "https://consent.example"}
+                )
+            return web.Response(body=load_fixture("details.html"))
+
+        kwargs.setdefault(
+            "retry_policy", RetryPolicy(max_attempts=3, backoff=0.01, jitter=False)
+        )
+
+        async def details():
+            runner, base = await serve({"/store/apps/details": details_page})
+            try:
+                with mock.patch.object(settings, "BASE_URL", base + "/store/apps"):
+                    async with AsyncPlayScraper(parser="lxml", **kwargs) as s:
+                        return await s.details("com.example.messenger", ["title"])
+            finally:
+                await runner.cleanup()
+
+        # Fails rather than hangs should a status be retried forever
+        return run(asyncio.wait_for(details(), 5))
+
+    def test_retries_until_ok(self):
+        self.statuses = [429, 503]
+        app = self.fetch()
+        self.assertEqual("com.example.messenger", app["app_id"])
+        self.assertEqual(3, self.received)
+
+    def test_runs_out_of_attempts(self):
+        self.statuses = [503] * 5
+        with self.assertRaises(ValueError) as e:
+            self.fetch()
+        self.assertIn("503", str(e.exception))
+        self.assertEqual(3, self.received)
+
+    def test_redirect_is_not_retried(self):
+        self.statuses = [302] * 5
+        with self.assertRaises(ValueError) as e:
+            self.fetch()
+        self.assertIn("302", str(e.exception))
+        self.assertEqual(1, self.received)
+
+    def test_every_attempt_waits_for_the_rate_limiter(self):
+        self.statuses = [503]
+        limiter = ReservingLimiter(wait=0.05)
+        with mock.patch("asyncio.sleep", wraps=asyncio.sleep) as sleep:
+            self.fetch(rate_limiter=limiter)
+        self.assertEqual(2, limiter.reserved)
+        self.assertEqual(2, self.received)
+        waits = [call[0][0] for call in sleep.call_args_list]
+        self.assertEqual(2, waits.count(0.05))
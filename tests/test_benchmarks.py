@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+from benchmarks import parsers, throughput
+from benchmarks.parsers import Result
+from benchmarks.server import MockPlayStore
+from play_scraper.retry import RetryPolicy
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestParserBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_benchmarks_parse_apps(self):
+        for benchmark in parsers.benchmarks():
+            self.assertTrue(benchmark.function(*benchmark.args), benchmark.name)
+
+    def test_baseline(self):
+        path = os.path.join(self.directory, "baseline.json")
+        self.assertEqual({}, parsers.load_baseline(path))
+
+        benchmark = parsers.benchmarks()[0]
+        results = parsers.run([benchmark], min_time=0.01)
+        parsers.save_baseline(path, results)
+        with open(path) as f:
+            self.assertIn(benchmark.name, json.load(f)["benchmarks"])
+        self.assertEqual([benchmark.name], list(parsers.load_baseline(path)))
+
+    def test_regressions(self):
+        baseline = {"slower": Result(100, 1000), "larger": Result(100, 1000)}
+        results = {
+            "slower": Result(70, 1000),
+            "larger": Result(95, 1300),
+            "new": Result(1, 1),
+        }
+        self.assertEqual(["larger", "slower"], parsers.regressions(results, baseline))
+        self.assertEqual([], parsers.regressions(results, baseline, tolerance=0.5))
+        self.assertIn("-30.0%", parsers.report(results, baseline))
+
+
+class TestMockPlayStore(unittest.TestCase):
+    def setUp(self):
+        self.store = MockPlayStore(seed=0, list_size=5)
+        self.store.start()
+        self.addCleanup(self.store.stop)
+        patch = self.store.patch_settings()
+        patch.__enter__()
+        self.addCleanup(patch.__exit__, None, None, None)
+        self.scraper = PlayScraper(
+            parser="lxml", session=create_session(retry_policy=RetryPolicy(1))
+        )
+        self.addCleanup(self.scraper.close)
+
+    def test_serves_the_scraper(self):
+        self.assertEqual("Example LLC", self.scraper.details("com.a.b")["developer"])
+        apps = self.scraper.collection("TOP_FREE", results=3, page=2)
+        self.assertEqual(
+            ["com.example.topsellingfree.{n}".format(n=n) for n in [6, 7, 8]],
+            [app["app_id"] for app in apps],
+        )
+        self.assertEqual(24, len(self.scraper.developer("Example Studio")))
+        self.assertEqual(5, len(self.scraper.search("game", detailed=True)))
+        self.assertEqual(5, len(self.scraper.similar("com.a.b")))
+        self.assertEqual(5, len(self.scraper.suggestions("gam")))
+        self.assertIn("GAME", self.scraper.categories())
+        self.assertEqual({200: 12}, self.store.statuses)
+
+    def test_injects_failures(self):
+        self.store.error_rate = 0.5
+        self.store.throttle_rate = 0.5
+        response = self.scraper.session.get(self.store.url + "/store/apps")
+        self.assertIn(response.status_code, [429, 503])
+
+    def test_throughput(self):
+        for scenario in throughput.scenarios():
+            result = throughput.run(scenario, 2, 4, memory=False)
+            self.assertGreater(result.items, 0, scenario.name)
+            self.assertEqual(0, result.failures)
+            self.assertTrue(result.latencies)
+        self.assertEqual(2, throughput.percentile([3, 1, 2, 4], 0.5))
+        self.assertEqual(4, throughput.percentile([3, 1, 2, 4], 0.99))
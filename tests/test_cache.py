@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+import logging
+
+try:
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from urllib.parse import urlparse, parse_qs
+
+from play_scraper.cache import DetailsCache, details_cache_key
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import multi_futures_app_request
+
+from tests.helpers import fake_session, load_fixture
+
+
+logging.disable(logging.CRITICAL)
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDetailsCache(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.cache = DetailsCache(maxsize=2, ttl=60, timer=self.timer)
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", {"title": "A"})
+        self.assertEqual({"title": "A"}, self.cache.get("a"))
+        self.assertIn("a", self.cache)
+
+    def test_entries_are_copies(self):
+        app = {"screenshots": ["a.png"]}
+        self.cache.set("a", app)
+        app["screenshots"].append("b.png")
+        self.cache.get("a")["screenshots"].append("c.png")
+        self.assertEqual({"screenshots": ["a.png"]}, self.cache.get("a"))
+
+    def test_entries_expire(self):
+        self.cache.set("a", {})
+        self.timer.now = 59
+        self.assertEqual({}, self.cache.get("a"))
+        self.timer.now = 60
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(0, len(self.cache))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set("a", {})
+        self.cache.set("b", {})
+        self.cache.get("a")
+        self.cache.set("c", {})
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertIn("c", self.cache)
+
+    def test_get_or_load_coalesces_concurrent_loads(self):
+        calls = []
+        release = threading.Event()
+
+        def load():
+            calls.append(1)
+            release.wait()
+            return {"title": "A"}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.cache.get_or_load("a", load))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual([{"title": "A"}] * 5, results)
+        self.assertEqual({"title": "A"}, self.cache.get_or_load("a", None))
+
+    def test_get_or_load_errors_are_not_cached(self):
+        def fail():
+            raise ValueError("Invalid application ID")
+
+        with self.assertRaises(ValueError):
+            self.cache.get_or_load("a", fail)
+        self.assertEqual({}, self.cache.get_or_load("a", dict))
+
+    def test_abandoned_load_is_retried(self):
+        _, loading = self.cache.begin("a")
+        self.assertIsNone(loading)
+
+        results = []
+        waiter = threading.Thread(
+            target=lambda: results.append(self.cache.get_or_load("a", dict))
+        )
+        waiter.start()
+        time.sleep(0.1)
+        self.cache.abandon("a")
+        waiter.join()
+        self.assertEqual([{}], results)
+
+
+class TestCachedDetails(unittest.TestCase):
+    def setUp(self):
+        self.cache = DetailsCache()
+        self.session, self.adapter = fake_session(
+            {"/store/apps/details": load_fixture("details.html")},
+            delays={"com.example.slow": 0.2},
+        )
+
+    def test_details(self):
+        scraper = PlayScraper(session=self.session, cache=self.cache)
+        app = scraper.details("com.example.app")
+        self.assertEqual(app, scraper.details("com.example.app"))
+        self.assertEqual(1, len(self.adapter.requests))
+
+        scraper.details("com.example.app", fields=["title"])
+        PlayScraper(hl="es", session=self.session, cache=self.cache).details(
+            "com.example.app"
+        )
+        self.assertEqual(3, len(self.adapter.requests))
+
+    def test_futures_app_request(self):
+        params = {"hl": "en", "gl": "us"}
+        self.cache.set(
+            details_cache_key("com.example.cached", params), {"title": "Cached"}
+        )
+        app_ids = ["com.example.slow", "com.example.cached", "com.example.app"]
+
+        apps = multi_futures_app_request(
+            app_ids, params=params, session=self.session, cache=self.cache
+        )
+        self.assertEqual("Cached", apps[1]["title"])
+        self.assertEqual(2, len(self.adapter.requests))
+
+        self.assertEqual(
+            apps,
+            multi_futures_app_request(
+                app_ids, params=params, session=self.session, cache=self.cache
+            ),
+        )
+        self.assertEqual(2, len(self.adapter.requests))
+
+    def test_futures_app_request_coalesces(self):
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    multi_futures_app_request(
+                        ["com.example.slow"], session=self.session, cache=self.cache
+                    )
+                )
+            )
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(self.adapter.requests))
+        self.assertEqual([results[0]] * 3, results)
+
+    def test_futures_app_request_duplicates(self):
+        app_ids = ["com.example.slow"] * 3 + ["com.example.app"]
+        app_ids += ["com.example.slow", "com.example.app", "com.example.app"]
+        apps = multi_futures_app_request(
+            app_ids, session=self.session, cache=self.cache, parser="lxml"
+        )
+
+        self.assertEqual(app_ids, [app["app_id"] for app in apps])
+        requested = sorted(
+            parse_qs(urlparse(r.url).query)["id"][0] for r in self.adapter.requests
+        )
+        self.assertEqual(["com.example.app", "com.example.slow"], requested)
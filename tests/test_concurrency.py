@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+import logging
+
+from play_scraper.concurrency import AIMDConcurrency
+from play_scraper.retry import RetryPolicy
+from play_scraper.utils import create_session, multi_futures_app_request
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class StallingLimiter(object):
+    """Holds every few requests back, as a rate limiter out of tokens would."""
+
+    def __init__(self, every=3, wait=0.05):
+        self.every = every
+        self.wait = wait
+        self.acquired = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        with self.lock:
+            self.acquired += tokens
+            stall = self.acquired % self.every == 0
+        if stall:
+            time.sleep(self.wait)
+
+
+class TestAIMDConcurrency(unittest.TestCase):
+    def test_increases_additively(self):
+        concurrency = AIMDConcurrency(initial=2, maximum=3)
+        concurrency.record(0.1)
+        self.assertEqual(2, concurrency.limit)
+        concurrency.record(0.1)
+        concurrency.record(0.1)
+        self.assertEqual(3, concurrency.limit)
+        for _ in range(10):
+            concurrency.record(0.1)
+        self.assertEqual(3, concurrency.limit)
+
+    def test_decreases_once_per_round(self):
+        concurrency = AIMDConcurrency(initial=8, minimum=2)
+        concurrency.record(congested=True)
+        self.assertEqual(4, concurrency.limit)
+        # The rest of the round was sent at the old limit
+        for _ in range(3):
+            concurrency.record(congested=True)
+        self.assertEqual(4, concurrency.limit)
+        concurrency.record(congested=True)
+        self.assertEqual(2, concurrency.limit)
+        for _ in range(4):
+            concurrency.record(congested=True)
+        self.assertEqual(2, concurrency.limit)
+
+    def test_slow_requests_are_congested(self):
+        concurrency = AIMDConcurrency(initial=8, latency_tolerance=3)
+        concurrency.record(0.1)
+        concurrency.record(0.25)
+        self.assertEqual(8, concurrency.limit)
+        concurrency.record(0.5)
+        self.assertEqual(4, concurrency.limit)
+
+        concurrency = AIMDConcurrency(initial=8, latency_tolerance=None)
+        concurrency.record(0.1)
+        concurrency.record(10)
+        self.assertEqual(8, concurrency.limit)
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            AIMDConcurrency(initial=10, maximum=5)
+        with self.assertRaises(ValueError):
+            AIMDConcurrency(minimum=0)
+        with self.assertRaises(ValueError):
+            AIMDConcurrency(decrease=1)
+
+
+class TestAdaptiveFanOut(unittest.TestCase):
+    def setUp(self):
+        self.session = create_session(retry_policy=RetryPolicy(max_attempts=1))
+        self.app_ids = ["com.example.{i}".format(i=i) for i in range(40)]
+
+    def test_grows_to_maximum(self):
+        adapter = mount_fake(
+            self.session,
+            FakeAdapter(
+                {"/store/apps/details": load_fixture("details.html")},
+                delays={app_id: 0.01 for app_id in self.app_ids},
+            ),
+        )
+        concurrency = AIMDConcurrency(initial=2, maximum=6)
+        apps = multi_futures_app_request(
+            self.app_ids, session=self.session, parser="lxml", concurrency=concurrency
+        )
+        self.assertEqual(40, len(apps))
+        self.assertEqual(6, concurrency.limit)
+        self.assertLessEqual(adapter.max_in_flight, 6)
+        self.assertGreater(adapter.max_in_flight, 2)
+
+    def test_backs_off_when_throttled(self):
+        mount_fake(
+            self.session,
+            FakeAdapter(
+                {"/store/apps/details": load_fixture("details.html")},
+                statuses={app_id: 429 for app_id in self.app_ids[30:]},
+            ),
+        )
+        concurrency = AIMDConcurrency(initial=4, maximum=8)
+        apps = multi_futures_app_request(
+            self.app_ids, session=self.session, parser="lxml", concurrency=concurrency
+        )
+        self.assertEqual(30, len(apps))
+        self.assertLess(concurrency.limit, 4)
+
+    def test_throttling_is_not_congestion(self):
+        session = create_session(
+            rate_limiter=StallingLimiter(), retry_policy=RetryPolicy(max_attempts=1)
+        )
+        mount_fake(
+            session,
+            FakeAdapter(
+                {"/store/apps/details": load_fixture("details.html")},
+                delays={app_id: 0.01 for app_id in self.app_ids},
+            ),
+        )
+        concurrency = AIMDConcurrency(initial=2, maximum=6)
+        multi_futures_app_request(
+            self.app_ids, session=session, parser="lxml", concurrency=concurrency
+        )
+        self.assertEqual(6, concurrency.limit)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import logging
+
+from play_scraper.http_cache import HTTPCache, body_digest
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import (
+    create_session,
+    multi_futures_app_request,
+    parse_app_details_content,
+)
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestHTTPCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = HTTPCache(self.directory, max_size=1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_and_set(self):
+        key = self.cache.key("https://example.com/a")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, {"etag": '"v1"'}, b"body\nwith lines")
+
+        meta, body = self.cache.get(key)
+        self.assertEqual('"v1"', meta["etag"])
+        self.assertEqual(body_digest(b"body\nwith lines"), meta["digest"])
+        self.assertEqual(b"body\nwith lines", body)
+        # Shared with other instances, e.g. in other processes
+        self.assertEqual(body, HTTPCache(self.directory).get(key)[1])
+
+    def test_parsed_results_are_tied_to_the_body(self):
+        key = self.cache.key("https://example.com/a")
+        self.cache.set_parsed(key, "lxml:*", "digest", {"title": "A"})
+        self.assertEqual({"title": "A"}, self.cache.get_parsed(key, "lxml:*", "digest"))
+        self.assertIsNone(self.cache.get_parsed(key, "bs4:*", "digest"))
+        self.assertIsNone(self.cache.get_parsed(key, "lxml:*", "changed"))
+
+    def test_parsed_details_round_trip_as_json(self):
+        key = self.cache.key("https://example.com/a")
+        self.cache.max_size = 10 ** 6
+        details = parse_app_details_content(load_fixture("details.html"), "lxml")
+        self.cache.set_parsed(key, "lxml:*", "digest", details)
+        self.assertEqual(details, self.cache.get_parsed(key, "lxml:*", "digest"))
+
+    def test_parsed_results_are_never_unpickled(self):
+        key = self.cache.key("https://example.com/a")
+        self.cache.set_parsed(key, "lxml:*", "digest", {"title": "A"})
+        path = self.cache._parsed_path(key, "lxml:*")
+        with open(path, "wb") as f:
+            f.write(pickle.dumps(("digest", {"title": "B"}), protocol=2))
+        self.assertIsNone(self.cache.get_parsed(key, "lxml:*", "digest"))
+
+    def test_evicts_least_recently_used(self):
+        keys = [self.cache.key(url) for url in "abc"]
+        for i, key in enumerate(keys[:2]):
+            self.cache.set(key, {}, b"x" * 300)
+            mtime = 1000 + i
+            os.utime(self.cache._path(key, ".response"), (mtime, mtime))
+        self.cache.touch(keys[0])
+        self.cache.set(keys[2], {}, b"x" * 300)
+
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+
+class TestCachingAdapter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.http_cache = HTTPCache(self.directory)
+        self.etag = '"v1"'
+        self.page = load_fixture("details.html")
+
+        def details(request):
+            headers = {"Content-Type": "text/html; charset=utf-8"}
+            if self.etag is None:
+                return 200, self.page, headers
+            headers["ETag"] = self.etag
+            if request.headers.get("If-None-Match") == self.etag:
+                return 304, b"", headers
+            return 200, self.page, headers
+
+        self.session = create_session(http_cache=self.http_cache)
+        self.adapter = mount_fake(
+            self.session, FakeAdapter({"/store/apps/details": details})
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_revalidates(self):
+        url = "https://play.google.com/store/apps/details?id=com.example.app"
+        first = self.session.get(url)
+        self.assertFalse(first.from_cache)
+        self.assertNotIn("If-None-Match", self.adapter.requests[0].headers)
+
+        second = self.session.get(url)
+        self.assertEqual('"v1"', self.adapter.requests[1].headers["If-None-Match"])
+        self.assertTrue(second.from_cache)
+        self.assertEqual(200, second.status_code)
+        self.assertEqual(self.page, second.content)
+        self.assertEqual("utf-8", second.encoding)
+
+    def test_unmodified_pages_are_not_reparsed(self):
+        scraper = PlayScraper(session=self.session, parser="lxml")
+        app = scraper.details("com.example.app")
+        self.assertEqual("Example Messenger: Chat & Calls", app["title"])
+
+        # Overwrite the stored parse, to see it's what's returned
+        url = self.adapter.requests[0].url
+        key = self.http_cache.key(url)
+        parsed = self.http_cache.get_parsed(key, "lxml:*", body_digest(self.page))
+        parsed["title"] = "From the cache"
+        self.http_cache.set_parsed(key, "lxml:*", body_digest(self.page), parsed)
+        self.assertEqual("From the cache", scraper.details("com.example.app")["title"])
+
+        self.etag = '"v2"'
+        self.assertEqual(app, scraper.details("com.example.app"))
+        self.assertEqual(3, len(self.adapter.requests))
+
+    def test_futures_app_request(self):
+        app_ids = ["com.example.app", "com.example.other"]
+        apps = multi_futures_app_request(app_ids, session=self.session)
+        self.assertEqual(
+            apps,
+            multi_futures_app_request(app_ids, session=self.session, parser="lxml"),
+        )
+        self.assertEqual(apps, multi_futures_app_request(app_ids, session=self.session))
+        self.assertEqual(6, len(self.adapter.requests))
+        self.assertEqual(
+            2, sum("If-None-Match" not in r.headers for r in self.adapter.requests)
+        )
+
+    def test_scraper_http_cache(self):
+        scraper = PlayScraper(http_cache=self.http_cache, parse_workers=0)
+        self.addCleanup(scraper.close)
+        adapter = mount_fake(scraper.session, FakeAdapter(self.adapter.routes))
+        app = scraper.details("com.example.app")
+        self.assertEqual(app, scraper.details("com.example.app"))
+        self.assertEqual('"v1"', adapter.requests[1].headers["If-None-Match"])
+
+    def test_responses_without_validators_are_not_stored(self):
+        self.etag = None
+        url = "https://play.google.com/store/apps/details?id=com.example.app"
+        self.session.get(url)
+        self.assertIsNone(self.http_cache.get(self.http_cache.key(url)))
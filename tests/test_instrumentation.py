@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+import logging
+
+from play_scraper import instrumentation as instr
+from play_scraper.instrumentation import Instrumentation
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class Recorder(object):
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def named(self, name, **tags):
+        return [
+            event
+            for event in self.events
+            if event.name == name
+            and all(event.tags.get(k) == v for k, v in tags.items())
+        ]
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.recorder = Recorder()
+        self.instrumentation = Instrumentation([self.recorder])
+
+    def test_only_emits_while_active(self):
+        with instr.span("soup"):
+            pass
+        self.assertEqual([], self.recorder.events)
+
+        with self.instrumentation.activate(method="details", hl="en"):
+            with self.instrumentation.activate(hl="es"):
+                with instr.span("soup", parser="bs4"):
+                    pass
+            instr.emit("bytes_received", value=10)
+        instr.emit("bytes_received", value=20)
+
+        soup, received = self.recorder.events
+        self.assertEqual({"method": "details", "hl": "es", "parser": "bs4"}, soup.tags)
+        self.assertGreaterEqual(soup.duration, 0)
+        self.assertEqual(10, received.value)
+        self.assertEqual({"method": "details", "hl": "en"}, received.tags)
+
+    def test_timed(self):
+        parse = instr.timed(lambda content: content.upper())
+        with self.instrumentation.activate():
+            self.assertEqual("A", parse("a"))
+        (event,) = self.recorder.events
+        self.assertEqual("parse", event.name)
+        self.assertEqual("<lambda>", event.tags["function"])
+
+    def test_listener_errors_are_logged(self):
+        def fail(event):
+            raise ValueError()
+
+        self.instrumentation.add_listener(fail)
+        with self.instrumentation.activate():
+            instr.emit("soup")
+        self.instrumentation.remove_listener(fail)
+        self.assertEqual(1, len(self.recorder.events))
+
+
+class TestInstrumentedScraper(unittest.TestCase):
+    def setUp(self):
+        self.recorder = Recorder()
+        self.session = create_session()
+        mount_fake(
+            self.session,
+            FakeAdapter({"/store/apps/details": load_fixture("details.html")}),
+        )
+        self.scraper = PlayScraper(
+            hl="es",
+            session=self.session,
+            instrumentation=Instrumentation([self.recorder]),
+        )
+
+    def test_details(self):
+        self.scraper.details("com.example.app")
+        tags = {"method": "details", "app_id": "com.example.app", "hl": "es"}
+
+        (request,) = self.recorder.named("request", **tags)
+        self.assertEqual(200, request.tags["status"])
+        (received,) = self.recorder.named("bytes_received", **tags)
+        self.assertEqual(len(load_fixture("details.html")), received.value)
+        self.assertEqual(1, len(self.recorder.named("ttfb", **tags)))
+        self.assertEqual(1, len(self.recorder.named("soup", parser="bs4", **tags)))
+        for function in ["parse_app_details", "parse_additional_info"]:
+            self.assertEqual(
+                1, len(self.recorder.named("parse", function=function, **tags))
+            )
+
+    def test_iter_details(self):
+        app_ids = ["com.example.{i}".format(i=i) for i in range(3)]
+        self.assertEqual(3, len(list(self.scraper.iter_details(app_ids))))
+
+        for app_id in app_ids:
+            tags = {"method": "iter_details", "app_id": app_id, "gl": "us"}
+            self.assertEqual(1, len(self.recorder.named("request", **tags)))
+            self.assertEqual(
+                1,
+                len(self.recorder.named("parse", function="parse_app_details", **tags)),
+            )
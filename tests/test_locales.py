@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+import logging
+
+try:
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from urllib.parse import urlparse, parse_qs
+
+from play_scraper.retry import RetryPolicy
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestDetailsByLocale(unittest.TestCase):
+    def setUp(self):
+        self.app_ids = ["com.example.{i}".format(i=i) for i in range(4)]
+        self.locales = [("en", "us"), ("de", "de"), ("ja", "jp")]
+        self.failing = set()
+        self.unparseable = set()
+        self.delay = 0
+
+        def details(request):
+            time.sleep(self.delay)
+            query = parse_qs(urlparse(request.url).query)
+            if (query["hl"][0], query["gl"][0]) in self.failing:
+                return 503, b""
+            if (query["hl"][0], query["gl"][0]) in self.unparseable:
+                return 200, b"<html><body>Not a details page</body></html>"
+            return 200, load_fixture("details.html")
+
+        self.adapter = FakeAdapter({"/store/apps/details": details})
+        session = create_session(retry_policy=RetryPolicy(max_attempts=1))
+        mount_fake(session, self.adapter)
+        self.scraper = PlayScraper(session=session, parser="lxml")
+        self.addCleanup(self.scraper.close)
+
+    def test_details_by_locale(self):
+        results = self.scraper.details_by_locale(
+            iter(self.app_ids), self.locales, fields=["title"]
+        )
+
+        self.assertEqual(set(self.locales), set(results))
+        for apps in results.values():
+            self.assertEqual(self.app_ids, [app["app_id"] for app in apps])
+        sent = set()
+        for request in self.adapter.requests:
+            query = parse_qs(urlparse(request.url).query)
+            sent.add((query["id"][0], query["hl"][0], query["gl"][0]))
+        self.assertEqual(
+            set((i, hl, gl) for i in self.app_ids for hl, gl in self.locales), sent
+        )
+        self.assertEqual({"hl": "en", "gl": "us"}, self.scraper.params)
+
+    def test_failed_locale_is_isolated(self):
+        self.failing = {("de", "de")}
+        results = self.scraper.details_by_locale(self.app_ids, self.locales)
+
+        self.assertEqual([], results[("de", "de")])
+        self.assertEqual(self.app_ids, [app["app_id"] for app in results[("ja", "jp")]])
+
+    def test_unparseable_locale_is_isolated(self):
+        self.unparseable = {("ja", "jp")}
+        results = self.scraper.details_by_locale(self.app_ids, self.locales)
+
+        self.assertEqual([], results[("ja", "jp")])
+        self.assertEqual(self.app_ids, [app["app_id"] for app in results[("de", "de")]])
+
+    def test_max_in_flight(self):
+        self.delay = 0.02
+        self.scraper.details_by_locale(self.app_ids, self.locales, max_in_flight=2)
+        self.assertEqual(12, len(self.adapter.requests))
+        self.assertLessEqual(self.adapter.max_in_flight, 2)
+
+    def test_invalid_locale(self):
+        with self.assertRaises(ValueError) as e:
+            self.scraper.details_by_locale(self.app_ids, [("en", "us"), ("xx", "us")])
+        self.assertEqual("xx is not a valid language interface code.", str(e.exception))
+        with self.assertRaises(ValueError):
+            self.scraper.details_by_locale(self.app_ids, [("en", "xx")])
+        self.assertEqual([], self.adapter.requests)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import time
+import unittest
+import logging
+
+try:
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from urllib.parse import urlparse, parse_qs
+
+from play_scraper.lists import AGE_RANGE, CATEGORIES, COLLECTIONS
+from play_scraper.matrix import Cell, MatrixCrawl, expand
+from play_scraper.retry import RetryPolicy
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import build_collection_url, create_session
+
+from tests.helpers import FakeAdapter, card_list, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestExpand(unittest.TestCase):
+    def test_every_chart(self):
+        family = [c for c in CATEGORIES if c.startswith("FAMILY")]
+        cells = expand()
+        self.assertEqual(
+            (len(CATEGORIES) + len(family) * len(AGE_RANGE)) * len(COLLECTIONS),
+            len(cells),
+        )
+        self.assertEqual(len(cells), len(set(cells)))
+
+    def test_age_ranges(self):
+        self.assertEqual(
+            [
+                Cell("FAMILY", "TOP_FREE", None),
+                Cell("FAMILY", "TOP_FREE", "FIVE_UNDER"),
+                Cell("FAMILY", "TOP_FREE", "NINE_UP"),
+                Cell("FAMILY", "TOP_FREE", "SIX_EIGHT"),
+                Cell("GAME", "TOP_FREE", None),
+                Cell(None, "TOP_FREE", None),
+            ],
+            expand(["FAMILY", "GAME", None], ["TOP_FREE"]),
+        )
+        self.assertEqual(
+            [Cell("FAMILY", "TOP_FREE", None)],
+            expand(["FAMILY"], ["TOP_FREE"], ages=False),
+        )
+
+
+class TestMatrixCrawl(unittest.TestCase):
+    def setUp(self):
+        self.failing = set()
+        self.delay = 0
+
+        def chart(request):
+            time.sleep(self.delay)
+            path = urlparse(request.url).path
+            age = parse_qs(urlparse(request.url).query).get("age", ["ALL"])[0]
+            if path in self.failing:
+                return 500, b""
+            category = path.split("/")[4]
+            return 200, card_list(self.app_ids(category, age))
+
+        self.cells = expand(["FAMILY_ACTION", "GAME_RACING"], ["TOP_FREE"])
+        routes = {}
+        for cell in self.cells:
+            url = build_collection_url(cell.category, COLLECTIONS[cell.collection])
+            routes[urlparse(url).path] = chart
+        self.adapter = FakeAdapter(routes)
+        session = create_session(retry_policy=RetryPolicy(max_attempts=1))
+        mount_fake(session, self.adapter)
+        self.scraper = PlayScraper(session=session, parser="lxml")
+        self.addCleanup(self.scraper.close)
+
+    def app_ids(self, category, age):
+        return [
+            "com.example.{c}.{a}.{i}".format(c=category, a=age, i=i) for i in range(3)
+        ]
+
+    def test_crawl(self):
+        crawl = self.scraper.crawl_matrix(
+            ["FAMILY_ACTION", "GAME_RACING"], ["TOP_FREE"]
+        )
+        charts = {}
+        for entry in crawl:
+            cell = Cell(entry.category, entry.collection, entry.age)
+            charts.setdefault(cell, []).append((entry.rank, entry.app["app_id"]))
+
+        self.assertEqual(set(self.cells), set(charts))
+        for cell, chart in charts.items():
+            age = AGE_RANGE[cell.age] if cell.age else "ALL"
+            self.assertEqual(
+                list(enumerate(self.app_ids(cell.category, age), 1)), chart
+            )
+        # Each chart gets its own age range, rather than the scraper's
+        self.assertNotIn("age", self.scraper.params)
+
+        self.assertEqual(set(self.cells), set(t.cell for t in crawl.timings))
+        self.assertTrue(all(t.apps == 3 and t.error is None for t in crawl.timings))
+        self.assertEqual(2, len(crawl.slowest(2)))
+
+    def test_failed_chart_is_skipped(self):
+        self.failing = {"/store/apps/category/GAME_RACING/collection/topselling_free"}
+        crawl = MatrixCrawl(self.scraper, self.cells, results=3)
+        entries = list(crawl)
+
+        self.assertEqual(12, len(entries))
+        self.assertNotIn("GAME_RACING", set(entry.category for entry in entries))
+        failed = [t for t in crawl.timings if t.error is not None]
+        self.assertEqual(
+            [Cell("GAME_RACING", "TOP_FREE", None)], [t.cell for t in failed]
+        )
+
+    def test_workers(self):
+        self.delay = 0.05
+        list(MatrixCrawl(self.scraper, self.cells, workers=2))
+        self.assertEqual(len(self.cells), len(self.adapter.requests))
+        self.assertLessEqual(self.adapter.max_in_flight, 2)
+
+    def test_invalid_cell(self):
+        with self.assertRaises(ValueError):
+            MatrixCrawl(self.scraper, [Cell("GAME_RACING", "TOP_SOMETHING", None)])
+        with self.assertRaises(ValueError):
+            MatrixCrawl(self.scraper, self.cells, results=121)
+        self.assertEqual([], self.adapter.requests)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import logging
+
+from play_scraper.cache import DetailsCache
+from play_scraper.instrumentation import Instrumentation
+from play_scraper.metrics import Counter, Histogram, MetricsCollector, endpoint
+from play_scraper.retry import RetryPolicy
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter(self):
+        counter = Counter("requests_total", "Requests.", ("status",))
+        counter.inc(status=200)
+        counter.inc(2, status=200)
+        counter.inc(status='a "b"')
+        self.assertEqual(3, counter.get(status=200))
+        self.assertEqual(
+            "# HELP requests_total Requests.\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{status="200"} 3\n'
+            'requests_total{status="a \\"b\\""} 1',
+            counter.expose(),
+        )
+
+    def test_histogram(self):
+        histogram = Histogram("duration_seconds", "Durations.", buckets=(0.1, 1))
+        for value in [0.05, 0.5, 0.75, 2]:
+            histogram.observe(value)
+        self.assertEqual((4, 3.3), histogram.get())
+        self.assertEqual(
+            "# HELP duration_seconds Durations.\n"
+            "# TYPE duration_seconds histogram\n"
+            'duration_seconds_bucket{le="0.1"} 1\n'
+            'duration_seconds_bucket{le="1"} 3\n'
+            'duration_seconds_bucket{le="+Inf"} 4\n'
+            "duration_seconds_sum 3.3\n"
+            "duration_seconds_count 4",
+            histogram.expose(),
+        )
+
+    def test_endpoint(self):
+        base = "https://play.google.com/store/"
+        for url, name in [
+            ("apps/details?id=com.example.app", "details"),
+            ("apps/developer?id=Example", "developer"),
+            ("apps/dev?id=123", "developer"),
+            ("apps/similar?id=com.example.app", "similar"),
+            ("apps/collection/topselling_free", "collection"),
+            ("apps/category/GAME/collection/topselling_free", "collection"),
+            ("apps/category/GAME", "category"),
+            ("apps", "categories"),
+            ("search?q=game&c=apps", "search"),
+            ("account", "other"),
+        ]:
+            self.assertEqual(name, endpoint(base + url))
+        self.assertEqual(
+            "suggestions",
+            endpoint("https://market.android.com/suggest/SuggRequest?query=a"),
+        )
+
+
+class TestMetricsCollector(unittest.TestCase):
+    def setUp(self):
+        self.collector = MetricsCollector()
+        self.attempts = {}
+        self.page = load_fixture("details.html")
+
+        def details(request):
+            attempt = self.attempts[request.url] = self.attempts.get(request.url, 0) + 1
+            return (503, b"") if attempt == 1 else (200, self.page)
+
+        self.session = create_session(
+            retry_policy=RetryPolicy(max_attempts=2, sleep=lambda delay: None)
+        )
+        mount_fake(self.session, FakeAdapter({"/store/apps/details": details}))
+        self.scraper = PlayScraper(
+            session=self.session,
+            cache=DetailsCache(),
+            instrumentation=Instrumentation([self.collector]),
+        )
+
+    def test_details(self):
+        self.scraper.details("com.example.app")
+        self.scraper.details("com.example.app")
+        collector = self.collector
+
+        self.assertEqual(1, collector.requests.get(endpoint="details", status=200))
+        self.assertEqual(1, collector.requests.get(endpoint="details", status=503))
+        self.assertEqual(1, collector.retries.get(endpoint="details", status=503))
+        self.assertEqual(2, collector.request_duration.get(endpoint="details")[0])
+        self.assertEqual(2, collector.time_to_first_byte.get(endpoint="details")[0])
+        self.assertEqual(
+            len(self.page), collector.response_bytes.get(endpoint="details")
+        )
+        self.assertEqual(0, collector.in_flight.get(endpoint="details"))
+        self.assertEqual(1, collector.cache.get(cache="details", result="miss"))
+        self.assertEqual(1, collector.cache.get(cache="details", result="hit"))
+        self.assertEqual(
+            1,
+            collector.parse_duration.get(
+                function="parse_app_details", module="play_scraper.utils"
+            )[0],
+        )
+
+        exported = collector.export()
+        self.assertIn("# TYPE play_scraper_requests_total counter\n", exported)
+        self.assertIn(
+            'play_scraper_requests_total{endpoint="details",status="200"} 1\n',
+            exported,
+        )
+        self.assertIn(
+            'play_scraper_request_duration_seconds_bucket{endpoint="details",'
+            'le="+Inf"} 2\n',
+            exported,
+        )
+        self.assertIn(
+            'play_scraper_requests_in_flight{endpoint="details"} 0\n', exported
+        )
+
+    def test_iter_details(self):
+        app_ids = ["com.example.{i}".format(i=i) for i in range(5)]
+        self.assertEqual(5, len(list(self.scraper.iter_details(app_ids))))
+        collector = self.collector
+        self.assertEqual(5, collector.requests.get(endpoint="details", status=200))
+        self.assertEqual(5, collector.retries.get(endpoint="details", status=503))
+        self.assertEqual(0, collector.in_flight.get(endpoint="details"))
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import logging
+
+import requests
+
+try:
+    from urlparse import parse_qs
+except ImportError:
+    from urllib.parse import parse_qs
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from play_scraper import settings
+from play_scraper.retry import RetryPolicy
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session, generate_page_token
+
+from tests.helpers import (
+    FakeAdapter,
+    card_list,
+    cluster_card_list,
+    load_fixture,
+    mount_fake,
+)
+
+
+logging.disable(logging.CRITICAL)
+
+
+def form(request):
+    body = parse_qs(request.body, keep_blank_values=True)
+    return {k: v[0] for k, v in body.items()}
+
+
+class TestCollectionAll(unittest.TestCase):
+    def setUp(self):
+        self.app_ids = ["com.example.{i}".format(i=i) for i in range(250)]
+        # Lists can shift between requests, repeating an app on the next page
+        self.app_ids[120] = self.app_ids[119]
+        self.windows = []
+
+        def collection(request):
+            data = form(request)
+            start, num = int(data["start"]), int(data["num"])
+            self.windows.append((start, num))
+            if start >= len(self.app_ids):
+                return 400, b""
+            end = start + num
+            return 200, card_list(self.app_ids[start:end])
+
+        self.adapter = FakeAdapter(
+            {
+                "/store/apps/collection/topselling_free": collection,
+                "/store/apps/details": load_fixture("details.html"),
+            }
+        )
+        session = create_session(retry_policy=RetryPolicy(max_attempts=1))
+        mount_fake(session, self.adapter)
+        self.scraper = PlayScraper(session=session, parser="lxml")
+        self.addCleanup(self.scraper.close)
+
+    def test_collection_all(self):
+        apps = self.scraper.collection_all("TOP_FREE")
+        expected = self.app_ids[:120] + self.app_ids[121:]
+        self.assertEqual(expected, [app["app_id"] for app in apps])
+        # The last two pages are only requested ahead, as the first two are read
+        self.assertEqual([(0, 120), (120, 120), (240, 120)], sorted(self.windows)[:3])
+        self.assertLessEqual(len(self.windows), 5)
+
+    def test_detailed(self):
+        apps = self.scraper.collection_all("TOP_FREE", detailed=True, fields=["title"])
+        self.assertEqual(249, len(apps))
+        self.assertEqual(self.app_ids[:3], [app["app_id"] for app in apps[:3]])
+
+        apps = self.scraper.collection_all("TOP_FREE", detailed="stream")
+        self.assertEqual(set(self.app_ids), set(app["app_id"] for app in apps))
+
+    def test_first_page_failure_raises(self):
+        self.app_ids = []
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.scraper.collection_all("TOP_FREE")
+
+    def test_invalid_collection(self):
+        with self.assertRaises(ValueError):
+            self.scraper.collection_all("TOP_SOMETHING")
+
+
+class TestDeveloperAll(unittest.TestCase):
+    def setUp(self):
+        self.app_ids = ["com.example.{i}".format(i=i) for i in range(300)]
+        self.app_ids[240] = self.app_ids[10]
+        self.starts = []
+        self.refused = set()
+        starts = dict((generate_page_token(n), n) for n in range(0, 1200, 120))
+
+        def developer(request):
+            self.assertIn("id=Example+Studio", request.url)
+            data = form(request)
+            start, num = starts[data["pagTok"]], int(data["num"])
+            self.starts.append(start)
+            if start in self.refused:
+                return 400, b""
+            end = start + num
+            return 200, card_list(self.app_ids[start:end])
+
+        self.adapter = FakeAdapter(
+            {
+                "/store/apps/developer": developer,
+                "/store/apps/details": load_fixture("details.html"),
+            }
+        )
+        session = create_session(retry_policy=RetryPolicy(max_attempts=1))
+        mount_fake(session, self.adapter)
+        self.scraper = PlayScraper(session=session, parser="lxml")
+        self.addCleanup(self.scraper.close)
+
+    def test_developer_all(self):
+        apps = self.scraper.developer_all("Example Studio")
+        expected = self.app_ids[:240] + self.app_ids[241:]
+        self.assertEqual(expected, [app["app_id"] for app in apps])
+        self.assertEqual([0, 120, 240], sorted(self.starts)[:3])
+
+    def test_pages_in_flight(self):
+        with mock.patch.object(settings, "PAGES_IN_FLIGHT", 1):
+            apps = self.scraper.developer_all("Example Studio")
+        self.assertEqual(299, len(apps))
+        self.assertEqual([0, 120, 240], self.starts)
+
+        self.starts = []
+        with mock.patch.object(settings, "PAGES_IN_FLIGHT", 2):
+            self.scraper.developer_all("Example Studio")
+        self.assertEqual([0, 120, 240], sorted(self.starts)[:3])
+        self.assertLessEqual(len(self.starts), 4)
+
+    def test_refused_unsigned_page_token_is_an_error(self):
+        self.app_ids = ["com.example.{i}".format(i=i) for i in range(600)]
+        self.refused = {360}
+        with mock.patch.object(self.scraper._log, "error") as error:
+            apps = self.scraper.developer_all("Example Studio")
+        self.assertEqual(self.app_ids[:360], [app["app_id"] for app in apps])
+        self.assertIn("unsigned page token", error.call_args[0][0])
+
+        # Signed tokens failing past the end of the list are only a warning
+        self.refused = {240}
+        with mock.patch.object(self.scraper._log, "error") as error:
+            self.scraper.developer_all("Example Studio")
+        self.assertFalse(error.called)
+
+    def test_max_pages(self):
+        apps = self.scraper.developer_all("Example Studio", max_pages=2)
+        self.assertEqual(self.app_ids[:240], [app["app_id"] for app in apps])
+        self.assertEqual([0, 120], sorted(self.starts))
+
+    def test_detailed(self):
+        apps = self.scraper.developer_all(
+            "Example Studio", detailed="stream", fields=["title"], max_pages=1
+        )
+        self.assertEqual(set(self.app_ids[:120]), set(app["app_id"] for app in apps))
+
+    def test_developer_id_invalid(self):
+        with self.assertRaises(ValueError):
+            self.scraper.developer_all("5700313618786177705")
+
+
+class TestSearchAll(unittest.TestCase):
+    def setUp(self):
+        # Past the tokens it knows, pages are only found through the previous
+        tokens = [settings.PAGE_TOKENS[n] for n in range(13)]
+        tokens.append("GAEiAwiEAg==:S:ANO1ljDISCO")
+        self.pages = [
+            ["com.example.{n}.{i}".format(n=n, i=i) for i in range(5)]
+            for n in range(len(tokens))
+        ]
+        # Results can shift between requests, repeating an app on the next page
+        self.pages[3][0] = self.pages[2][4]
+        self.failing = set()
+        self.requested = []
+
+        def search(request):
+            # Tokens sent without their signature are still recognized
+            unsigned = [token.split(":")[0] for token in tokens]
+            n = unsigned.index(form(request)["pagTok"].split(":")[0])
+            self.requested.append(n)
+            if n in self.failing:
+                return 500, b""
+            script = ""
+            if n + 1 < len(tokens):
+                script = "<script>nextPageToken = '{token}'</script>".format(
+                    token=tokens[n + 1]
+                )
+            return 200, cluster_card_list(self.pages[n], script)
+
+        self.adapter = FakeAdapter(
+            {
+                "/store/search": search,
+                "/store/apps/details": load_fixture("details.html"),
+            }
+        )
+        session = create_session(retry_policy=RetryPolicy(max_attempts=1))
+        mount_fake(session, self.adapter)
+        self.scraper = PlayScraper(session=session, parser="lxml")
+        self.addCleanup(self.scraper.close)
+
+    def app_ids(self, pages):
+        app_ids = []
+        for n in pages:
+            app_ids.extend(i for i in self.pages[n] if i not in app_ids)
+        return app_ids
+
+    def test_search_all(self):
+        apps = self.scraper.search_all("example")
+        self.assertEqual(self.app_ids(range(14)), [app["app_id"] for app in apps])
+        # Each page is requested once, following the token found on the last
+        self.assertEqual(list(range(14)), sorted(self.requested))
+
+    def test_failed_page_is_skipped(self):
+        self.failing = {5}
+        apps = self.scraper.search_all("example")
+        pages = [n for n in range(14) if n != 5]
+        self.assertEqual(self.app_ids(pages), [app["app_id"] for app in apps])
+
+    def test_first_page_failure_raises(self):
+        self.failing = {0}
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.scraper.search_all("example")
+
+    def test_max_pages(self):
+        apps = self.scraper.search_all("example", max_pages=2)
+        self.assertEqual(self.app_ids(range(2)), [app["app_id"] for app in apps])
+        self.assertEqual([0, 1], sorted(self.requested))
+
+    def test_search_any_page(self):
+        apps = self.scraper.search("example", page=13)
+        self.assertEqual(self.pages[13], [app["app_id"] for app in apps])
+        self.assertEqual("GAEiAwiEAg==", form(self.adapter.requests[-1])["pagTok"])
+
+    def test_detailed(self):
+        apps = self.scraper.search_all(
+            "example", detailed=True, fields=["title"], max_pages=3
+        )
+        self.assertEqual(self.app_ids(range(3)), [app["app_id"] for app in apps])
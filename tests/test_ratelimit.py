@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import play_scraper
+from play_scraper.ratelimit import FileTokenBucket, TokenBucket
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import (
+    create_session,
+    get_default_session,
+    multi_futures_app_request,
+    set_default_session,
+)
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super(CountingBucket, self).__init__(rate=1000, burst=1000)
+        self.acquired = 0
+
+    def acquire(self, tokens=1):
+        self.acquired += tokens
+        super(CountingBucket, self).acquire(tokens)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_bursts_then_throttles(self):
+        timer = FakeTimer()
+        bucket = TokenBucket(rate=2, burst=3, timer=timer)
+        self.assertEqual([0, 0, 0], [bucket.reserve() for _ in range(3)])
+        # Waiting callers queue up behind each other
+        self.assertEqual([0.5, 1.0], [bucket.reserve() for _ in range(2)])
+
+        timer.now = 10
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(0, bucket.reserve(2))
+        self.assertEqual(0.5, bucket.reserve())
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=1, burst=0)
+
+
+@unittest.skipIf(os.name == "nt", "FileTokenBucket requires fcntl")
+class TestFileTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "bucket")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shares_budget(self):
+        timer = FakeTimer()
+        first = FileTokenBucket(self.path, rate=1, burst=2, timer=timer)
+        second = FileTokenBucket(self.path, rate=1, burst=2, timer=timer)
+        self.assertEqual(0, first.reserve())
+        self.assertEqual(0, second.reserve())
+        self.assertEqual(1, first.reserve())
+        self.assertEqual(2, second.reserve())
+
+        timer.now = 100
+        self.assertEqual(0, second.reserve())
+
+
+class TestThrottledSession(unittest.TestCase):
+    def test_every_request_takes_a_token(self):
+        bucket = CountingBucket()
+        session = create_session(rate_limiter=bucket)
+        mount_fake(
+            session, FakeAdapter({"/store/apps/details": load_fixture("details.html")})
+        )
+
+        apps = multi_futures_app_request(
+            ["com.example.{i}".format(i=i) for i in range(5)],
+            session=session,
+            parser="lxml",
+        )
+        self.assertEqual(5, len(apps))
+        self.assertEqual(5, bucket.acquired)
+
+    def test_api_uses_the_default_session(self):
+        bucket = CountingBucket()
+        session = create_session(rate_limiter=bucket)
+        mount_fake(
+            session, FakeAdapter({"/store/apps/details": load_fixture("details.html")})
+        )
+        self.addCleanup(set_default_session, get_default_session())
+        set_default_session(session)
+
+        play_scraper.details("com.example.app", fields=["title"])
+        self.assertEqual(1, bucket.acquired)
+
+    def test_options_of_a_given_session(self):
+        session = create_session()
+        with self.assertRaises(ValueError) as e:
+            PlayScraper(session=session, rate_limiter=CountingBucket())
+        self.assertEqual(
+            "rate_limiter cannot be combined with session; pass it to "
+            "utils.create_session instead.",
+            str(e.exception),
+        )
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+import requests
+
+from play_scraper.replay import Archive
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import (
+    create_session,
+    multi_futures_app_request,
+    send_request,
+)
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "crawl.jsonl.gz")
+        self.app_ids = ["com.example.{i}".format(i=i) for i in range(5)]
+        self.versions = 0
+
+        def collection(request):
+            return 200, load_fixture("collection.html"), {"ETag": '"v1"'}
+
+        def version(request):
+            self.versions += 1
+            return 200, "v{n}".format(n=self.versions).encode("utf-8")
+
+        self.adapter = FakeAdapter(
+            {
+                "/store/apps/details": load_fixture("details.html"),
+                "/store/apps/collection/topselling_free": collection,
+                "/version": version,
+            }
+        )
+
+    def record(self, archive):
+        session = create_session(archive=archive)
+        mount_fake(session, self.adapter)
+        return session
+
+    def test_replays_without_the_network(self):
+        with Archive(self.path, "record") as archive:
+            session = self.record(archive)
+            recorded = PlayScraper(session=session).collection(
+                "TOP_FREE", detailed=True
+            )
+            details = multi_futures_app_request(self.app_ids, session=session)
+        sent = len(self.adapter.requests)
+
+        session = create_session(archive=Archive(self.path))
+        self.assertEqual(
+            recorded,
+            PlayScraper(session=session).collection("TOP_FREE", detailed=True),
+        )
+        self.assertEqual(
+            details, multi_futures_app_request(self.app_ids, session=session)
+        )
+        self.assertEqual(sent, len(self.adapter.requests))
+
+        response = send_request(
+            "POST",
+            "https://play.google.com/store/apps/collection/topselling_free",
+            data={"ipf": 1, "xhr": 1, "start": 0, "num": 60},
+            params={"hl": "en", "gl": "us"},
+            session=session,
+        )
+        self.assertEqual('"v1"', response.headers["etag"])
+        self.assertEqual(load_fixture("collection.html"), response.content)
+
+    def test_repeated_requests_replay_in_turn(self):
+        url = "https://play.google.com/version"
+        archive = Archive(self.path, "record")
+        session = self.record(archive)
+        for _ in range(2):
+            send_request("GET", url, session=session)
+        # Responses are flushed as they're recorded, before the archive closes
+        session = create_session(archive=Archive(self.path))
+        self.assertEqual(
+            [b"v1", b"v2", b"v2"],
+            [send_request("GET", url, session=session).content for _ in range(3)],
+        )
+        archive.close()
+
+    def test_unrecorded_requests_fail(self):
+        Archive(self.path, "record").close()
+        session = create_session(archive=Archive(self.path))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            send_request("GET", "https://play.google.com/version", session=session)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            Archive(self.path, "append")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import logging
+
+import requests
+
+from play_scraper.retry import RetryPolicy, parse_retry_after
+from play_scraper.utils import create_session, multi_futures_app_request
+
+from tests.helpers import FakeAdapter, load_fixture, mount_fake
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_should_retry(self):
+        policy = RetryPolicy(max_attempts=3)
+        self.assertTrue(policy.should_retry(1))
+        self.assertTrue(policy.should_retry(2, 503))
+        self.assertFalse(policy.should_retry(3, 503))
+        self.assertFalse(policy.should_retry(1, 404))
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=0.5, max_backoff=3, jitter=False)
+        self.assertEqual([0.5, 1, 2, 3], [policy.delay(n) for n in range(1, 5)])
+        self.assertEqual(2, policy.delay(1, "2"))
+        self.assertEqual(3, policy.delay(1, "120"))
+
+        policy = RetryPolicy(backoff=0.5, max_backoff=3)
+        for _ in range(10):
+            self.assertTrue(0 <= policy.delay(3) <= 2)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(5, parse_retry_after("5"))
+        self.assertEqual(
+            30,
+            parse_retry_after(
+                "Wed, 21 Oct 2015 07:28:30 GMT", timer=lambda: 1445412480
+            ),
+        )
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_invalid_max_attempts(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_attempts=0)
+
+
+class TestRetryingAdapter(unittest.TestCase):
+    def setUp(self):
+        self.delays = []
+        self.policy = RetryPolicy(
+            max_attempts=3, backoff=1, jitter=False, sleep=self.delays.append
+        )
+        self.failures = {}
+        self.page = load_fixture("details.html")
+
+        def details(request):
+            app_id = request.url.split("id=")[1].split("&")[0]
+            failures = self.failures.get(app_id, [])
+            if failures:
+                failure = failures.pop(0)
+                if isinstance(failure, Exception):
+                    raise failure
+                return failure, b"", {"Retry-After": "7"} if failure == 429 else {}
+            return 200, self.page
+
+        self.session = create_session(retry_policy=self.policy)
+        self.adapter = mount_fake(
+            self.session, FakeAdapter({"/store/apps/details": details})
+        )
+        self.url = "https://play.google.com/store/apps/details?id=com.example.app"
+
+    def test_retries_statuses(self):
+        self.failures["com.example.app"] = [503, 429]
+        response = self.session.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self.page, response.content)
+        self.assertEqual([1, 7], self.delays)
+
+    def test_retries_connection_errors(self):
+        self.failures["com.example.app"] = [requests.exceptions.ConnectionError()] * 3
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.session.get(self.url)
+        self.assertEqual(3, len(self.adapter.requests))
+        self.assertEqual([1, 2], self.delays)
+
+    def test_returns_last_response(self):
+        self.failures["com.example.app"] = [500, 502, 503]
+        self.assertEqual(503, self.session.get(self.url).status_code)
+
+    def test_does_not_retry_other_errors(self):
+        self.failures["com.example.app"] = [404]
+        self.assertEqual(404, self.session.get(self.url).status_code)
+        self.assertEqual(1, len(self.adapter.requests))
+
+    def test_futures_app_request(self):
+        self.failures["com.example.b"] = [503, requests.exceptions.Timeout()]
+        self.failures["com.example.c"] = [500, 500, 500]
+        app_ids = ["com.example.a", "com.example.b", "com.example.c"]
+
+        apps = multi_futures_app_request(app_ids, session=self.session, parser="lxml")
+        self.assertEqual(
+            ["com.example.a", "com.example.b"], [app["app_id"] for app in apps]
+        )
+        self.assertEqual(7, len(self.adapter.requests))
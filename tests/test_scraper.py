@@ -10,6 +10,7 @@ except NameError:
 from play_scraper import settings
 from play_scraper.lists import CATEGORIES
 from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session
 
 
 BASIC_KEYS = {
@@ -96,6 +97,24 @@ class PlayScraperTest(unittest.TestCase):
         self.assertEqual("kr", s.geolocation)
         self.assertDictEqual({"hl": "ko", "gl": "kr"}, s.params)
 
+    def test_init_with_session(self):
+        session = create_session()
+        s = PlayScraper(session=session)
+        self.assertIs(session, s.session)
+        self.assertIsNot(session, PlayScraper().session)
+
+    def test_init_with_parser(self):
+        self.assertEqual("bs4", PlayScraper().parser)
+        self.assertEqual("lxml", PlayScraper(parser="lxml").parser)
+
+    def test_invalid_parser_raises(self):
+        with self.assertRaises(ValueError) as e:
+            PlayScraper(parser="html5lib")
+        self.assertEqual(
+            "html5lib is not a valid parser. Must be one of: bs4, lxml, json.",
+            str(e.exception),
+        )
+
     def test_invalid_language_code_raises(self):
         with self.assertRaises(ValueError) as e:
             PlayScraper(hl="invalid")
@@ -338,9 +357,17 @@ class DeveloperTest(ScraperTestBase):
             str(e.exception),
         )
 
+    def test_page_with_unsigned_token(self):
+        # Start 24 isn't one of the PAGE_TOKENS, so its page token is unsigned
+        first = set(app["app_id"] for app in self.s.developer("Google LLC"))
+        second = set(app["app_id"] for app in self.s.developer("Google LLC", page=1))
+
+        self.assertEqual(settings.DEV_RESULTS, len(second))
+        self.assertFalse(first & second)
+
     def test_page_out_of_range(self):
         with self.assertRaises(ValueError):
-            self.s.developer("Google LLC", results=20, page=13)
+            self.s.developer("Google LLC", results=20, page=-1)
 
 
 class SuggestionTest(ScraperTestBase):
@@ -383,12 +410,17 @@ class SearchTest(ScraperTestBase):
         self.assertTrue(all(key in apps[0] for key in BASIC_KEYS))
         self.assertEqual(len(BASIC_KEYS), len(apps[0].keys()))
 
-    def test_page_out_of_range_not_between_0_and_12(self):
+    def test_page_with_unsigned_token(self):
+        # Pages past 12 have no signed page token
+        apps = self.s.search("cats", page=13)
+
+        self.assertGreater(len(apps), 0)
+        self.assertTrue(all(key in apps[0] for key in BASIC_KEYS))
+
+    def test_page_out_of_range_negative(self):
         with self.assertRaises(ValueError) as e:
-            self.s.search("dog", page=13)
-        self.assertEqual(
-            "Parameter 'page' (13) must be between 0 and 12.", str(e.exception)
-        )
+            self.s.search("dog", page=-1)
+        self.assertEqual("Parameter 'page' (-1) cannot be negative.", str(e.exception))
 
 
 class SimilarTest(ScraperTestBase):
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from urllib.parse import urlparse, parse_qs
+
+from play_scraper.scraper import PlayScraper
+from play_scraper.utils import create_session
+
+from tests.helpers import (
+    FakeAdapter,
+    card_list,
+    cluster_card_list,
+    load_fixture,
+    mount_fake,
+)
+
+
+logging.disable(logging.CRITICAL)
+
+
+class TestConcurrentUse(unittest.TestCase):
+    def setUp(self):
+        self.adapter = FakeAdapter(
+            {
+                "/store/apps/details": load_fixture("details.html"),
+                "/store/apps/category/FAMILY/collection/topselling_free": card_list(
+                    ["com.example.family"]
+                ),
+                "/store/search": cluster_card_list(["com.example.search"]),
+                "/suggest/SuggRequest": b'[{"s": "dogs"}]',
+            }
+        )
+        session = create_session()
+        mount_fake(session, self.adapter)
+        self.scraper = PlayScraper(session=session, parser="lxml")
+        self.addCleanup(self.scraper.close)
+
+    def query(self, request):
+        return sorted(parse_qs(urlparse(request.url).query))
+
+    def test_calls_do_not_share_params(self):
+        calls = [
+            lambda: self.scraper.search("dogs"),
+            lambda: self.scraper.suggestions("dogs"),
+            lambda: self.scraper.collection("TOP_FREE", "FAMILY", age="SIX_EIGHT"),
+            lambda: self.scraper.collection("TOP_FREE", "FAMILY"),
+            lambda: self.scraper.details("com.example.details", fields=["title"]),
+        ]
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(calls[i % len(calls)]) for i in range(100)]
+            for future in futures:
+                future.result()
+
+        expected = {
+            "/store/search": [["c", "gl", "hl", "q"]],
+            "/suggest/SuggRequest": [["c", "gl", "hl", "json", "query"]],
+            "/store/apps/category/FAMILY/collection/topselling_free": [
+                ["age", "gl", "hl"],
+                ["gl", "hl"],
+            ],
+            "/store/apps/details": [["gl", "hl", "id"]],
+        }
+        sent = {}
+        for request in self.adapter.requests:
+            queries = sent.setdefault(urlparse(request.url).path, [])
+            if self.query(request) not in queries:
+                queries.append(self.query(request))
+        self.assertEqual(expected, dict((k, sorted(v)) for k, v in sent.items()))
+        self.assertEqual(100, len(self.adapter.requests))
+        self.assertEqual({"hl": "en", "gl": "us"}, self.scraper.params)
+
+    def test_params_cannot_be_changed_by_a_call(self):
+        params = self.scraper.params
+        params["age"] = "AGE_RANGE1"
+        self.scraper.collection("TOP_FREE", "FAMILY")
+
+        self.assertEqual(["gl", "hl"], self.query(self.adapter.requests[0]))
+        self.assertEqual({"hl": "en", "gl": "us"}, self.scraper.params)
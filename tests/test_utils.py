@@ -2,16 +2,33 @@
 
 import unittest
 import logging
+from concurrent.futures import ProcessPoolExecutor
 
 import play_scraper.settings as s
 from play_scraper.lists import CATEGORIES, COLLECTIONS, AGE_RANGE
 from play_scraper.utils import (
     build_url,
     build_collection_url,
+    DETAIL_FIELDS,
+    create_session,
+    detail_fields,
+    generate_page_token,
     generate_post_data,
+    get_default_session,
+    iter_futures_app_request,
+    multi_futures_app_request,
+    parse_app_details_content,
+    parse_app_ids,
+    parse_card_list,
+    parse_categories,
+    parse_cluster_card_list,
     send_request,
+    set_default_session,
 )
 
+from play_scraper.json_parser import JSON_FIELDS, parse_datasets
+from tests.helpers import fake_session, load_fixture
+
 
 logging.disable(logging.CRITICAL)
 
@@ -50,7 +67,10 @@ class TestBuildListUrl(BasicSetup):
         self.assertEqual(expected, build_collection_url(collection=self.collection))
 
     def test_list_url_both_args(self):
-        expected = "https://play.google.com/store/apps/category/GAME_ACTION/collection/topselling_free"
+        expected = (
+            "https://play.google.com/store/apps/category/GAME_ACTION"
+            "/collection/topselling_free"
+        )
         self.assertEqual(
             expected,
             build_collection_url(category=self.category, collection=self.collection),
@@ -85,6 +105,58 @@ class TestGeneratePostData(unittest.TestCase):
         self.assertEqual(generate_post_data(0, 0, self.pag_tok), expected)
 
 
+class TestGeneratePageToken(unittest.TestCase):
+    def test_first_page(self):
+        self.assertEqual("", generate_page_token(0))
+
+    def test_known_tokens_are_signed(self):
+        for page, token in s.PAGE_TOKENS.items():
+            self.assertEqual(token, generate_page_token(page * s.SEARCH_RESULTS))
+
+    def test_any_start(self):
+        self.assertEqual("GAEiAggY", generate_page_token(24))
+        self.assertEqual("GAEiAwiEAg==", generate_page_token(260))
+        self.assertEqual("GAEiBAigjQY=", generate_page_token(100000))
+
+    def test_negative_start(self):
+        with self.assertRaises(ValueError):
+            generate_page_token(-20)
+
+
+class TestCreateSession(unittest.TestCase):
+    def test_default_pool_settings(self):
+        session = create_session()
+        adapter = session.get_adapter("https://play.google.com")
+
+        self.assertEqual(s.POOL_CONNECTIONS, adapter._pool_connections)
+        self.assertEqual(s.POOL_MAXSIZE, adapter._pool_maxsize)
+        self.assertEqual(s.POOL_BLOCK, adapter._pool_block)
+        self.assertEqual("keep-alive", session.headers["Connection"])
+
+    def test_custom_pool_settings(self):
+        session = create_session(
+            pool_connections=2, pool_maxsize=50, pool_block=True, keep_alive=False
+        )
+        adapter = session.get_adapter("https://play.google.com")
+
+        self.assertEqual(2, adapter._pool_connections)
+        self.assertEqual(50, adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual("close", session.headers["Connection"])
+
+    def test_default_session_is_shared(self):
+        self.assertIs(get_default_session(), get_default_session())
+
+    def test_set_default_session(self):
+        default = get_default_session()
+        self.addCleanup(set_default_session, default)
+        session = create_session()
+        set_default_session(session)
+        self.assertIs(session, get_default_session())
+        set_default_session(None)
+        self.assertIsNot(session, get_default_session())
+
+
 class TestSendRequest(unittest.TestCase):
     def setUp(self):
         self.url = "https://www.google.com/"
@@ -107,3 +179,207 @@ class TestSendRequest(unittest.TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.url, expected_url)
+
+
+class TestLxmlParser(unittest.TestCase):
+    """The lxml backend must return exactly what the BeautifulSoup one does."""
+
+    def assertSameParse(self, parse, content, *args):
+        expected = parse(content, *args, parser="bs4")
+        self.assertTrue(expected)
+        self.assertEqual(expected, parse(content, *args, parser="lxml"))
+
+    def test_app_details(self):
+        self.assertSameParse(parse_app_details_content, load_fixture("details.html"))
+
+    def test_card_list(self):
+        self.assertSameParse(parse_card_list, load_fixture("collection.html"))
+        self.assertSameParse(parse_card_list, load_fixture("developer.html"))
+
+    def test_cluster_card_list(self):
+        self.assertSameParse(parse_cluster_card_list, load_fixture("cluster.html"))
+
+    def test_app_ids(self):
+        self.assertSameParse(parse_app_ids, load_fixture("collection.html"))
+        self.assertSameParse(parse_app_ids, load_fixture("cluster.html"))
+
+    def test_categories(self):
+        content = (
+            b'<div id="action-dropdown-children-Categories"><ul>'
+            b'<li><a href="/store/apps/category/GAME"> Games </a></li>'
+            b'<li><a href="/store/apps/category/FAMILY?age=AGE_RANGE1">Ages</a></li>'
+            b'<li><a href="/store/apps/topic?id=category_x">Promo</a></li>'
+            b"</ul></div>"
+        )
+        self.assertSameParse(parse_categories, content, True)
+        self.assertSameParse(parse_categories, content, False)
+
+    def test_invalid_parser(self):
+        with self.assertRaises(ValueError):
+            parse_card_list(load_fixture("collection.html"), parser="html5lib")
+
+    def test_futures_app_request(self):
+        session, _ = fake_session({"/store/apps/details": load_fixture("details.html")})
+        self.assertEqual(
+            multi_futures_app_request(["com.example.app"], session=session),
+            multi_futures_app_request(
+                ["com.example.app"], session=session, parser="lxml"
+            ),
+        )
+
+
+class TestDetailFields(unittest.TestCase):
+    def setUp(self):
+        self.content = load_fixture("details.html")
+
+    def test_each_field_matches_full_parse(self):
+        for parser in s.PARSERS:
+            app = parse_app_details_content(self.content, parser)
+            self.assertEqual(DETAIL_FIELDS, set(app))
+            for field in DETAIL_FIELDS:
+                self.assertEqual(
+                    {field: app[field]},
+                    parse_app_details_content(self.content, parser, [field]),
+                )
+
+    def test_only_requested_fields(self):
+        fields = ["installs", "score", "reviews", "updated"]
+        expected = {
+            "installs": "1,000,000,000+",
+            "score": "4.3",
+            "reviews": 9289408,
+            "updated": "September 12, 2019",
+        }
+        for parser in s.PARSERS:
+            self.assertEqual(
+                expected, parse_app_details_content(self.content, parser, fields)
+            )
+
+    def test_app_id_and_url_always_included(self):
+        self.assertEqual(frozenset(["score"]), detail_fields(["app_id", "score"]))
+        self.assertIsNone(detail_fields(None))
+
+    def test_invalid_fields(self):
+        with self.assertRaises(ValueError) as e:
+            detail_fields(["score", "ratings", "downloads"])
+        self.assertEqual("Invalid detail fields: downloads, ratings.", str(e.exception))
+
+    def test_futures_app_request(self):
+        session, _ = fake_session({"/store/apps/details": self.content})
+        apps = multi_futures_app_request(
+            ["com.example.app"], session=session, fields=["title", "free"]
+        )
+        self.assertEqual(
+            [
+                {
+                    "app_id": "com.example.app",
+                    "url": "https://play.google.com/store/apps/details"
+                    "?id=com.example.app",
+                    "title": "Example Messenger: Chat & Calls",
+                    "free": True,
+                }
+            ],
+            apps,
+        )
+
+
+class TestJsonParser(unittest.TestCase):
+    def setUp(self):
+        self.content = load_fixture("details.html")
+        self.expected = parse_app_details_content(self.content, "bs4")
+
+    def test_app_details(self):
+        self.assertEqual(self.expected, parse_app_details_content(self.content, "json"))
+
+    def test_json_fields(self):
+        self.assertEqual(
+            {field: self.expected[field] for field in JSON_FIELDS},
+            parse_app_details_content(self.content, "json", JSON_FIELDS),
+        )
+
+    def test_falls_back_to_dom_without_data(self):
+        content = self.content.replace(b"AF_initDataCallback", b"AF_removed")
+        self.assertEqual({}, parse_datasets(content))
+        self.assertEqual(self.expected, parse_app_details_content(content, "json"))
+
+    def test_datasets(self):
+        content = (
+            b"<script>AF_initDataCallback({key: 'ds:1', isError:  false , "
+            b"hash: '1', data:function(){return [1,[\"a\"]]}});</script>"
+            b"<script>AF_initDataCallback({key: 'ds:2', hash: '2', "
+            b'data:[null,{"b": 2}], sideChannel: {}});</script>'
+            b"<script>AF_initDataCallback({key: 'ds:3', hash: '3', "
+            b"data:[invalid]});</script>"
+        )
+        self.assertEqual(
+            {"ds:1": [1, ["a"]], "ds:2": [None, {"b": 2}]}, parse_datasets(content)
+        )
+
+    def test_lists(self):
+        for name, parse in (
+            ("collection.html", parse_card_list),
+            ("cluster.html", parse_cluster_card_list),
+        ):
+            content = load_fixture(name)
+            self.assertEqual(parse(content), parse(content, parser="json"))
+
+
+class TestMultiFuturesAppRequest(unittest.TestCase):
+    def setUp(self):
+        self.app_ids = ["com.example.slow", "com.example.fast", "com.example.missing"]
+        self.session, self.adapter = fake_session(
+            {"/store/apps/details": load_fixture("details.html")},
+            delays={"com.example.slow": 0.2},
+            statuses={"com.example.missing": 404},
+        )
+
+    def test_results_in_request_order(self):
+        apps = multi_futures_app_request(self.app_ids, session=self.session)
+
+        self.assertEqual(
+            ["com.example.slow", "com.example.fast"], [app["app_id"] for app in apps]
+        )
+        self.assertEqual("Example Messenger: Chat & Calls", apps[0]["title"])
+
+    def test_iter_yields_in_completion_order(self):
+        apps = iter_futures_app_request(self.app_ids, session=self.session)
+
+        self.assertEqual("com.example.fast", next(apps)["app_id"])
+        self.assertEqual("com.example.slow", next(apps)["app_id"])
+        with self.assertRaises(StopIteration):
+            next(apps)
+
+    def test_iter_bounds_requests_in_flight(self):
+        taken = []
+
+        def app_ids():
+            for i in range(20):
+                taken.append(i)
+                yield "com.example.app{}".format(i)
+
+        apps = iter_futures_app_request(
+            app_ids(), session=self.session, max_in_flight=3
+        )
+        next(apps)
+        self.assertLessEqual(len(taken), 6)
+
+        self.assertEqual(19, len(list(apps)))
+        self.assertEqual(20, len(taken))
+        self.assertLessEqual(self.adapter.max_in_flight, 3)
+
+    def test_parse_in_process_pool(self):
+        parse_executor = ProcessPoolExecutor(max_workers=2)
+        try:
+            apps = multi_futures_app_request(
+                self.app_ids, session=self.session, parse_executor=parse_executor
+            )
+        finally:
+            parse_executor.shutdown()
+
+        self.assertEqual(
+            ["com.example.slow", "com.example.fast"], [app["app_id"] for app in apps]
+        )
+        self.assertEqual(
+            multi_futures_app_request(self.app_ids[:1], session=self.session),
+            apps[:1],
+        )